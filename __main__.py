@@ -1,14 +1,13 @@
-
 """An AWS Python Pulumi program"""
 
+import importlib
 import pulumi
 
 import settings
 import helpers
-import s3
-import vpc
-import subnet_groups
-import vpc_endpoints
-import elasticache
-import rds
-import eks
\ No newline at end of file
+
+# Deploy every layer, or only the one selected with stack-layer:
+for layer, modules in settings.stack_layers.items():
+    if settings.deploys_layer(layer):
+        for module in modules:
+            importlib.import_module(module)
\ No newline at end of file
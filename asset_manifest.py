@@ -0,0 +1,205 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+"""
+Static asset manifest: walks a local build directory and describes every S3 object to upload, keyed by content hash,
+with its content type, Cache-Control policy and precompressed Brotli/gzip variants, plus the CloudFront Function that
+serves those variants. Pure python on purpose, so a build directory can be planned without AWS or Pulumi.
+Brotli needs the optional brotli package, so the encodings are chosen in the stack config rather than by whatever is
+installed on the machine running the update.
+"""
+
+# Precompressed variants are stored next to the original under these suffixes, the CDN picks one per Accept-Encoding:
+ENCODING_SUFFIXES = {
+    "br": ".br",
+    "gzip": ".gz"
+}
+
+# Text formats worth compressing, images and fonts are already compressed:
+COMPRESSIBLE_EXTENSIONS = [".html", ".css", ".js", ".mjs", ".json", ".map", ".svg", ".txt", ".xml", ".webmanifest", ".wasm"]
+
+# Bundlers put a content hash of at least 8 characters, with a digit in it, in front of the extension (main.3f9a1c2e.js,
+# index-B4x9k2Qa.css). Those names change with their content, so they can be cached forever:
+FINGERPRINT_PATTERN = re.compile(r"[.-](?=[A-Za-z0-9_]*[0-9])[A-Za-z0-9_]{8,}\.[A-Za-z0-9]+$")
+
+# Types mimetypes doesn't know on every platform:
+CONTENT_TYPES = {
+    ".js": "application/javascript",
+    ".mjs": "application/javascript",
+    ".map": "application/json",
+    ".webmanifest": "application/manifest+json",
+    ".wasm": "application/wasm",
+    ".woff2": "font/woff2"
+}
+
+# CloudFront Functions code size limit in bytes:
+CLOUDFRONT_FUNCTION_MAX_BYTES = 10240
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as asset:
+        for chunk in iter(lambda: asset.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def content_type(key: str) -> str:
+    extension = os.path.splitext(key)[1].lower()
+    return CONTENT_TYPES.get(extension) or mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+def cache_control(key: str, policies: dict) -> str:
+    """Immutable for fingerprinted names, short-lived for the HTML entry points, the default policy otherwise"""
+    if FINGERPRINT_PATTERN.search(os.path.basename(key)):
+        return policies["immutable"]
+    if key.endswith(".html"):
+        return policies["html"]
+    return policies["default"]
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Maximum compression, without timestamps so the same content always compresses to the same bytes"""
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def compressed_variant(path: str, sha256: str, encoding: str, cache_dir: str) -> str:
+    """Path of the compressed file, kept per content hash in the cache directory so unchanged files aren't recompressed"""
+    variant = os.path.join(cache_dir, f"{sha256}{ENCODING_SUFFIXES[encoding]}")
+    if not os.path.exists(variant):
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path, "rb") as asset:
+            data = compress(asset.read(), encoding)
+        with open(f"{variant}.tmp", "wb") as out:
+            out.write(data)
+        os.replace(f"{variant}.tmp", variant)
+    return variant
+
+def build_manifest(build_dir: str, cache_dir: str, policies: dict, encodings: list) -> list:
+    """
+    Returns one entry per S3 object, sorted by key: {key, path, sha256, content_type, cache_control, content_encoding}.
+    Every compressible file gets a variant per encoding, whatever its size.
+    """
+    if not os.path.isdir(build_dir):
+        raise ValueError(f"build directory {build_dir} does not exist")
+    for encoding in encodings:
+        if encoding not in ENCODING_SUFFIXES:
+            raise ValueError(f"unknown encoding '{encoding}', expected one of {', '.join(ENCODING_SUFFIXES)}")
+    if "br" in encodings and not brotli:
+        raise ValueError("Brotli variants need the brotli package, install it or leave br out of the encodings")
+    manifest = []
+    for root, _, files in os.walk(build_dir):
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            key = os.path.relpath(path, build_dir).replace(os.sep, "/")
+            sha256 = file_sha256(path)
+            entry = {
+                "key": key,
+                "path": path,
+                "sha256": sha256,
+                "content_type": content_type(key),
+                "cache_control": cache_control(key, policies),
+                "content_encoding": None
+            }
+            manifest.append(entry)
+            if os.path.splitext(key)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                for encoding in encodings:
+                    variant = compressed_variant(path, sha256, encoding, cache_dir)
+                    manifest.append({
+                        **entry,
+                        "key": f"{key}{ENCODING_SUFFIXES[encoding]}",
+                        "path": variant,
+                        "sha256": file_sha256(variant),
+                        "content_encoding": encoding
+                    })
+    return sorted(manifest, key=lambda entry: entry["key"])
+
+def precompressed_keys(manifest: list) -> dict:
+    """Keys of the synced files that have precompressed variants, with their encodings"""
+    keys = {}
+    for entry in manifest:
+        if entry["content_encoding"]:
+            original = entry["key"][:-len(ENCODING_SUFFIXES[entry["content_encoding"]])]
+            keys.setdefault(original, []).append(entry["content_encoding"])
+    return keys
+
+def uri_hash(uri: str) -> str:
+    """32-bit FNV-1a over the UTF-16 code units of a URI in base 36, computed the same way by the CloudFront Function"""
+    value = 0x811c9dc5
+    code_units = uri.encode("utf-16-le")
+    for i in range(0, len(code_units), 2):
+        value = ((value ^ int.from_bytes(code_units[i:i + 2], "little")) * 0x01000193) & 0xffffffff
+    return base36(value)
+
+def base36(value: int) -> str:
+    digits = ""
+    while True:
+        value, digit = divmod(value, 36)
+        digits = "0123456789abcdefghijklmnopqrstuvwxyz"[digit] + digits
+        if not value:
+            return digits
+
+def precompressed_request_function(manifest: list) -> str:
+    """
+    CloudFront Function code sending requests for synced files to their precompressed variant, the first encoding the
+    viewer accepts with a non-zero quality. Objects uploaded outside the sync have no variants, so only the URIs of synced
+    keys are rewritten. The keys are embedded as 32-bit hashes to stay within the code size limit for large builds: a
+    URI the function cannot match is served as is, and a false match needs a hash collision.
+    """
+    keys = precompressed_keys(manifest)
+    encodings = [encoding for encoding in ENCODING_SUFFIXES if any(encoding in key_encodings for key_encodings in keys.values())]
+    if any(set(key_encodings) != set(encodings) for key_encodings in keys.values()):
+        raise ValueError("every precompressed file needs the same encodings")
+    hashes = " ".join(sorted({uri_hash(f"/{key}") for key in keys}))
+    checks = "\n".join(
+        f"""    if (accepts(qualities, '{encoding}')) {{ request.uri += '{ENCODING_SUFFIXES[encoding]}'; return request; }}"""
+        for encoding in encodings
+    )
+    code = f"""var SYNCED = ' {hashes} ';
+
+function uriHash(uri) {{
+    var hash = 0x811c9dc5;
+    for (var i = 0; i < uri.length; i++) {{
+        hash ^= uri.charCodeAt(i);
+        hash = (hash + (hash << 1) + (hash << 4) + (hash << 7) + (hash << 8) + (hash << 24)) >>> 0;
+    }}
+    return hash.toString(36);
+}}
+
+function encodingQualities(header) {{
+    var qualities = {{}};
+    header.split(',').forEach(function (part) {{
+        var params = part.split(';');
+        var name = params[0].trim().toLowerCase();
+        var quality = 1;
+        for (var i = 1; i < params.length; i++) {{
+            var param = params[i].trim().split('=');
+            if (param[0].trim().toLowerCase() === 'q') {{ quality = parseFloat(param[1]); }}
+        }}
+        if (name) {{ qualities[name] = quality; }}
+    }});
+    return qualities;
+}}
+
+function accepts(qualities, encoding) {{
+    var quality = encoding in qualities ? qualities[encoding] : qualities['*'];
+    return quality > 0;
+}}
+
+function handler(event) {{
+    var request = event.request;
+    if (SYNCED.indexOf(' ' + uriHash(request.uri) + ' ') === -1) {{ return request; }}
+    var header = request.headers['accept-encoding'];
+    var qualities = encodingQualities(header ? header.value : '');
+{checks}
+    return request;
+}}
+"""
+    if len(code.encode()) > CLOUDFRONT_FUNCTION_MAX_BYTES:
+        raise ValueError(f"{len(keys)} precompressed files do not fit into the {CLOUDFRONT_FUNCTION_MAX_BYTES} byte CloudFront Function limit")
+    return code
@@ -0,0 +1,259 @@
+"""
+Offline program evaluation benchmark: evaluates the stack's module graph under Pulumi mocks, with stubbed AWS invokes,
+and records wall-clock time, peak memory and resource count per module. Timings depend on the machine, so the baseline
+is kept locally: save one before a change and compare against it after. The tests in tests/ use the same evaluation
+to check the registered resources:
+
+    python benchmark.py                                  # evaluate once and print the report
+    python benchmark.py --rounds 5 --save                # median of five runs, saved as the local baseline
+    python benchmark.py --rounds 5 --compare             # fail if time or memory regressed beyond the tolerance
+    python benchmark.py --config az-count=3 --config cilium-profile=throughput
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pulumi
+
+PROJECT_NAME = "pulumi-eks-cilium-demo-webstore"
+BASELINE_FILE = "benchmark_baseline.json"
+
+# Modules __main__.py imports ahead of the stack layers:
+BASE_MODULES = ["settings", "helpers"]
+
+# Required stack config, with placeholder values:
+DEFAULT_CONFIG = {
+    "aws:region": "eu-central-1",
+    "aws:profile": "benchmark",
+    f"{PROJECT_NAME}:flux-github-repo-owner": "benchmark",
+    f"{PROJECT_NAME}:flux-github-repo-name": "benchmark",
+    f"{PROJECT_NAME}:flux-github-token": "benchmark",
+    f"{PROJECT_NAME}:sql-user": "benchmark",
+    f"{PROJECT_NAME}:sql-password": "benchmark",
+    # Measure the uncached provider lookups:
+    f"{PROJECT_NAME}:lookup-cache-ttl": "0"
+}
+
+MOCK_ACCOUNT_ID = "123456789012"
+MOCK_AVAILABILITY_ZONES = ["a", "b", "c", "d", "e", "f"]
+MOCK_VPC_IPV6_CIDR = "2600:1f18:0:ff00::/56"
+# Outputs of the network layer stack, as read by the data and cluster layers:
+MOCK_NETWORK_STACK_OUTPUTS = {
+    "vpc-id": "vpc-mock",
+    "private-subnet-ids": ["subnet-private-a", "subnet-private-b"],
+    "eks-cp-subnet-ids": ["subnet-eks-cp-a", "subnet-eks-cp-b"],
+    "db-subnet-ids": ["subnet-db-a", "subnet-db-b"],
+    "postgresql-subnet-group-name": "demo-postgresql-subnet-group",
+    "redis-subnet-group-name": "demo-redis-subnet-group",
+    "nat-gateway-ids": {"eu-central-1a": "nat-a", "eu-central-1b": "nat-b"},
+    "interface-endpoints": [
+        {"id": f"vpce-{service.replace('.', '-')}", "service-name": f"com.amazonaws.eu-central-1.{service}"}
+        for service in ["ecr.api", "ecr.dkr", "ec2", "sts", "logs", "email-smtp", "cloudformation"]
+    ]
+}
+
+class StackMocks(pulumi.runtime.Mocks):
+    """Records every registered resource against the module being evaluated and answers the invokes the stack makes"""
+    def __init__(self, region: str):
+        self.region = region
+        self.current_module = None
+        self.resources = []
+
+    def new_resource(self, args: pulumi.runtime.MockResourceArgs):
+        self.resources.append({
+            "module": self.current_module,
+            "type": args.typ,
+            "name": args.name,
+            "inputs": args.inputs
+        })
+        state = {**args.inputs, "arn": f"arn:aws:mock:{self.region}:{MOCK_ACCOUNT_ID}:{args.name}"}
+        if args.typ == "pulumi:pulumi:StackReference":
+            state = {"name": args.inputs.get("name"), "outputs": MOCK_NETWORK_STACK_OUTPUTS, "secretOutputNames": []}
+        if args.typ == "aws:ec2/vpc:Vpc" and args.inputs.get("assignGeneratedIpv6CidrBlock"):
+            state["ipv6CidrBlock"] = MOCK_VPC_IPV6_CIDR
+        if args.typ == "aws:elasticache/replicationGroup:ReplicationGroup":
+            # Member clusters are named after the replication group ID, per shard in cluster mode:
+            if args.inputs.get("numNodeGroups"):
+                nodes = int(args.inputs.get("replicasPerNodeGroup", 0)) + 1
+                state["memberClusters"] = [f"{args.name}-id-{shard + 1:04}-{node + 1:03}" for shard in range(int(args.inputs["numNodeGroups"])) for node in range(nodes)]
+            else:
+                state["memberClusters"] = [f"{args.name}-id-{node + 1:03}" for node in range(int(args.inputs.get("numCacheClusters", 1)))]
+        if args.typ == "kubernetes:core/v1:Service" and args.resource_id:
+            state["spec"] = {"clusterIP": "172.20.0.10"}
+        return [args.resource_id or f"{args.name}-id", state]
+
+    def call(self, args: pulumi.runtime.MockCallArgs):
+        if args.token == "aws:index/getCallerIdentity:getCallerIdentity":
+            return {"accountId": MOCK_ACCOUNT_ID, "arn": f"arn:aws:iam::{MOCK_ACCOUNT_ID}:user/benchmark", "userId": "benchmark", "id": MOCK_ACCOUNT_ID}
+        if args.token == "aws:index/getAvailabilityZones:getAvailabilityZones":
+            return {
+                "names": [f"{self.region}{zone}" for zone in MOCK_AVAILABILITY_ZONES],
+                "zoneIds": [f"{self.region}-az{i + 1}" for i in range(len(MOCK_AVAILABILITY_ZONES))],
+                "id": self.region
+            }
+        if args.token == "aws:index/getRegion:getRegion":
+            return {"name": self.region, "id": self.region}
+        if args.token == "aws:index/getPartition:getPartition":
+            return {"partition": "aws", "dnsSuffix": "amazonaws.com", "id": "aws"}
+        return {}
+
+SETTLE_SECONDS = 0.3
+
+def drain(mocks: StackMocks) -> None:
+    """
+    Runs the event loop until the registrations queued by the last import have reached the mocks and fails on any error
+    raised by them. Component resources rehydrate references on their own loops, so registration has to settle instead
+    of being awaited.
+    """
+    loop = asyncio.get_event_loop()
+    registered = -1
+    while registered != len(mocks.resources):
+        registered = len(mocks.resources)
+        loop.run_until_complete(asyncio.sleep(SETTLE_SECONDS))
+    rpc_manager = pulumi.runtime.settings.SETTINGS.rpc_manager
+    if rpc_manager.unhandled_exception is not None:
+        raise rpc_manager.unhandled_exception
+
+def evaluate(config: dict) -> tuple:
+    """Evaluates every program module once, returns the per-module measurements and the registered resources"""
+    mocks = StackMocks(config["aws:region"])
+    pulumi.runtime.set_mocks(mocks, project=PROJECT_NAME, stack="benchmark", preview=True)
+    for key, value in config.items():
+        pulumi.runtime.set_config(key, value)
+
+    results = {}
+    tracemalloc.start()
+    modules = list(BASE_MODULES)
+    while modules:
+        module = modules.pop(0)
+        mocks.current_module = module
+        registered = len(mocks.resources)
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        importlib.import_module(module)
+        drain(mocks)
+        results[module] = {
+            # The last settle interval saw no registrations, it's idle time:
+            "seconds": round(time.perf_counter() - start - SETTLE_SECONDS, 4),
+            "peak_memory_kb": round(tracemalloc.get_traced_memory()[1] / 1024, 1),
+            "resources": len(mocks.resources) - registered
+        }
+        if module == "settings":
+            # Evaluate the layers selected by stack-layer, in the order __main__.py imports them:
+            settings = sys.modules["settings"]
+            modules += [m for layer, layer_modules in settings.stack_layers.items() if settings.deploys_layer(layer) for m in layer_modules]
+    tracemalloc.stop()
+    return results, mocks.resources
+
+def settings_snapshot() -> dict:
+    """The JSON serialisable settings of the evaluated stack, for the tests to compare the resources against"""
+    snapshot = {}
+    for name, value in vars(sys.modules["settings"]).items():
+        if name.startswith("_"):
+            continue
+        try:
+            snapshot[name] = json.loads(json.dumps(value))
+        except (TypeError, ValueError):
+            continue
+    return snapshot
+
+"""
+Reporting and baseline comparison:
+"""
+
+def median_results(rounds: list) -> dict:
+    return {module: {metric: statistics.median(r[module][metric] for r in rounds) for metric in rounds[0][module]} for module in rounds[0]}
+
+def print_report(results: dict) -> None:
+    print(f"{'module':<16}{'seconds':>10}{'peak KiB':>12}{'resources':>11}")
+    for module, r in results.items():
+        print(f"{module:<16}{r['seconds']:>10.3f}{r['peak_memory_kb']:>12.1f}{int(r['resources']):>11}")
+    print(f"{'total':<16}{sum(r['seconds'] for r in results.values()):>10.3f}{max(r['peak_memory_kb'] for r in results.values()):>12.1f}{int(sum(r['resources'] for r in results.values())):>11}")
+
+# Absolute differences below these are measurement noise, whatever the relative change:
+NOISE_FLOOR = {"seconds": 0.05, "peak_memory_kb": 256}
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Time and memory regressions beyond the tolerance fail, resource count changes are reported"""
+    regressions = []
+    for module, r in results.items():
+        base = baseline.get(module)
+        if base is None:
+            print(f"note: {module} is not in the baseline")
+            continue
+        if r["resources"] != base["resources"]:
+            print(f"note: {module} registers {r['resources']} resources, baseline {base['resources']}")
+        for metric in ["seconds", "peak_memory_kb"]:
+            if r[metric] > base[metric] * (1 + tolerance) and r[metric] - base[metric] > NOISE_FLOOR[metric]:
+                regressions.append(f"{module} {metric}: {r[metric]} vs baseline {base[metric]}")
+    return regressions
+
+def parse_config(pairs: list) -> dict:
+    config = dict(DEFAULT_CONFIG)
+    for pair in pairs:
+        key, value = pair.split("=", 1)
+        config[key if ":" in key else f"{PROJECT_NAME}:{key}"] = value
+    return config
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline Pulumi program evaluation benchmark")
+    parser.add_argument("--config", action="append", default=[], help="stack config as key=value, repeatable")
+    parser.add_argument("--rounds", type=int, default=1, help="evaluate in this many fresh processes and take the median")
+    parser.add_argument("--save", action="store_true", help=f"save the results as the baseline in {BASELINE_FILE}")
+    parser.add_argument("--compare", action="store_true", help=f"compare the results against {BASELINE_FILE}")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative time/memory regression")
+    parser.add_argument("--json", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--resources", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.getcwd())
+
+    if args.json:
+        results, resources = evaluate(parse_config(args.config))
+        output = {"results": results}
+        if args.resources:
+            # Inputs that are unknown during a preview are reported as null:
+            output["resources"] = resources
+            output["settings"] = settings_snapshot()
+        print(json.dumps(output, default=lambda value: None))
+        return 0
+
+    # Every round runs in a fresh interpreter, module imports are only evaluated once per process:
+    rounds = []
+    for _ in range(args.rounds):
+        command = [sys.executable, __file__, "--json"] + [f"--config={pair}" for pair in args.config]
+        evaluation = subprocess.run(command, capture_output=True, text=True)
+        if evaluation.returncode != 0:
+            print(f"FAILED evaluation:\n{evaluation.stderr.strip()}")
+            return 1
+        output = json.loads(evaluation.stdout.splitlines()[-1])
+        rounds.append(output["results"])
+
+    results = median_results(rounds)
+    print_report(results)
+
+    if args.save:
+        with open(BASELINE_FILE, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+    if args.compare:
+        with open(BASELINE_FILE) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.stdout.flush()
+    # Skip waiting on the Pulumi runtime's background threads:
+    os._exit(exit_code)
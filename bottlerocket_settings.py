@@ -0,0 +1,131 @@
+import base64
+import json
+
+"""
+Bottlerocket node tuning: renders the TOML user data (kernel sysctls, max-pods, kubelet reservations and image GC)
+and the gp3 volumes shared by the managed nodegroup launch template and the Karpenter node class.
+EKS and Karpenter merge their bootstrap settings (cluster name, endpoint, CA) into this user data.
+Pure python on purpose, so the settings can be rendered without AWS or Pulumi.
+"""
+
+# Bottlerocket boots from a small OS volume and keeps images and container storage on a separate data volume:
+BOTTLEROCKET_OS_VOLUME_DEVICE = "/dev/xvda"
+BOTTLEROCKET_DATA_VOLUME_DEVICE = "/dev/xvdb"
+BOTTLEROCKET_OS_VOLUME_GIB = 4
+
+# gp3 limits: IOPS, throughput (MiB/s), and at most 0.25 MiB/s of throughput per provisioned IOPS:
+GP3_IOPS_RANGE = (3000, 16000)
+GP3_THROUGHPUT_RANGE = (125, 1000)
+GP3_MAX_THROUGHPUT_PER_IOPS = 0.25
+
+# Kubelet memory reservation of the EKS optimized AMIs, grows with the pod density of the node:
+KUBE_RESERVED_MEMORY_BASE_MIB = 255
+KUBE_RESERVED_MEMORY_PER_POD_MIB = 11
+
+def toml_value(value) -> str:
+    """TOML literal of a setting, strings are quoted the same way in TOML and JSON"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    return json.dumps(str(value))
+
+def toml_table(name: str, values: dict) -> list:
+    lines = [f"[{name}]"]
+    for key, value in values.items():
+        lines.append(f"{json.dumps(key) if '.' in key else key} = {toml_value(value)}")
+    return lines
+
+def kube_reserved(max_pods: int, reserved: dict) -> dict:
+    """kube-reserved with the memory derived from the pod density unless it is set explicitly"""
+    if max_pods is None:
+        return dict(reserved)
+    memory = f"{KUBE_RESERVED_MEMORY_BASE_MIB + KUBE_RESERVED_MEMORY_PER_POD_MIB * max_pods}Mi"
+    return {"memory": memory, **reserved}
+
+def render_node_settings(sysctls: dict, kubelet: dict, max_pods: int=None) -> str:
+    """
+    Bottlerocket TOML user data. Without max_pods (Karpenter nodes of any size) the node keeps the max-pods
+    Karpenter computes per instance type, and kube-reserved memory is only set when configured.
+    """
+    high, low = kubelet["image_gc_high_threshold_percent"], kubelet["image_gc_low_threshold_percent"]
+    if not 0 <= low < high <= 100:
+        raise ValueError(f"image GC thresholds must satisfy 0 <= low < high <= 100, got low {low} and high {high}")
+    if max_pods is not None and max_pods < 1:
+        raise ValueError(f"max-pods must be at least 1, got {max_pods}")
+
+    kubernetes = {}
+    if max_pods is not None:
+        kubernetes["max-pods"] = max_pods
+    kubernetes["image-gc-high-threshold-percent"] = high
+    kubernetes["image-gc-low-threshold-percent"] = low
+
+    lines = toml_table("settings.kubernetes", kubernetes)
+    reserved = kube_reserved(max_pods, kubelet["kube_reserved"])
+    if reserved:
+        lines += [""] + toml_table("settings.kubernetes.kube-reserved", reserved)
+    if kubelet["system_reserved"]:
+        lines += [""] + toml_table("settings.kubernetes.system-reserved", kubelet["system_reserved"])
+    if sysctls:
+        # Bottlerocket only accepts sysctl values as strings:
+        lines += [""] + toml_table("settings.kernel.sysctl", {key: str(value) for key, value in sysctls.items()})
+    return "\n".join(lines) + "\n"
+
+def encode_user_data(settings_toml: str) -> str:
+    """Launch templates take their user data base64 encoded"""
+    return base64.b64encode(settings_toml.encode()).decode()
+
+def validate_data_volume(volume: dict) -> dict:
+    """Checks the gp3 data volume against the gp3 IOPS and throughput limits"""
+    iops, throughput = volume["iops"], volume["throughput"]
+    if not GP3_IOPS_RANGE[0] <= iops <= GP3_IOPS_RANGE[1]:
+        raise ValueError(f"gp3 IOPS must be between {GP3_IOPS_RANGE[0]} and {GP3_IOPS_RANGE[1]}, got {iops}")
+    if not GP3_THROUGHPUT_RANGE[0] <= throughput <= GP3_THROUGHPUT_RANGE[1]:
+        raise ValueError(f"gp3 throughput must be between {GP3_THROUGHPUT_RANGE[0]} and {GP3_THROUGHPUT_RANGE[1]} MiB/s, got {throughput}")
+    if throughput > iops * GP3_MAX_THROUGHPUT_PER_IOPS:
+        raise ValueError(f"gp3 throughput of {throughput} MiB/s needs at least {int(throughput / GP3_MAX_THROUGHPUT_PER_IOPS)} IOPS, got {iops}")
+    if volume["size_gib"] < 1:
+        raise ValueError(f"the data volume needs at least 1 GiB, got {volume['size_gib']}")
+    return volume
+
+def volumes(volume: dict) -> list:
+    """OS and data volumes as (device, size GiB, iops, throughput), both gp3 and encrypted"""
+    validate_data_volume(volume)
+    return [
+        (BOTTLEROCKET_OS_VOLUME_DEVICE, BOTTLEROCKET_OS_VOLUME_GIB, GP3_IOPS_RANGE[0], GP3_THROUGHPUT_RANGE[0]),
+        (BOTTLEROCKET_DATA_VOLUME_DEVICE, volume["size_gib"], volume["iops"], volume["throughput"])
+    ]
+
+def launch_template_block_devices(volume: dict) -> list:
+    """block_device_mappings of an EC2 launch template"""
+    return [
+        {
+            "device_name": device,
+            "ebs": {
+                "volume_size": size,
+                "volume_type": "gp3",
+                "iops": iops,
+                "throughput": throughput,
+                "encrypted": "true",
+                "delete_on_termination": "true"
+            }
+        }
+        for device, size, iops, throughput in volumes(volume)
+    ]
+
+def karpenter_block_devices(volume: dict) -> list:
+    """blockDeviceMappings of a Karpenter node class"""
+    return [
+        {
+            "deviceName": device,
+            "ebs": {
+                "volumeSize": f"{size}Gi",
+                "volumeType": "gp3",
+                "iops": iops,
+                "throughput": throughput,
+                "encrypted": True,
+                "deleteOnTermination": True
+            }
+        }
+        for device, size, iops, throughput in volumes(volume)
+    ]
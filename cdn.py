@@ -0,0 +1,185 @@
+from pulumi_aws import cloudfront, s3, ssm
+from pulumi import export, ComponentResource, ResourceOptions, Output, RunError
+
+import json
+
+from settings import general_tags, saleor_cdn_cache_ttls, saleor_cdn_price_class, saleor_cdn_origin_shield_region, cdn_domain_ssm_parameter_names
+from s3 import saleor_dashboard_bucket, saleor_media_bucket, saleor_static_bucket
+from static_assets import saleor_asset_manifests
+from asset_manifest import precompressed_keys, precompressed_request_function
+
+"""
+CloudFront distributions in front of the Saleor dashboard, media and static buckets
+"""
+
+class BucketDistribution(ComponentResource):
+    """
+    A CloudFront distribution serving a private S3 bucket through Origin Access Control, with its own cache policy,
+    Brotli/gzip compression, HTTP/3 and origin shield. The bucket only accepts reads signed by this distribution.
+    """
+    def __init__(self, name: str, bucket: s3.Bucket, ttls: dict, default_root_object: str=None, asset_manifest: list=None, opts: ResourceOptions=None):
+        super().__init__("webstore:cdn:BucketDistribution", name, None, opts)
+
+        # Serve the precompressed variants of synced assets instead of compressing at the edge:
+        function_associations = []
+        if asset_manifest and precompressed_keys(asset_manifest):
+            try:
+                precompressed_function_code = precompressed_request_function(asset_manifest)
+            except ValueError as e:
+                raise RunError(f"Cannot serve the {name} precompressed assets: {e}")
+            precompressed_function = cloudfront.Function(f"{name}-precompressed",
+                name=f"{name}-precompressed",
+                runtime="cloudfront-js-1.0",
+                comment=f"{name} precompressed asset selection",
+                publish=True,
+                code=precompressed_function_code,
+                opts=ResourceOptions(parent=self)
+            )
+            function_associations.append(cloudfront.DistributionDefaultCacheBehaviorFunctionAssociationArgs(
+                event_type="viewer-request",
+                function_arn=precompressed_function.arn
+            ))
+
+        # Cache policy, compressed variants are cached separately per Accept-Encoding:
+        cache_policy = cloudfront.CachePolicy(f"{name}-cache-policy",
+            name=f"{name}-cache-policy",
+            min_ttl=ttls["min"],
+            default_ttl=ttls["default"],
+            max_ttl=ttls["max"],
+            parameters_in_cache_key_and_forwarded_to_origin=cloudfront.CachePolicyParametersInCacheKeyAndForwardedToOriginArgs(
+                enable_accept_encoding_brotli=True,
+                enable_accept_encoding_gzip=True,
+                cookies_config=cloudfront.CachePolicyParametersInCacheKeyAndForwardedToOriginCookiesConfigArgs(
+                    cookie_behavior="none"
+                ),
+                headers_config=cloudfront.CachePolicyParametersInCacheKeyAndForwardedToOriginHeadersConfigArgs(
+                    header_behavior="none"
+                ),
+                query_strings_config=cloudfront.CachePolicyParametersInCacheKeyAndForwardedToOriginQueryStringsConfigArgs(
+                    query_string_behavior="none"
+                )
+            ),
+            opts=ResourceOptions(parent=self)
+        )
+
+        origin_access_control = cloudfront.OriginAccessControl(f"{name}-oac",
+            name=f"{name}-oac",
+            description=f"{name} S3 origin access control",
+            origin_access_control_origin_type="s3",
+            signing_behavior="always",
+            signing_protocol="sigv4",
+            opts=ResourceOptions(parent=self)
+        )
+
+        origin_id = f"{name}-s3-origin"
+        self.distribution = cloudfront.Distribution(f"{name}-distribution",
+            enabled=True,
+            comment=f"{name} distribution",
+            http_version="http2and3",
+            is_ipv6_enabled=True,
+            price_class=saleor_cdn_price_class,
+            default_root_object=default_root_object,
+            origins=[cloudfront.DistributionOriginArgs(
+                origin_id=origin_id,
+                domain_name=bucket.bucket_regional_domain_name,
+                origin_access_control_id=origin_access_control.id,
+                origin_shield=cloudfront.DistributionOriginOriginShieldArgs(
+                    enabled=True,
+                    origin_shield_region=saleor_cdn_origin_shield_region
+                )
+            )],
+            default_cache_behavior=cloudfront.DistributionDefaultCacheBehaviorArgs(
+                target_origin_id=origin_id,
+                viewer_protocol_policy="redirect-to-https",
+                allowed_methods=["GET", "HEAD", "OPTIONS"],
+                cached_methods=["GET", "HEAD"],
+                cache_policy_id=cache_policy.id,
+                compress=True,
+                function_associations=function_associations
+            ),
+            restrictions=cloudfront.DistributionRestrictionsArgs(
+                geo_restriction=cloudfront.DistributionRestrictionsGeoRestrictionArgs(
+                    restriction_type="none"
+                )
+            ),
+            viewer_certificate=cloudfront.DistributionViewerCertificateArgs(
+                cloudfront_default_certificate=True
+            ),
+            tags={**general_tags, "Name": f"{name}-distribution"},
+            opts=ResourceOptions(parent=self)
+        )
+
+        # Block public access and only allow object reads signed by this distribution over TLS:
+        public_access_block = s3.BucketPublicAccessBlock(f"{name}-public-access-block",
+            bucket=bucket.id,
+            block_public_acls=True,
+            block_public_policy=True,
+            ignore_public_acls=True,
+            restrict_public_buckets=True,
+            opts=ResourceOptions(parent=self)
+        )
+
+        s3.BucketPolicy(f"{name}-bucket-policy",
+            bucket=bucket.id,
+            policy=Output.all(bucket.arn, self.distribution.arn).apply(
+                lambda args: json.dumps({
+                    "Version": "2012-10-17",
+                    "Statement": [
+                        {
+                            "Sid": "AllowCloudFrontOriginAccessControl",
+                            "Effect": "Allow",
+                            "Principal": {"Service": "cloudfront.amazonaws.com"},
+                            "Action": "s3:GetObject",
+                            "Resource": f"{args[0]}/*",
+                            "Condition": {
+                                "StringEquals": {"AWS:SourceArn": args[1]}
+                            }
+                        },
+                        {
+                            "Sid": "DenyInsecureTransport",
+                            "Effect": "Deny",
+                            "Principal": "*",
+                            "Action": "s3:*",
+                            "Resource": [args[0], f"{args[0]}/*"],
+                            "Condition": {
+                                "Bool": {"aws:SecureTransport": "false"}
+                            }
+                        }
+                    ]
+                })),
+            opts=ResourceOptions(parent=self, depends_on=[public_access_block])
+        )
+
+        self.domain_name = self.distribution.domain_name
+        self.register_outputs({
+            "distribution_arn": self.distribution.arn,
+            "domain_name": self.domain_name
+        })
+
+"""
+One distribution per bucket: long-lived immutable static assets, shorter lived media and the dashboard SPA
+"""
+saleor_dashboard_cdn = BucketDistribution("saleor-dashboard-cdn", saleor_dashboard_bucket, saleor_cdn_cache_ttls["dashboard"], default_root_object="index.html",
+    asset_manifest=saleor_asset_manifests.get("dashboard"))
+saleor_media_cdn = BucketDistribution("saleor-media-cdn", saleor_media_bucket, saleor_cdn_cache_ttls["media"])
+saleor_static_cdn = BucketDistribution("saleor-static-cdn", saleor_static_bucket, saleor_cdn_cache_ttls["static"],
+    asset_manifest=saleor_asset_manifests.get("static"))
+
+saleor_cdns = {
+    "dashboard": saleor_dashboard_cdn,
+    "media": saleor_media_cdn,
+    "static": saleor_static_cdn
+}
+
+"""
+Export the distribution domain names and populate SSM parameter store with them:
+"""
+for component, distribution in saleor_cdns.items():
+    export(f"saleor-{component}-cdn-domain-name", distribution.domain_name)
+    ssm.Parameter(f"saleor-{component}-cdn-domain-name",
+        name=cdn_domain_ssm_parameter_names[component],
+        description=f"CloudFront domain name serving the Saleor {component} bucket",
+        type="String",
+        value=distribution.domain_name,
+        tags={**general_tags, "Name": f"saleor-{component}-cdn-domain-name"}
+    )
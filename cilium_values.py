@@ -0,0 +1,353 @@
+"""
+Cilium Helm values: the fixed ENI/kube-proxy-free base values plus selectable datapath performance profiles.
+Pure python on purpose, so every profile can be rendered and validated without a cluster.
+"""
+
+import json
+
+# Datapath profiles, every key maps to a Cilium feature rendered by datapath_values():
+#   baseline   - the original values, no datapath tuning
+#   throughput - Bandwidth Manager, eBPF host routing, socket LB and larger BPF maps
+#   latency    - eBPF host routing, socket LB and preallocated BPF maps
+# BBR and XDP acceleration are left out of the profiles, the default nodes can't run them. cilium-bbr and
+# cilium-xdp-acceleration enable them on nodes that can.
+CILIUM_DATAPATH_PROFILES = {
+    "baseline": {},
+    "throughput": {
+        "bandwidth_manager": True,
+        "host_routing": True,
+        "socket_lb": True,
+        "bpf_map_dynamic_size_ratio": 0.005,
+        "maglev_table_size": 65521
+    },
+    "latency": {
+        "host_routing": True,
+        "socket_lb": True,
+        "preallocate_maps": True,
+        "maglev_table_size": 16381
+    }
+}
+
+# The agent refuses to start with BBR below kernel 5.18, and the ENA driver only attaches XDP programs up to an MTU of
+# 3498, while ENIs default to 9001:
+BBR_MIN_KERNEL_VERSION = (5, 18)
+ENA_XDP_MAX_MTU = 3498
+
+# Oldest Cilium release supporting each feature through the Helm values rendered below:
+CILIUM_FEATURE_MIN_VERSIONS = {
+    "bandwidth_manager": (1, 12),
+    "bbr": (1, 12),
+    "host_routing": (1, 10),
+    "socket_lb": (1, 12),
+    "xdp_acceleration": (1, 8),
+    "preallocate_maps": (1, 8),
+    "bpf_map_dynamic_size_ratio": (1, 8),
+    "bpf_ct_tcp_max": (1, 8),
+    "bpf_ct_any_max": (1, 8),
+    "maglev_table_size": (1, 10)
+}
+
+# Maglev lookup table sizes accepted by Cilium, all primes:
+MAGLEV_TABLE_SIZES = [251, 509, 1021, 2039, 4093, 8191, 16381, 32749, 65521, 131071]
+
+# Connection tracking table limits enforced by the Cilium agent:
+BPF_CT_MIN_ENTRIES = 2 ** 10
+BPF_CT_MAX_ENTRIES = 2 ** 24
+
+def parse_version(version: str) -> tuple:
+    """Turns "1.12.5" into (1, 12, 5)"""
+    return tuple(int(part) for part in version.split("-")[0].split("."))
+
+def deep_merge(base: dict, override: dict) -> dict:
+    """Recursively merges two Helm values dicts, values from override win"""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def resolve_datapath_features(profile: str, overrides: dict=None) -> dict:
+    """Profile features with the stack config overrides applied, unset (None) overrides are ignored"""
+    if profile not in CILIUM_DATAPATH_PROFILES:
+        raise ValueError(f"unknown Cilium datapath profile '{profile}', expected one of {', '.join(CILIUM_DATAPATH_PROFILES)}")
+    features = dict(CILIUM_DATAPATH_PROFILES[profile])
+    features.update({key: value for key, value in (overrides or {}).items() if value is not None})
+    return features
+
+def validate_datapath_features(features: dict, version: str, node_kernel_version: str, node_mtu: int) -> None:
+    """Rejects feature combinations the pinned Cilium release or the nodes can't run"""
+    release = parse_version(version)
+    for feature, enabled in features.items():
+        if feature not in CILIUM_FEATURE_MIN_VERSIONS:
+            raise ValueError(f"unknown Cilium datapath feature '{feature}'")
+        min_version = CILIUM_FEATURE_MIN_VERSIONS[feature]
+        if enabled and release[:2] < min_version:
+            raise ValueError(f"'{feature}' needs Cilium >= {'.'.join(map(str, min_version))}, pinned release is {version}")
+
+    if features.get("bbr") and not features.get("bandwidth_manager"):
+        raise ValueError("'bbr' needs 'bandwidth_manager' to be enabled")
+    if features.get("bbr") and parse_version(node_kernel_version)[:2] < BBR_MIN_KERNEL_VERSION:
+        raise ValueError(f"'bbr' needs a node kernel >= {'.'.join(map(str, BBR_MIN_KERNEL_VERSION))}, the nodes run {node_kernel_version}")
+    if features.get("xdp_acceleration") and node_mtu > ENA_XDP_MAX_MTU:
+        raise ValueError(f"'xdp_acceleration' needs a node MTU <= {ENA_XDP_MAX_MTU} on ENA, the nodes use {node_mtu}")
+    maglev_table_size = features.get("maglev_table_size")
+    if maglev_table_size is not None and maglev_table_size not in MAGLEV_TABLE_SIZES:
+        raise ValueError(f"maglev table size must be one of {MAGLEV_TABLE_SIZES}, got {maglev_table_size}")
+    ratio = features.get("bpf_map_dynamic_size_ratio")
+    if ratio is not None and not 0 < ratio <= 1:
+        raise ValueError(f"BPF map dynamic size ratio must be in (0, 1], got {ratio}")
+    for feature in ["bpf_ct_tcp_max", "bpf_ct_any_max"]:
+        entries = features.get(feature)
+        if entries is not None and not BPF_CT_MIN_ENTRIES <= entries <= BPF_CT_MAX_ENTRIES:
+            raise ValueError(f"'{feature}' must be between {BPF_CT_MIN_ENTRIES} and {BPF_CT_MAX_ENTRIES}, got {entries}")
+
+def datapath_values(profile: str, version: str, node_kernel_version: str, node_mtu: int, overrides: dict=None) -> dict:
+    """Validated Helm values fragment for a datapath profile on nodes with the given kernel version and MTU"""
+    features = resolve_datapath_features(profile, overrides)
+    validate_datapath_features(features, version, node_kernel_version, node_mtu)
+
+    values = {}
+    if features.get("bandwidth_manager"):
+        values = deep_merge(values, {"bandwidthManager": {"enabled": True, "bbr": bool(features.get("bbr"))}})
+    if features.get("host_routing"):
+        # eBPF host routing is only used together with BPF masquerading:
+        values = deep_merge(values, {"bpf": {"masquerade": True, "hostLegacyRouting": False}})
+    if features.get("socket_lb"):
+        values = deep_merge(values, {"socketLB": {"enabled": True}})
+    if features.get("xdp_acceleration"):
+        values = deep_merge(values, {"loadBalancer": {"acceleration": "native"}})
+    if features.get("preallocate_maps"):
+        values = deep_merge(values, {"bpf": {"preallocateMaps": True}})
+    if features.get("bpf_map_dynamic_size_ratio") is not None:
+        values = deep_merge(values, {"bpf": {"mapDynamicSizeRatio": features["bpf_map_dynamic_size_ratio"]}})
+    if features.get("bpf_ct_tcp_max") is not None:
+        values = deep_merge(values, {"bpf": {"ctTcpMax": features["bpf_ct_tcp_max"]}})
+    if features.get("bpf_ct_any_max") is not None:
+        values = deep_merge(values, {"bpf": {"ctAnyMax": features["bpf_ct_any_max"]}})
+    if features.get("maglev_table_size") is not None:
+        values = deep_merge(values, {"maglev": {"tableSize": features["maglev_table_size"]}})
+    return values
+
+def eni_ipam_values(prefix_delegation: bool, version: str, cni_config_map: str) -> dict:
+    """Helm values fragment for ENI prefix delegation and the custom CNI configuration carrying the pre-allocation settings"""
+    if prefix_delegation and parse_version(version)[:2] < (1, 11):
+        raise ValueError(f"ENI prefix delegation needs Cilium >= 1.11, pinned release is {version}")
+    return {
+        "eni": {
+            "awsEnablePrefixDelegation": prefix_delegation
+        },
+        "cni": {
+            "customConf": True,
+            "configMap": cni_config_map
+        }
+    }
+
+def render_eni_cni_config(eni_ipam: dict) -> str:
+    """
+    CNI configuration read by every Cilium agent, the ipam block seeds the CiliumNode pre-allocate, min-allocate
+    and max-above-watermark settings used by the operator when it attaches ENIs and assigns IPs.
+    """
+    for setting, value in eni_ipam.items():
+        if value < 0:
+            raise ValueError(f"ENI IPAM setting '{setting}' can't be negative, got {value}")
+    return json.dumps({
+        "cniVersion": "0.3.1",
+        "name": "cilium",
+        "plugins": [
+            {
+                "cniVersion": "0.3.1",
+                "type": "cilium-cni",
+                "eni": {
+                    "subnet-tags": {
+                        "cilium-pod-interfaces": "private"
+                    }
+                },
+                "ipam": eni_ipam
+            }
+        ]
+    }, indent=2)
+
+def local_redirect_values(enabled: bool, version: str) -> dict:
+    """Helm values fragment for Local Redirect Policies, used to send kube-dns traffic to the node-local DNS cache"""
+    if not enabled:
+        return {}
+    if parse_version(version)[:2] < (1, 9):
+        raise ValueError(f"Local Redirect Policies need Cilium >= 1.9, pinned release is {version}")
+    return {"localRedirectPolicy": True}
+
+# Hubble metrics accepted by the agent, with the options rendered for each. httpV2 labels the request metrics with the
+# source namespace and destination workload (pod name without the generated suffix), so latency can be split per service:
+HUBBLE_METRIC_OPTIONS = {
+    "dns": "query;ignoreAAAA",
+    "drop": None,
+    "tcp": None,
+    "flow": None,
+    "port-distribution": None,
+    "icmp": None,
+    "http": None,
+    "httpV2": "sourceContext=namespace;destinationContext=pod-short"
+}
+
+# Oldest Cilium release supporting each Hubble feature:
+HUBBLE_FEATURE_MIN_VERSIONS = {
+    "httpV2": (1, 12),
+    "exemplars": (1, 13),
+    "flow_export": (1, 11),
+    "flow_export_filters": (1, 13)
+}
+
+def require_hubble_feature(feature: str, version: str) -> None:
+    min_version = HUBBLE_FEATURE_MIN_VERSIONS[feature]
+    if parse_version(version)[:2] < min_version:
+        raise ValueError(f"Hubble '{feature}' needs Cilium >= {'.'.join(map(str, min_version))}, pinned release is {version}")
+
+def hubble_metric(name: str, http_exemplars: bool) -> str:
+    """Metric entry for hubble.metrics.enabled with its options, e.g. dns:query;ignoreAAAA"""
+    if name not in HUBBLE_METRIC_OPTIONS:
+        raise ValueError(f"unknown Hubble metric '{name}', expected one of {', '.join(HUBBLE_METRIC_OPTIONS)}")
+    options = [option for option in [HUBBLE_METRIC_OPTIONS[name], "exemplars=true" if name == "httpV2" and http_exemplars else None] if option]
+    return f"{name}:{';'.join(options)}" if options else name
+
+def observability_values(version: str, metrics: list, http_exemplars: bool=False, flow_export: dict=None, prometheus: bool=True) -> dict:
+    """
+    Helm values fragment for Hubble metrics, the agent and operator Prometheus endpoints and the Hubble flow exporter.
+    flow_export takes the path, max_size_mb, max_backups, allowlist and denylist of the exporter, no path disables it.
+    """
+    if "httpV2" in metrics:
+        require_hubble_feature("httpV2", version)
+    if http_exemplars:
+        if "httpV2" not in metrics:
+            raise ValueError("Hubble HTTP exemplars need the 'httpV2' metric")
+        require_hubble_feature("exemplars", version)
+
+    values = {}
+    if metrics:
+        hubble_metrics = {"enabled": [hubble_metric(name, http_exemplars) for name in metrics]}
+        if http_exemplars:
+            # Exemplars are only exposed in the OpenMetrics format:
+            hubble_metrics["enableOpenMetrics"] = True
+        values = deep_merge(values, {"hubble": {"metrics": hubble_metrics}})
+    if prometheus:
+        values = deep_merge(values, {"prometheus": {"enabled": True}, "operator": {"prometheus": {"enabled": True}}})
+
+    flow_export = flow_export or {}
+    if flow_export.get("path"):
+        require_hubble_feature("flow_export", version)
+        # The exporter has no Helm values in the pinned release, it is configured through the agent options:
+        export_config = {
+            "hubble-export-file-path": flow_export["path"],
+            "hubble-export-file-max-size-mb": str(flow_export.get("max_size_mb", 10)),
+            "hubble-export-file-max-backups": str(flow_export.get("max_backups", 5))
+        }
+        for name in ["allowlist", "denylist"]:
+            if flow_export.get(name):
+                require_hubble_feature("flow_export_filters", version)
+                # The agent decodes the filters as a stream of JSON objects:
+                export_config[f"hubble-export-{name}"] = " ".join(json.dumps(flow_filter) for flow_filter in flow_export[name])
+        values = deep_merge(values, {"extraConfig": export_config})
+    elif flow_export.get("allowlist") or flow_export.get("denylist"):
+        raise ValueError("Hubble flow export filters need an export path")
+    return values
+
+# Oldest Cilium release supporting each ingress setting:
+INGRESS_FEATURE_MIN_VERSIONS = {
+    "shared_mode": (1, 13),
+    "service_annotations": (1, 13),
+    "proxy_protocol": (1, 14),
+    "envoy": (1, 14)
+}
+INGRESS_MODES = ["dedicated", "shared"]
+
+# Envoy settings and the Helm values of the standalone Envoy DaemonSet they map to:
+ENVOY_HELM_VALUES = {
+    "connect_timeout_seconds": "connectTimeoutSeconds",
+    "max_requests_per_connection": "maxRequestsPerConnection",
+    "idle_timeout_seconds": "idleTimeoutDurationSeconds",
+    "max_connection_duration_seconds": "maxConnectionDurationSeconds",
+    "resources": "resources"
+}
+
+def require_ingress_feature(feature: str, version: str) -> None:
+    min_version = INGRESS_FEATURE_MIN_VERSIONS[feature]
+    if parse_version(version)[:2] < min_version:
+        raise ValueError(f"Cilium ingress '{feature}' needs Cilium >= {'.'.join(map(str, min_version))}, pinned release is {version}")
+
+def nlb_service_annotations(public_subnets: list, cross_zone: bool, proxy_protocol: bool) -> dict:
+    """AWS Load Balancer Controller annotations for an internet-facing NLB with IP targets in the given subnets"""
+    annotations = {
+        "service.beta.kubernetes.io/aws-load-balancer-type": "external",
+        "service.beta.kubernetes.io/aws-load-balancer-nlb-target-type": "ip",
+        "service.beta.kubernetes.io/aws-load-balancer-scheme": "internet-facing",
+        "service.beta.kubernetes.io/aws-load-balancer-subnets": ",".join(public_subnets),
+        "service.beta.kubernetes.io/aws-load-balancer-attributes": f"load_balancing.cross_zone.enabled={str(cross_zone).lower()}"
+    }
+    if proxy_protocol:
+        annotations["service.beta.kubernetes.io/aws-load-balancer-proxy-protocol"] = "*"
+    return annotations
+
+def ingress_values(version: str, ingress: dict, envoy: dict, public_subnets: list) -> dict:
+    """
+    Helm values fragment for the Cilium ingress controller: load balancer mode, NLB Service annotations and Envoy
+    tuning. Unset (None) Envoy settings are left to the chart defaults.
+    """
+    mode = ingress.get("mode", "dedicated")
+    if mode not in INGRESS_MODES:
+        raise ValueError(f"unknown Cilium ingress mode '{mode}', expected one of {', '.join(INGRESS_MODES)}")
+    if ingress.get("proxy_protocol") and not ingress.get("nlb"):
+        raise ValueError("ingress proxy protocol is only sent by the NLB, enable the NLB as well")
+
+    values = {"ingressController": {"enabled": True}}
+    if mode == "shared":
+        require_ingress_feature("shared_mode", version)
+        values = deep_merge(values, {"ingressController": {"loadbalancerMode": "shared"}})
+    if ingress.get("nlb"):
+        require_ingress_feature("service_annotations", version)
+        annotations = nlb_service_annotations(public_subnets, ingress.get("cross_zone", True), ingress.get("proxy_protocol", False))
+        values = deep_merge(values, {"ingressController": {"service": {"annotations": annotations}}})
+    if ingress.get("proxy_protocol"):
+        require_ingress_feature("proxy_protocol", version)
+        values = deep_merge(values, {"ingressController": {"enableProxyProtocol": True}})
+
+    envoy_values = {ENVOY_HELM_VALUES[setting]: value for setting, value in (envoy or {}).items() if value is not None}
+    if envoy_values:
+        require_ingress_feature("envoy", version)
+        values = deep_merge(values, {"envoy": {"enabled": True, **envoy_values}})
+    return values
+
+def render_cilium_values(iam_role_arn: str, k8s_service_host: str, *extra_values: dict) -> dict:
+    """Base values for ENI IPAM with strict kube-proxy replacement, merged with any extra values fragments"""
+    values = {
+        "ingressController": {
+            "enabled": True,
+        },
+        "eni": {
+            "enabled": True,
+            "iamRole": iam_role_arn,
+            "updateEC2AdapterLimitViaAPI": True,
+            "awsReleaseExcessIPs": True,
+            "subnetTagsFilter": "cilium-pod-interfaces=private",
+        },
+        "ipam": {
+            "mode": "eni",
+        },
+        "egressMasqueradeInterfaces": "eth0",
+        "tunnel": "disabled",
+        "loadBalancer": {
+            "algorithm": "maglev",
+        },
+        "kubeProxyReplacement": "strict",
+        "k8sServiceHost": k8s_service_host.replace("https://",""),
+        "hubble": {
+            "relay": {
+                "enabled": True,
+            },
+            "ui": {
+                "enabled": True
+            }
+        }
+    }
+    for extra in extra_values:
+        values = deep_merge(values, extra)
+    return values
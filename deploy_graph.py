@@ -0,0 +1,149 @@
+"""
+Deployment critical-path analyzer: builds the resource DAG from a mocked evaluation of the program, weights every
+resource with a typical AWS create duration, and reports the critical path of a cold deploy plus every explicit
+depends_on edge that carries no data dependency, flagging the ones already implied by other edges:
+
+    python deploy_graph.py
+    python deploy_graph.py --config node-local-dns=true --top 20
+"""
+
+import argparse
+import os
+import sys
+
+from pulumi.runtime.mocks import MockMonitor
+
+import benchmark
+
+# Typical create durations in seconds, resources not listed take DEFAULT_CREATE_SECONDS (Kubernetes objects
+# KUBERNETES_CREATE_SECONDS, local component resources nothing):
+TYPICAL_CREATE_SECONDS = {
+    "eks:index:Cluster": 600,
+    "eks:index:ManagedNodeGroup": 240,
+    "aws:eks/addon:Addon": 60,
+    "aws:ec2/natGateway:NatGateway": 100,
+    "aws:ec2/vpcEndpoint:VpcEndpoint": 90,
+    "aws:rds/instance:Instance": 420,
+    "aws:rds/proxy:Proxy": 240,
+    "aws:rds/proxyTarget:ProxyTarget": 120,
+    "aws:elasticache/replicationGroup:ReplicationGroup": 600,
+    "aws:cloudfront/distribution:Distribution": 240,
+    "aws:route53/zone:Zone": 45,
+    "aws:iam/role:Role": 8,
+    "aws:iam/instanceProfile:InstanceProfile": 8,
+    "kubernetes:helm.sh/v3:Release": 90,
+    "kubernetes:batch/v1:Job": 60,
+    "kubernetes:apps/v1:DaemonSet": 30
+}
+DEFAULT_CREATE_SECONDS = 5
+KUBERNETES_CREATE_SECONDS = 2
+
+def create_seconds(node: dict) -> int:
+    if node["type"] in TYPICAL_CREATE_SECONDS:
+        return TYPICAL_CREATE_SECONDS[node["type"]]
+    if not node["custom"]:
+        return 0
+    if node["type"].startswith("kubernetes:"):
+        return KUBERNETES_CREATE_SECONDS
+    return DEFAULT_CREATE_SECONDS
+
+def record_graph(graph: dict) -> None:
+    """Makes the mock monitor record every registration as urn -> {type, name, custom, data, explicit, provider}"""
+    register = MockMonitor.RegisterResource
+
+    def recording_register(self, request):
+        response = register(self, request)
+        data = {urn for deps in request.propertyDependencies.values() for urn in deps.urns}
+        graph[response.urn] = {
+            "type": request.type,
+            "name": request.name,
+            "custom": request.custom,
+            "data": data,
+            "explicit": set(request.dependencies) - data,
+            # Provider references are "<urn>::<id>":
+            "provider": {request.provider.rsplit("::", 1)[0]} if request.provider else set()
+        }
+        return response
+
+    MockMonitor.RegisterResource = recording_register
+
+"""
+Graph analysis, nodes are URNs and every edge points from a resource to one it waits for:
+"""
+
+def edges(node: dict) -> set:
+    return node["data"] | node["explicit"] | node["provider"]
+
+def critical_path(graph: dict) -> list:
+    """Longest chain of create durations as [(urn, finish seconds)], the last entry finishes the deploy"""
+    finish = {}
+    via = {}
+
+    def finish_time(urn: str) -> int:
+        if urn not in finish:
+            waits = [(finish_time(dep), dep) for dep in edges(graph[urn]) if dep in graph]
+            start, via[urn] = max(waits, default=(0, None))
+            finish[urn] = start + create_seconds(graph[urn])
+        return finish[urn]
+
+    last = max(graph, key=finish_time)
+    path = []
+    while last is not None:
+        path.append((last, finish[last]))
+        last = via[last]
+    return list(reversed(path))
+
+def reachable(graph: dict, start: set) -> set:
+    seen = set()
+    stack = list(start)
+    while stack:
+        urn = stack.pop()
+        if urn in seen or urn not in graph:
+            continue
+        seen.add(urn)
+        stack.extend(edges(graph[urn]))
+    return seen
+
+def ordering_only_edges(graph: dict) -> list:
+    """
+    Explicit edges without a data dependency as (urn, dependency, implied), implied is True when the
+    dependency is already reached through the other edges of the resource and the edge can be dropped
+    """
+    report = []
+    for urn, node in graph.items():
+        for dep in sorted(node["explicit"]):
+            others = edges(node) - {dep}
+            report.append((urn, dep, dep in reachable(graph, others)))
+    return report
+
+def label(graph: dict, urn: str) -> str:
+    node = graph.get(urn)
+    return f"{node['name']} ({node['type']})" if node else urn.split("::")[-1]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Critical path and redundant depends_on report of a cold deploy")
+    parser.add_argument("--config", action="append", default=[], help="stack config as key=value, repeatable")
+    parser.add_argument("--top", type=int, default=0, help="only print the last N steps of the critical path")
+    args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.getcwd())
+
+    graph = {}
+    record_graph(graph)
+    benchmark.evaluate(benchmark.parse_config(args.config))
+
+    path = critical_path(graph)
+    print(f"Critical path of a cold deploy, about {path[-1][1] // 60} min over {len(graph)} resources:")
+    for urn, finish in path[-args.top:] if args.top else path:
+        print(f"  {finish:>6}s  {label(graph, urn)}")
+
+    print("\nExplicit depends_on edges without a data dependency:")
+    for urn, dep, implied in ordering_only_edges(graph):
+        print(f"  {'redundant' if implied else 'ordering '}  {label(graph, urn)} -> {label(graph, dep)}")
+    return 0
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.stdout.flush()
+    # Skip waiting on the Pulumi runtime's background threads:
+    os._exit(exit_code)
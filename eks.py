@@ -1,14 +1,17 @@
 from pulumi_aws import iam, ec2, eks, config, cloudwatch
 import pulumi_eks as eks_provider
-from pulumi import export, ResourceOptions, Output
+from pulumi import export, log, ResourceOptions, Output, RunError
 import pulumi_kubernetes as k8s
 from pulumi_kubernetes.helm.v3 import Release, ReleaseArgs, RepositoryOptsArgs
 
 import json
 
-from settings import general_tags, cluster_descriptor, flux_github_repo_owner, flux_github_repo_name, flux_github_token, flux_cli_version, cilium_release_version, saleor_storefront_bucket_name, saleor_dashboard_bucket_name, saleor_media_bucket_name, saleor_static_bucket_name, sql_connection_string_ssm_parameter_name, redis_connection_string_ssm_parameter_name, deployment_region, account_id
-from vpc import demo_vpc, demo_private_subnets, demo_eks_cp_subnets
+from settings import general_tags, cluster_descriptor, flux_github_repo_owner, flux_github_repo_name, flux_github_token, flux_cli_version, cilium_release_version, cilium_datapath_profile, cilium_datapath_overrides, node_kernel_version, node_mtu, cilium_eni_prefix_delegation, cilium_eni_ipam, cilium_prometheus_enabled, hubble_metrics, hubble_http_exemplars, hubble_flow_export, hubble_l7_visibility_enabled, saleor_l7_visibility_ports, cilium_ingress, cilium_envoy, expected_nodes_per_az, node_instance_type, node_max_pods, node_sysctls, node_kubelet, node_data_volume, coredns_addon_version, coredns_replicas, coredns_cache_ttl, coredns_resources, coredns_autoscaler_enabled, node_local_dns_enabled, demo_az_count, demo_private_subnet_cidrs, demo_dual_stack, saleor_storefront_bucket_name, saleor_dashboard_bucket_name, saleor_media_bucket_name, saleor_static_bucket_name, sql_connection_string_ssm_parameter_name, sql_replica_connection_string_ssm_parameter_name, redis_connection_string_ssm_parameter_name, redis_reader_connection_string_ssm_parameter_name, redis_cluster_url_ssm_parameter_name, cdn_domain_ssm_parameter_names, deployment_region, account_id
+from network import vpc_id, demo_azs, private_subnet_ids, eks_cp_subnet_ids
 from helpers import create_iam_role, create_oidc_role, create_policy
+from cilium_values import datapath_values, eni_ipam_values, local_redirect_values, observability_values, ingress_values, render_eni_cni_config, render_cilium_values
+from ip_capacity import eni_ips_reserved_per_node, node_ip_capacity, az_reservation_report, capacity_report
+from bottlerocket_settings import render_node_settings, encode_user_data, launch_template_block_devices
 
 """
 Shared EKS resources: IAM policies for EKS, Karpenter and Cilium
@@ -47,7 +50,7 @@ Node security group:
 # Create a custom default demo EKS cluster nodegroup security group:
 demo_nodegroup_security_group = ec2.SecurityGroup(f"custom-node-attach-{cluster_descriptor}",
     description=f"{cluster_descriptor} custom node security group",
-    vpc_id=demo_vpc.id,
+    vpc_id=vpc_id,
     tags={**general_tags, "Name": f"custom-node-attach-{cluster_descriptor}", "karpenter.sh/discovery": f"{cluster_descriptor}"}
 )
 
@@ -68,6 +71,7 @@ demo_nodegroup_security_group_oubound_custom_cidrs = ec2.SecurityGroupRule(f"out
     protocol="-1",
     from_port=0,
     cidr_blocks=["0.0.0.0/0"],
+    ipv6_cidr_blocks=["::/0"] if demo_dual_stack else None,
     security_group_id=demo_nodegroup_security_group.id
 )
 
@@ -77,7 +81,7 @@ Cluster security group:
 # Create a default demo EKS cluster security group:
 demo_cluster_security_group = ec2.SecurityGroup(f"custom-cluster-attach-{cluster_descriptor}",
     description=f"{cluster_descriptor} custom security group",
-    vpc_id=demo_vpc.id,
+    vpc_id=vpc_id,
     tags={**general_tags, "Name": f"custom-cluster-attach-{cluster_descriptor}"}
 )
 
@@ -108,6 +112,7 @@ demo_cluster_security_group_oubound_custom_cidrs = ec2.SecurityGroupRule(f"outbo
     protocol="-1",
     from_port=0,
     cidr_blocks=["0.0.0.0/0"],
+    ipv6_cidr_blocks=["::/0"] if demo_dual_stack else None,
     security_group_id=demo_cluster_security_group.id
 )
 
@@ -146,7 +151,7 @@ demo_eks_loggroup = cloudwatch.LogGroup("demo-eks-loggroup",
 # Create the cluster control plane:
 demo_eks_cluster = eks_provider.Cluster(f"eks-{cluster_descriptor}",
     name=f"{cluster_descriptor}",
-    vpc_id=demo_vpc.id,
+    vpc_id=vpc_id,
     instance_role=karpenter_node_role,
     cluster_security_group=demo_cluster_security_group,
     create_oidc_provider=True,
@@ -161,7 +166,7 @@ demo_eks_cluster = eks_provider.Cluster(f"eks-{cluster_descriptor}",
     endpoint_public_access=True,
     enabled_cluster_log_types=["api", "audit", "authenticator", "controllerManager", "scheduler"],
     public_access_cidrs=["0.0.0.0/0"],
-    subnet_ids=[s.id for s in demo_eks_cp_subnets],
+    subnet_ids=eks_cp_subnet_ids,
     default_addons_to_remove=["coredns", "kube-proxy", "vpc-cni"],
     tags={**general_tags, "Name": f"{cluster_descriptor}"},
     fargate=False,
@@ -178,8 +183,9 @@ demo_eks_cluster_oidc_url = demo_eks_cluster.core.oidc_provider.url
 Cilium service account, Karpenter service account:
 """
 
-# Create an IAM role for Cilium CNI:
-iam_role_vpc_cni_service_account_role = create_oidc_role(f"{cluster_descriptor}-cilium", "kube-system", demo_eks_cluster_oidc_arn, demo_eks_cluster_oidc_url, "cilium-operator", cni_service_account_policy_arns)
+# Create an IAM role for Cilium CNI, including the ENI and prefix delegation permissions of the Cilium operator:
+iam_role_cilium_operator_eni_policy = create_policy(f"{cluster_descriptor}-cilium-operator-eni-policy", "cilium_operator_eni_policy.json")
+iam_role_vpc_cni_service_account_role = create_oidc_role(f"{cluster_descriptor}-cilium", "kube-system", demo_eks_cluster_oidc_arn, demo_eks_cluster_oidc_url, "cilium-operator", cni_service_account_policy_arns + [iam_role_cilium_operator_eni_policy.arn])
 export("cilium-oidc-role-arn", iam_role_vpc_cni_service_account_role.arn)
 
 # Create a Karpenter IAM role scoped to karpenter namespace:
@@ -194,8 +200,7 @@ Kubernetes Pulumi provider to create objects inside the cluster:
 # Create a kubernetes provider:
 role_provider = k8s.Provider(f"{cluster_descriptor}-kubernetes-provider",
     kubeconfig=demo_eks_cluster.kubeconfig,
-    enable_server_side_apply=True,
-    opts=ResourceOptions(depends_on=[demo_eks_cluster])
+    enable_server_side_apply=True
 )
 
 # Patch the aws-node DaemonSet to make sure it's unshedulable to any node in the cluster, using server side apply:
@@ -227,8 +232,7 @@ patch_aws_node = k8s.apps.v1.DaemonSetPatch("aws-node-patch",
         )
     ),
     opts=ResourceOptions(
-        provider=role_provider,
-        depends_on=[demo_eks_cluster]
+        provider=role_provider
     )
 )
 
@@ -239,6 +243,45 @@ Create a managed node group and install Cilium via helm in parallel. A managed n
 without the CNI daemon running and the helm chart will fail to install if no nodes are available. Let the race begin!
 """
 
+# Render the datapath profile and ENI IPAM settings up front, so invalid combinations fail the preview:
+try:
+    cilium_datapath_values = datapath_values(cilium_datapath_profile, cilium_release_version, node_kernel_version, node_mtu, cilium_datapath_overrides)
+    cilium_eni_values = eni_ipam_values(cilium_eni_prefix_delegation, cilium_release_version, "cilium-cni-configuration")
+    cilium_eni_cni_config = render_eni_cni_config(cilium_eni_ipam)
+    cilium_local_redirect_values = local_redirect_values(node_local_dns_enabled, cilium_release_version)
+    cilium_observability_values = observability_values(cilium_release_version, hubble_metrics, hubble_http_exemplars, hubble_flow_export, cilium_prometheus_enabled)
+    # The NLB subnets are selected by their Name tags, which the network layer derives from the AZ names:
+    cilium_ingress_values = ingress_values(cilium_release_version, cilium_ingress, cilium_envoy, [f"demo-public-subnet-{az}" for az in demo_azs[:demo_az_count]])
+except ValueError as e:
+    raise RunError(f"Invalid Cilium configuration: {e}")
+
+# Report how many private subnet IPs the idle nodes keep reserved in every AZ, and what is left when they run max-pods:
+cilium_eni_ips_per_node = eni_ips_reserved_per_node(cilium_eni_ipam["pre-allocate"], cilium_eni_ipam["min-allocate"], cilium_eni_ipam["max-above-watermark"], cilium_eni_prefix_delegation)
+cilium_eni_ips_per_full_node = min(
+    eni_ips_reserved_per_node(cilium_eni_ipam["pre-allocate"], cilium_eni_ipam["min-allocate"], cilium_eni_ipam["max-above-watermark"], cilium_eni_prefix_delegation, node_max_pods),
+    1 + node_ip_capacity(node_instance_type, cilium_eni_prefix_delegation)
+)
+cilium_eni_ip_reservation = az_reservation_report(demo_azs[:demo_az_count], demo_private_subnet_cidrs, expected_nodes_per_az, cilium_eni_ips_per_node, cilium_eni_ips_per_full_node)
+for az, reservation in cilium_eni_ip_reservation.items():
+    if reservation["headroom_ips"] < 0:
+        log.warn(f"ENI IPAM settings reserve {reservation['reserved_ips']} IPs in {az}, but {reservation['subnet']} only has {reservation['usable_ips']}")
+log.info(capacity_report(node_instance_type, cilium_eni_prefix_delegation, node_max_pods, cilium_eni_ip_reservation))
+export("cilium-eni-ip-reservation", cilium_eni_ip_reservation)
+
+# Cilium CNI configuration with the ENI pre-allocation settings:
+cilium_cni_configuration = k8s.core.v1.ConfigMap("cilium-cni-configuration",
+    metadata=k8s.meta.v1.ObjectMetaArgs(
+        name="cilium-cni-configuration",
+        namespace="kube-system"
+    ),
+    data={
+        "cni-config": cilium_eni_cni_config
+    },
+    opts=ResourceOptions(
+        provider=role_provider
+    )
+)
+
 # Create a cilium Helm release when the control plane is initialized:
 cilium_cni_release = Release("cilium-cni",
     ReleaseArgs(
@@ -249,54 +292,51 @@ cilium_cni_release = Release("cilium-cni",
             repo="https://helm.cilium.io",
         ),
         values=Output.all(iam_role_vpc_cni_service_account_role.arn, cluster_endpoint_fqdn).apply(
-            lambda args:
-                {
-                "ingressController": {
-                    "enabled": True,
-                },
-                "eni": {
-                    "enabled": True,
-                    "iamRole": args[0],
-                    "updateEC2AdapterLimitViaAPI": True,
-                    "awsReleaseExcessIPs": True,
-                    "subnetTagsFilter": "cilium-pod-interfaces=private",
-                },
-                "ipam": {
-                    "mode": "eni",
-                },
-                "egressMasqueradeInterfaces": "eth0",
-                "tunnel": "disabled",
-                "loadBalancer": {
-                    "algorithm": "maglev",
-                },
-                "kubeProxyReplacement": "strict",
-                "k8sServiceHost": args[1].replace("https://",""),
-                "hubble": {
-                    "relay": {
-                        "enabled": True,
-                    },
-                    "ui": {
-                        "enabled": True
-                    }
-                }
-            }
+            lambda args: render_cilium_values(args[0], args[1], cilium_datapath_values, cilium_eni_values, cilium_local_redirect_values, cilium_observability_values, cilium_ingress_values)
         )
     ),
     opts=ResourceOptions(
         provider=role_provider,
-        depends_on=[demo_eks_cluster, patch_aws_node]
+        depends_on=[patch_aws_node, cilium_cni_configuration]
     )
 )
 
-# Create an initial Nodegroup when the control plane is initialized:
+# Render the Bottlerocket node settings and volumes shared with the Karpenter node class:
+try:
+    node_settings_toml = render_node_settings(node_sysctls, node_kubelet, node_max_pods)
+    node_block_devices = launch_template_block_devices(node_data_volume)
+except ValueError as e:
+    raise RunError(f"Invalid node settings: {e}")
+
+# Create a launch template for the nodegroup, EKS merges the cluster bootstrap settings into the user data:
+managed_nodegroup_launch_template = ec2.LaunchTemplate("cilium-managed-nodegroup-launch-template",
+    description=f"{cluster_descriptor} Bottlerocket managed nodegroup",
+    user_data=encode_user_data(node_settings_toml),
+    block_device_mappings=node_block_devices,
+    update_default_version=True,
+    tag_specifications=[
+        {
+            "resource_type": resource_type,
+            "tags": {**general_tags, "Name": "cilium-managed-nodegroup"}
+        } for resource_type in ["instance", "volume"]
+    ],
+    tags=general_tags
+)
+
+# Create an initial Nodegroup when the control plane is initialized. The nodegroup name is left to Pulumi's autonaming:
+# changes EKS can't apply in place, such as adding the launch template, replace the nodegroup, and a generated name
+# lets the new nodegroup come up before the old one is drained and deleted:
 managed_nodegroup = eks_provider.ManagedNodeGroup("cilium-managed-nodegroup",
     cluster=demo_eks_cluster,
-    node_group_name="managed-nodegroup",
     node_role=karpenter_node_role,
-    subnet_ids=[s.id for s in demo_private_subnets],
+    subnet_ids=private_subnet_ids,
     force_update_version=True,
     ami_type="BOTTLEROCKET_ARM_64",
-    instance_types=["t4g.medium"],
+    instance_types=[node_instance_type],
+    launch_template={
+        "id": managed_nodegroup_launch_template.id,
+        "version": managed_nodegroup_launch_template.latest_version.apply(str)
+    },
     scaling_config={
         "desired_size": 2,
         "min_size": 2,
@@ -312,7 +352,7 @@ managed_nodegroup = eks_provider.ManagedNodeGroup("cilium-managed-nodegroup",
         }
     ],
     opts=ResourceOptions(
-        depends_on=[demo_eks_cluster, patch_aws_node]
+        depends_on=[patch_aws_node]
     )
 )
 
@@ -320,11 +360,37 @@ managed_nodegroup = eks_provider.ManagedNodeGroup("cilium-managed-nodegroup",
 Default EKS core-dns add-on:
 """
 
+# CoreDNS add-on configuration, the replica count is left to the proportional autoscaler when it is enabled:
+core_dns_configuration_values = {
+    "resources": coredns_resources,
+    "corefile": f""".:53 {{
+    errors
+    health {{
+        lameduck 5s
+    }}
+    ready
+    kubernetes cluster.local in-addr.arpa ip6.arpa {{
+        pods insecure
+        fallthrough in-addr.arpa ip6.arpa
+    }}
+    prometheus :9153
+    forward . /etc/resolv.conf
+    cache {coredns_cache_ttl}
+    loop
+    reload
+    loadbalance
+}}
+"""
+}
+if not coredns_autoscaler_enabled:
+    core_dns_configuration_values["replicaCount"] = coredns_replicas
+
 # Install CoreDNS addon when the cluster is initialized:
 core_dns_addon = eks.Addon("coredns-addon",
     cluster_name=f"{cluster_descriptor}",
     addon_name="coredns",
-    addon_version="v1.8.7-eksbuild.3",
+    addon_version=coredns_addon_version,
+    configuration_values=json.dumps(core_dns_configuration_values),
     resolve_conflicts="OVERWRITE",
     opts=ResourceOptions(
         depends_on=[managed_nodegroup, cilium_cni_release]
@@ -344,8 +410,7 @@ flux_service_account = k8s.core.v1.ServiceAccount("flux-controller-service-accou
         namespace="kube-system"
     ),
     opts=ResourceOptions(
-        provider=role_provider,
-        depends_on=[demo_eks_cluster]
+        provider=role_provider
     )
 )
 
@@ -363,8 +428,7 @@ flux_controller_cluster_role_binding = k8s.rbac.v1.ClusterRoleBinding("flux-cont
         )
     ],
     opts=ResourceOptions(
-        provider=role_provider,
-        depends_on=[demo_eks_cluster]
+        provider=role_provider
     )
 )
 
@@ -415,8 +479,7 @@ Karpenter namespace to deploy Karpenter controller into:
 karpenter_namespace = k8s.core.v1.Namespace("karpenter-namespace",
     metadata={"name": "karpenter"},
     opts=ResourceOptions(
-        provider=role_provider,
-        depends_on=[demo_eks_cluster]
+        provider=role_provider
     )
 )
 
@@ -436,6 +499,15 @@ iam_role_external_dns_controller_policy = create_policy(f"{cluster_descriptor}-e
 iam_role_external_dns_controller_service_account_role = create_oidc_role("external-dns-controller-sa", "kube-system", demo_eks_cluster_oidc_arn, demo_eks_cluster_oidc_url, "external-dns-controller-sa", [iam_role_external_dns_controller_policy.arn])
 export("external-dns-controller-oidc-role-arn", iam_role_external_dns_controller_service_account_role.arn)
 
+"""
+Set up a service account role for the AWS Load Balancer Controller, which provisions the Cilium ingress NLB
+"""
+if cilium_ingress["nlb"]:
+    # AWS Load Balancer Controller Service Account in kube-system
+    iam_role_aws_load_balancer_controller_policy = create_policy(f"{cluster_descriptor}-aws-load-balancer-controller-policy", "aws_load_balancer_controller_oidc_role_policy.json")
+    iam_role_aws_load_balancer_controller_service_account_role = create_oidc_role("aws-load-balancer-controller-sa", "kube-system", demo_eks_cluster_oidc_arn, demo_eks_cluster_oidc_url, "aws-load-balancer-controller", [iam_role_aws_load_balancer_controller_policy.arn])
+    export("aws-load-balancer-controller-oidc-role-arn", iam_role_aws_load_balancer_controller_service_account_role.arn)
+
 
 """
 Set up namespace and service account for External Secrets operator
@@ -443,15 +515,14 @@ Set up namespace and service account for External Secrets operator
 external_secrets_core_namespace = k8s.core.v1.Namespace("external-secrets-namespace",
     metadata={"name": "external-secrets"},
     opts=ResourceOptions(
-        provider=role_provider,
-        depends_on=[demo_eks_cluster]
+        provider=role_provider
     )
 )
 
 # Add service account role for External Secrets SA to fetch RDS secret from Parameter Store:
 external_secrets_service_account_policy = iam.Policy("external-secrets-sa-policy",
     description="External Secrets Service Account SSM Parameter Store Policy",
-    policy=json.dumps({
+    policy=account_id.apply(lambda account: json.dumps({
         "Version": "2012-10-17",
         "Statement": [{
             "Action": [
@@ -461,11 +532,15 @@ external_secrets_service_account_policy = iam.Policy("external-secrets-sa-policy
             ],
             "Effect": "Allow",
             "Resource": [
-                f"arn:aws:ssm:{deployment_region}:{account_id}:parameter/{sql_connection_string_ssm_parameter_name}",
-                f"arn:aws:ssm:{deployment_region}:{account_id}:parameter/{redis_connection_string_ssm_parameter_name}"
+                f"arn:aws:ssm:{deployment_region}:{account}:parameter/{sql_connection_string_ssm_parameter_name}",
+                f"arn:aws:ssm:{deployment_region}:{account}:parameter/{sql_replica_connection_string_ssm_parameter_name}",
+                f"arn:aws:ssm:{deployment_region}:{account}:parameter/{redis_connection_string_ssm_parameter_name}",
+                f"arn:aws:ssm:{deployment_region}:{account}:parameter/{redis_reader_connection_string_ssm_parameter_name}",
+                f"arn:aws:ssm:{deployment_region}:{account}:parameter/{redis_cluster_url_ssm_parameter_name}",
+                *[f"arn:aws:ssm:{deployment_region}:{account}:parameter/{name}" for name in cdn_domain_ssm_parameter_names.values()]
             ]
         }],
-    })
+    }))
 )
 
 # External Secrets IAM role for service account:
@@ -475,12 +550,14 @@ export("external-secrets-oidc-role-arn", iam_role_external_secrets_service_accou
 """
 Set up namespaces and service accounts for Saleor components
 """
+# Label the Saleor namespaces for L7 visibility when it is enabled:
+saleor_namespace_labels = {"l7-visibility": "enabled" if hubble_l7_visibility_enabled else "disabled"}
+
 # Saleor Core namespace
 saleor_core_namespace = k8s.core.v1.Namespace("saleor-core-namespace",
-    metadata={"name": "saleor-core"},
+    metadata={"name": "saleor-core", "labels": saleor_namespace_labels},
     opts=ResourceOptions(
-        provider=role_provider,
-        depends_on=[demo_eks_cluster]
+        provider=role_provider
     )
 )
 
@@ -491,13 +568,24 @@ saleor_core_service_account_policy = iam.Policy("saleor-core-sa-policy",
         "Version": "2012-10-17",
         "Statement": [{
             "Action": [
-                "s3:*"
+                "s3:ListBucket",
+                "s3:GetBucketLocation"
             ],
             "Effect": "Allow",
             "Resource": [
                 f"arn:aws:s3:::{saleor_media_bucket_name}",
+                f"arn:aws:s3:::{saleor_static_bucket_name}"
+            ]
+        },
+        {
+            "Action": [
+                "s3:GetObject",
+                "s3:PutObject",
+                "s3:DeleteObject"
+            ],
+            "Effect": "Allow",
+            "Resource": [
                 f"arn:aws:s3:::{saleor_media_bucket_name}/*",
-                f"arn:aws:s3:::{saleor_static_bucket_name}",
                 f"arn:aws:s3:::{saleor_static_bucket_name}/*"
             ]
         }],
@@ -510,10 +598,9 @@ export("saleor-core-oidc-role-arn", iam_role_saleor_core_service_account_role.ar
 
 # Saleor Dashboard namespace
 saleor_dashboard_namespace = k8s.core.v1.Namespace("saleor-dashboard-namespace",
-    metadata={"name": "saleor-dashboard"},
+    metadata={"name": "saleor-dashboard", "labels": saleor_namespace_labels},
     opts=ResourceOptions(
-        provider=role_provider,
-        depends_on=[demo_eks_cluster]
+        provider=role_provider
     )
 )
 
@@ -524,12 +611,19 @@ saleor_dashboard_service_account_policy = iam.Policy("saleor-dashboard-sa-policy
         "Version": "2012-10-17",
         "Statement": [{
             "Action": [
-                "s3:GetObject",
                 "s3:ListBucket"
             ],
             "Effect": "Allow",
             "Resource": [
-                f"arn:aws:s3:::{saleor_dashboard_bucket_name}",
+                f"arn:aws:s3:::{saleor_dashboard_bucket_name}"
+            ]
+        },
+        {
+            "Action": [
+                "s3:GetObject"
+            ],
+            "Effect": "Allow",
+            "Resource": [
                 f"arn:aws:s3:::{saleor_dashboard_bucket_name}/*"
             ]
         }],
@@ -541,19 +635,17 @@ export("saleor-dashboard-oidc-role-arn", iam_role_saleor_dashboard_service_accou
 
 # Saleor Storefront namespace
 saleor_storefront_namespace = k8s.core.v1.Namespace("saleor-storefront-namespace",
-    metadata={"name": "saleor-storefront"},
+    metadata={"name": "saleor-storefront", "labels": saleor_namespace_labels},
     opts=ResourceOptions(
-        provider=role_provider,
-        depends_on=[demo_eks_cluster]
+        provider=role_provider
     )
 )
 
 # Saleor Static Assets namespace
 saleor_assets_namespace = k8s.core.v1.Namespace("saleor-assets-namespace",
-    metadata={"name": "saleor-assets"},
+    metadata={"name": "saleor-assets", "labels": saleor_namespace_labels},
     opts=ResourceOptions(
-        provider=role_provider,
-        depends_on=[demo_eks_cluster]
+        provider=role_provider
     )
 )
 
@@ -564,14 +656,21 @@ saleor_assets_service_account_policy = iam.Policy("saleor-assets-sa-policy",
         "Version": "2012-10-17",
         "Statement": [{
             "Action": [
-                "s3:GetObject",
                 "s3:ListBucket"
             ],
             "Effect": "Allow",
             "Resource": [
                 f"arn:aws:s3:::{saleor_media_bucket_name}",
+                f"arn:aws:s3:::{saleor_static_bucket_name}"
+            ]
+        },
+        {
+            "Action": [
+                "s3:GetObject"
+            ],
+            "Effect": "Allow",
+            "Resource": [
                 f"arn:aws:s3:::{saleor_media_bucket_name}/*",
-                f"arn:aws:s3:::{saleor_static_bucket_name}",
                 f"arn:aws:s3:::{saleor_static_bucket_name}/*"
             ]
         }],
@@ -580,4 +679,44 @@ saleor_assets_service_account_policy = iam.Policy("saleor-assets-sa-policy",
 
 # Saleor Assets IAM role for service account:
 iam_role_saleor_assets_service_account_role = create_oidc_role("saleor-assets-sa", "saleor-assets", demo_eks_cluster_oidc_arn, demo_eks_cluster_oidc_url, "saleor-assets-sa", [saleor_assets_service_account_policy.arn])
-export("saleor-assets-oidc-role-arn", iam_role_saleor_assets_service_account_role.arn)
\ No newline at end of file
+export("saleor-assets-oidc-role-arn", iam_role_saleor_assets_service_account_role.arn)
+
+"""
+L7 visibility for the Saleor namespaces: Cilium 1.12 has no namespace-wide visibility setting, so every labelled
+namespace gets a policy that allows all ingress and sends HTTP on the service ports through the Cilium proxy.
+Hubble then reports the httpV2 request metrics for these workloads without sidecars:
+"""
+saleor_namespaces = {
+    "saleor-core": saleor_core_namespace,
+    "saleor-dashboard": saleor_dashboard_namespace,
+    "saleor-storefront": saleor_storefront_namespace,
+    "saleor-assets": saleor_assets_namespace
+}
+
+if hubble_l7_visibility_enabled:
+    for namespace, ports in saleor_l7_visibility_ports.items():
+        k8s.apiextensions.CustomResource(f"{namespace}-l7-visibility-policy",
+            api_version="cilium.io/v2",
+            kind="CiliumNetworkPolicy",
+            metadata=k8s.meta.v1.ObjectMetaArgs(
+                name="l7-visibility",
+                namespace=namespace
+            ),
+            spec={
+                "endpointSelector": {},
+                "ingress": [
+                    {"fromEntities": ["all"]},
+                    {
+                        "fromEntities": ["all"],
+                        "toPorts": [{
+                            "ports": [{"port": str(port), "protocol": "TCP"} for port in ports],
+                            "rules": {"http": [{}]}
+                        }]
+                    }
+                ]
+            },
+            opts=ResourceOptions(
+                provider=role_provider,
+                depends_on=[cilium_cni_release, saleor_namespaces[namespace]]
+            )
+        )
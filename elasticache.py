@@ -1,9 +1,8 @@
 from pulumi_aws import elasticache, cloudwatch, ec2, ssm
-from pulumi import export, Output
+from pulumi import export, Output, RunError
 
-from settings import general_tags, redis_instance_size, demo_private_subnet_cidrs, redis_connection_string_ssm_parameter_name
-from subnet_groups import demo_redis_subnet_group
-from vpc import demo_vpc
+from settings import general_tags, redis_instance_size, redis_cluster_mode_enabled, redis_cluster_aware_client, redis_num_node_groups, redis_replicas_per_node_group, redis_num_cache_clusters, redis_parameters, demo_private_subnet_cidrs, redis_connection_string_ssm_parameter_name, redis_reader_connection_string_ssm_parameter_name, redis_cluster_url_ssm_parameter_name
+from network import vpc_id, redis_subnet_group_name
 
 """
 Create the Redis Cloudwatch log group:
@@ -19,7 +18,7 @@ Create a Redis cluster security group:
 """
 demo_redis_security_group = ec2.SecurityGroup(f"demo-redis-security-group",
     description="Redis security group",
-    vpc_id=demo_vpc.id,
+    vpc_id=vpc_id,
     tags={**general_tags, "Name": "demo-redis-security-group"}
 )
 
@@ -44,17 +43,49 @@ demo_redis_security_group_oubound = ec2.SecurityGroupRule("demo-redis-security-g
 )
 
 """
-Create a Redis cluster:
+Create a Redis parameter group:
 """
+demo_redis_parameter_group = elasticache.ParameterGroup("demo-saleor-core-redis-parameter-group",
+    family="redis7",
+    description="Saleor Core Cache parameters",
+    parameters=[elasticache.ParameterGroupParameterArgs(name=name, value=value) for name, value in {
+        **redis_parameters,
+        "cluster-enabled": "yes" if redis_cluster_mode_enabled else "no"
+    }.items()],
+    tags={**general_tags, "Name": "demo-saleor-core-redis-parameter-group"}
+)
+
+"""
+Create a Redis cluster, either sharded over node groups (cluster mode) or one primary with read replicas:
+"""
+if redis_cluster_mode_enabled:
+    if not redis_cluster_aware_client:
+        raise RunError("redis-cluster-mode needs a cluster-aware Redis client, Saleor's CACHE_URL client isn't one. "
+            "Point the workloads at the saleor-redis-cluster-url parameter, then set redis-cluster-aware-client")
+    if redis_num_node_groups < 1:
+        raise RunError("redis-num-node-groups must be at least 1")
+    if redis_replicas_per_node_group < 1:
+        raise RunError("redis-replicas-per-node-group must be at least 1 for Multi-AZ automatic failover")
+    redis_topology = {
+        "num_node_groups": redis_num_node_groups,
+        "replicas_per_node_group": redis_replicas_per_node_group
+    }
+else:
+    if redis_num_cache_clusters < 2:
+        raise RunError("redis-num-cache-clusters must be at least 2 for Multi-AZ automatic failover")
+    redis_topology = {
+        "num_cache_clusters": redis_num_cache_clusters
+    }
+
 demo_redis_cluster = elasticache.ReplicationGroup("demo-saleor-core-redis-cluster",
     automatic_failover_enabled=True,
     description="Saleor Core Cache",
     node_type=redis_instance_size,
     multi_az_enabled=True,
-    parameter_group_name="default.redis7",
+    parameter_group_name=demo_redis_parameter_group.name,
     port=6379,
-    num_cache_clusters=2,
-    subnet_group_name=demo_redis_subnet_group,
+    **redis_topology,
+    subnet_group_name=redis_subnet_group_name,
     security_group_ids=[demo_redis_security_group.id],
     log_delivery_configurations=[
         elasticache.ReplicationGroupLogDeliveryConfigurationArgs(
@@ -66,18 +97,37 @@ demo_redis_cluster = elasticache.ReplicationGroup("demo-saleor-core-redis-cluste
     ],
     tags={**general_tags, "Name": "demo-saleor-core-redis-cluster"}
 )
-export("redis-primary-endpoint", demo_redis_cluster.primary_endpoint_address)
-export("redis-reader-endpoint", demo_redis_cluster.reader_endpoint_address)
-
-redis_endpoint = Output.concat("redis://", demo_redis_cluster.primary_endpoint_address, ":6379")
 
 """
-Populate SSM parameter store with the Redis connection string:
+Populate SSM parameter store with the Redis connection strings. CACHE_URL clients talk to a single primary, so cluster
+mode publishes the configuration endpoint as a separate cluster URL instead:
 """
-demo_redis_cluster_connection_string = ssm.Parameter("saleor-redis-connection-string",
-    name=redis_connection_string_ssm_parameter_name,
-    description="Redis connection string for Saleor Core in CACHE_URL format",
-    type="SecureString",
-    value=redis_endpoint,
-    tags={**general_tags, "Name": "saleor-redis-cluster-connection-string"}
-)
\ No newline at end of file
+if redis_cluster_mode_enabled:
+    # Cluster mode only has a configuration endpoint, clients discover the shards and replicas through it:
+    export("redis-configuration-endpoint", demo_redis_cluster.configuration_endpoint_address)
+    demo_redis_cluster_url = ssm.Parameter("saleor-redis-cluster-url",
+        name=redis_cluster_url_ssm_parameter_name,
+        description="Redis cluster mode URL for cluster-aware clients of Saleor Core, not usable as CACHE_URL",
+        type="SecureString",
+        value=Output.concat("redis://", demo_redis_cluster.configuration_endpoint_address, ":6379"),
+        tags={**general_tags, "Name": "saleor-redis-cluster-url"}
+    )
+else:
+    export("redis-primary-endpoint", demo_redis_cluster.primary_endpoint_address)
+    export("redis-reader-endpoint", demo_redis_cluster.reader_endpoint_address)
+
+    demo_redis_cluster_connection_string = ssm.Parameter("saleor-redis-connection-string",
+        name=redis_connection_string_ssm_parameter_name,
+        description="Redis connection string for Saleor Core in CACHE_URL format",
+        type="SecureString",
+        value=Output.concat("redis://", demo_redis_cluster.primary_endpoint_address, ":6379"),
+        tags={**general_tags, "Name": "saleor-redis-cluster-connection-string"}
+    )
+
+    demo_redis_cluster_reader_connection_string = ssm.Parameter("saleor-redis-reader-connection-string",
+        name=redis_reader_connection_string_ssm_parameter_name,
+        description="Redis reader connection string for Saleor Core in CACHE_URL format",
+        type="SecureString",
+        value=Output.concat("redis://", demo_redis_cluster.reader_endpoint_address, ":6379"),
+        tags={**general_tags, "Name": "saleor-redis-cluster-reader-connection-string"}
+    )
@@ -0,0 +1,124 @@
+import json
+
+import pulumi
+from pulumi_aws import s3, ec2
+
+from settings import general_tags, account_id, vpc_flow_logs_enabled, vpc_flow_logs, vpc_flow_logs_bucket_name
+from vpc import demo_vpc, demo_azs, demo_public_subnets, demo_private_subnets, demo_eks_cp_subnets, demo_db_subnets
+
+"""
+VPC flow logs: Parquet files in Hive-compatible hourly partitions (aws-account-id=/aws-service=/aws-region=/year=/month=/day=/hour=),
+so Athena or DuckDB only scan the hours and columns a query asks for
+"""
+
+# Aggregation intervals accepted by flow logs delivered to S3:
+FLOW_LOG_AGGREGATION_INTERVALS = [60, 600]
+
+demo_subnets_by_tier = {
+    "public": demo_public_subnets,
+    "private": demo_private_subnets,
+    "eks_cp": demo_eks_cp_subnets,
+    "db": demo_db_subnets
+}
+demo_flow_logs = []
+
+if vpc_flow_logs_enabled:
+    unknown_tiers = [tier for tier in vpc_flow_logs["tiers"] if tier not in demo_subnets_by_tier]
+    if unknown_tiers:
+        raise pulumi.RunError(f"vpc-flow-logs-tiers must be from {', '.join(demo_subnets_by_tier)}, got {', '.join(unknown_tiers)}")
+    if vpc_flow_logs["aggregation_interval_seconds"] not in FLOW_LOG_AGGREGATION_INTERVALS:
+        raise pulumi.RunError(f"vpc-flow-logs-aggregation-interval must be 60 or 600, got {vpc_flow_logs['aggregation_interval_seconds']}")
+
+    # Create the flow log bucket:
+    vpc_flow_logs_bucket = s3.Bucket("vpc-flow-logs-bucket",
+        bucket=vpc_flow_logs_bucket_name,
+        force_destroy=True,
+        tags=general_tags
+    )
+
+    # Disable ACL's for the flow log bucket:
+    vpc_flow_logs_bucket_ownership_controls = s3.BucketOwnershipControls("vpc-flow-logs-bucket-acl",
+        bucket=vpc_flow_logs_bucket.id,
+        rule=s3.BucketOwnershipControlsRuleArgs(
+            object_ownership="BucketOwnerEnforced",
+        ))
+
+    vpc_flow_logs_bucket_public_access_block = s3.BucketPublicAccessBlock("vpc-flow-logs-bucket-public-access-block",
+        bucket=vpc_flow_logs_bucket.id,
+        block_public_acls=True,
+        block_public_policy=True,
+        ignore_public_acls=True,
+        restrict_public_buckets=True
+    )
+
+    # Expire the flow logs:
+    vpc_flow_logs_bucket_lifecycle = s3.BucketLifecycleConfigurationV2("vpc-flow-logs-bucket-lifecycle",
+        bucket=vpc_flow_logs_bucket.id,
+        rules=[
+            {
+                "id": "expire-flow-logs",
+                "status": "Enabled",
+                "filter": {"prefix": "AWSLogs/"},
+                "expiration": {"days": vpc_flow_logs["expiration_days"]},
+                "abort_incomplete_multipart_upload": {"days_after_initiation": 1}
+            }
+        ]
+    )
+
+    # Let the log delivery service of this account write the flow logs:
+    vpc_flow_logs_bucket_policy = s3.BucketPolicy("vpc-flow-logs-bucket-policy",
+        bucket=vpc_flow_logs_bucket.id,
+        policy=pulumi.Output.all(vpc_flow_logs_bucket.arn, account_id).apply(lambda args: json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [
+                {
+                    "Sid": "AWSLogDeliveryWrite",
+                    "Effect": "Allow",
+                    "Principal": {"Service": "delivery.logs.amazonaws.com"},
+                    "Action": "s3:PutObject",
+                    "Resource": f"{args[0]}/AWSLogs/{args[1]}/*",
+                    "Condition": {"StringEquals": {"aws:SourceAccount": args[1]}}
+                },
+                {
+                    "Sid": "AWSLogDeliveryAclCheck",
+                    "Effect": "Allow",
+                    "Principal": {"Service": "delivery.logs.amazonaws.com"},
+                    "Action": ["s3:GetBucketAcl", "s3:ListBucket"],
+                    "Resource": args[0],
+                    "Condition": {"StringEquals": {"aws:SourceAccount": args[1]}}
+                }
+            ]
+        })),
+        opts=pulumi.ResourceOptions(depends_on=[vpc_flow_logs_bucket_public_access_block])
+    )
+
+    vpc_flow_log_args = {
+        "log_destination_type": "s3",
+        "log_destination": vpc_flow_logs_bucket.arn,
+        "log_format": " ".join(f"${{{field}}}" for field in vpc_flow_logs["fields"]),
+        "traffic_type": "ALL",
+        "max_aggregation_interval": vpc_flow_logs["aggregation_interval_seconds"],
+        "destination_options": ec2.FlowLogDestinationOptionsArgs(
+            file_format="parquet",
+            hive_compatible_partitions=True,
+            per_hour_partition=True
+        ),
+        "opts": pulumi.ResourceOptions(depends_on=[vpc_flow_logs_bucket_policy])
+    }
+
+    # Create one flow log for the VPC, or one per subnet of the selected tiers:
+    if not vpc_flow_logs["tiers"]:
+        demo_flow_logs.append(ec2.FlowLog("demo-vpc-flow-log",
+            vpc_id=demo_vpc.id,
+            tags={**general_tags, "Name": "demo-vpc-flow-log"},
+            **vpc_flow_log_args
+        ))
+    for tier in vpc_flow_logs["tiers"]:
+        for az, subnet in zip(demo_azs, demo_subnets_by_tier[tier]):
+            demo_flow_logs.append(ec2.FlowLog(f"demo-{tier.replace('_', '-')}-flow-log-{az}",
+                subnet_id=subnet.id,
+                tags={**general_tags, "Name": f"demo-{tier.replace('_', '-')}-flow-log-{az}"},
+                **vpc_flow_log_args
+            ))
+
+    pulumi.export("vpc-flow-logs-bucket", vpc_flow_logs_bucket.bucket)
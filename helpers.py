@@ -1,22 +1,27 @@
 from pulumi_aws import iam
 import json
+import functools
 import pulumi
 
+from settings import iam_retain_legacy_attachments
+
 """
 Helper functions
 """
 
-def create_policy(name: str, policy_doc: str) -> iam.Policy:
+@functools.lru_cache(maxsize=None)
+def load_policy_document(policy_doc: str) -> str:
     with open(f"controllers_iam_policies/{policy_doc}") as policy_file:
-        policy_json = policy_file.read()
+        return policy_file.read()
 
-        policy = iam.Policy(f"{name}",
-            policy=policy_json
-        )
-        return policy
+def create_policy(name: str, policy_doc: str) -> iam.Policy:
+    return iam.Policy(f"{name}",
+        policy=load_policy_document(policy_doc)
+    )
 
-def create_iam_role(name: str, principle_key: str ,principle_value: str, policy_arns: list=None) -> iam.Role:
-    role = iam.Role(name, name=name, assume_role_policy=json.dumps({
+@functools.lru_cache(maxsize=None)
+def service_trust_policy(principle_key: str, principle_value: str) -> str:
+    return json.dumps({
         "Version": "2012-10-17",
         "Statement": [
             {
@@ -28,19 +33,35 @@ def create_iam_role(name: str, principle_key: str ,principle_value: str, policy_
                 "Action": "sts:AssumeRole"
             }
         ]
-    }))
-    if policy_arns is not None:
-        for i, policy in enumerate(policy_arns):
-            rpa = iam.RolePolicyAttachment(f"{name}-policy-{i}",
-                policy_arn=policy,
-                role=role.id)
+    })
+
+# Roles attach their managed policies through managed_policy_arns instead of one RolePolicyAttachment per policy.
+# managed_policy_arns is exclusive, but the attachments of older stacks can't just go: deleting one detaches the same
+# policy the role now manages. Those stacks set iam-retain-legacy-attachments for one "pulumi up", which keeps the
+# attachments in the program as retain-on-delete, and unset it for the next run, which drops them from the state without
+# detaching the policies. New stacks never create them.
+def attach_legacy_policies(name: str, role: iam.Role, policy_arns: list) -> None:
+    if not iam_retain_legacy_attachments:
+        return
+    for i, policy in enumerate(policy_arns):
+        iam.RolePolicyAttachment(f"{name}-policy-{i}",
+            policy_arn=policy,
+            role=role.id,
+            opts=pulumi.ResourceOptions(retain_on_delete=True))
+
+def create_iam_role(name: str, principle_key: str ,principle_value: str, policy_arns: list=None) -> iam.Role:
+    role = iam.Role(name, name=name,
+        assume_role_policy=service_trust_policy(principle_key, principle_value),
+        managed_policy_arns=policy_arns or []
+    )
+    attach_legacy_policies(name, role, policy_arns or [])
     return role
 
 # Create OIDC roles for service account, here using all and apply method to concatinate pulumi outputs needed to get OIDC provider details
 def create_oidc_role(name: str, namespace: str, oidc_arn: str, oidc_url: str, svc_account_name: str, policy_arns: list=None) -> iam.Role:
 
     service_account_name = f"system:serviceaccount:{namespace}:{svc_account_name}"
- 
+
     oidc_role = iam.Role(name, name=name, assume_role_policy=pulumi.Output.all(oidc_arn, oidc_url).apply(
         lambda args: json.dumps(
             {
@@ -57,11 +78,8 @@ def create_oidc_role(name: str, namespace: str, oidc_arn: str, oidc_url: str, sv
                         },
                     }
                 ],
-            })))
-    if policy_arns is not None:
-        for i, policy in enumerate(policy_arns):
-            rpa = iam.RolePolicyAttachment(f"{name}-policy-{i}",
-                policy_arn=policy,
-                role=oidc_role.id)
-    else: pass
-    return oidc_role
\ No newline at end of file
+            })),
+        managed_policy_arns=policy_arns or []
+    )
+    attach_legacy_policies(name, oidc_role, policy_arns or [])
+    return oidc_role
@@ -0,0 +1,121 @@
+import math
+
+from subnet_planner import usable_ips
+
+"""
+IP capacity math for Cilium ENI IPAM: max-pods per instance type from the ENI limits, how many private subnet IPs
+every node keeps allocated and what that leaves per AZ.
+Pure python on purpose, so the numbers can be checked without AWS or Pulumi.
+"""
+
+# With prefix delegation the operator assigns /28 prefixes instead of individual secondary IPs:
+IPV4_PREFIX_SIZE = 16
+
+# Offline copy of the EC2 network limits: max ENIs, IPv4 addresses per ENI and vCPUs of the instance types the
+# managed nodegroup and the Karpenter node pools can launch:
+ENI_LIMITS = {
+    "t4g.nano": (2, 2, 2),
+    "t4g.micro": (2, 2, 2),
+    "t4g.small": (3, 4, 2),
+    "t4g.medium": (3, 6, 2),
+    "t4g.large": (3, 12, 2),
+    "t4g.xlarge": (4, 15, 4),
+    "t4g.2xlarge": (4, 15, 8),
+    **{
+        f"{family}.{size}": limits
+        for family in ["c6g", "c7g", "m6g", "m7g", "r6g", "r7g"]
+        for size, limits in {
+            "medium": (2, 4, 1),
+            "large": (3, 10, 2),
+            "xlarge": (4, 15, 4),
+            "2xlarge": (4, 15, 8),
+            "4xlarge": (8, 30, 16),
+            "8xlarge": (8, 30, 32),
+            "12xlarge": (8, 30, 48),
+            "16xlarge": (15, 50, 64)
+        }.items()
+    }
+}
+
+# Pods on the host network (the Cilium agent and kube-proxy) don't take an ENI IP:
+HOST_NETWORK_PODS = 2
+
+# Kubelet max-pods recommended by AWS with prefix delegation, by vCPU count:
+PREFIX_DELEGATION_MAX_PODS = 110
+PREFIX_DELEGATION_MAX_PODS_30_VCPU = 250
+
+def eni_limits(instance_type: str) -> tuple:
+    if instance_type not in ENI_LIMITS:
+        raise ValueError(f"no ENI limits for {instance_type}, known types: {', '.join(sorted(ENI_LIMITS))}")
+    return ENI_LIMITS[instance_type]
+
+def node_ip_capacity(instance_type: str, prefix_delegation: bool) -> int:
+    """Pod IPs the ENIs of a node can hold, every ENI keeps its primary IP for itself"""
+    enis, ips_per_eni, _ = eni_limits(instance_type)
+    slots = enis * (ips_per_eni - 1)
+    return slots * IPV4_PREFIX_SIZE if prefix_delegation else slots
+
+def max_pods(instance_type: str, prefix_delegation: bool) -> int:
+    """
+    Kubelet max-pods matching what ENI IPAM can allocate: the ENI pod IPs plus the host network pods.
+    With prefix delegation the IPs stop being the limit, so the AWS recommended cap applies instead.
+    """
+    pods = node_ip_capacity(instance_type, prefix_delegation) + HOST_NETWORK_PODS
+    if prefix_delegation:
+        vcpus = eni_limits(instance_type)[2]
+        pods = min(pods, PREFIX_DELEGATION_MAX_PODS_30_VCPU if vcpus >= 30 else PREFIX_DELEGATION_MAX_PODS)
+    return pods
+
+def family_max_pods(instance_families: list, prefix_delegation: bool) -> dict:
+    """max-pods of every known instance type of the given families"""
+    return {
+        instance_type: max_pods(instance_type, prefix_delegation)
+        for instance_type in ENI_LIMITS if instance_type.split(".")[0] in instance_families
+    }
+
+def eni_ips_reserved_per_node(pre_allocate: int, min_allocate: int, max_above_watermark: int, prefix_delegation: bool, pods: int=0) -> int:
+    """
+    Private subnet IPs a node holds while running the given number of pods: the node's primary IP, plus the pod IPs
+    in use topped up to pre-allocate free IPs (never below min-allocate), plus up to max-above-watermark extra IPs.
+    With prefix delegation the pod IPs are rounded up to whole /28 prefixes.
+    """
+    pod_ips = max(min_allocate, pods + pre_allocate) + max_above_watermark
+    if prefix_delegation:
+        pod_ips = math.ceil(pod_ips / IPV4_PREFIX_SIZE) * IPV4_PREFIX_SIZE
+    return 1 + pod_ips
+
+def az_reservation_report(azs: list, subnet_cidrs: list, nodes_per_az: int, reserved_per_node: int, reserved_per_full_node: int=None) -> dict:
+    """
+    Per AZ reservation of the idle nodes against the pod subnets and, given the IPs a node holds at max-pods,
+    the headroom left when every node runs full
+    """
+    report = {}
+    for az, cidr in zip(azs, subnet_cidrs):
+        available = usable_ips(cidr)
+        reserved = nodes_per_az * reserved_per_node
+        report[az] = {
+            "subnet": cidr,
+            "usable_ips": available,
+            "nodes": nodes_per_az,
+            "reserved_ips_per_node": reserved_per_node,
+            "reserved_ips": reserved,
+            "headroom_ips": available - reserved,
+            "reserved_percent": round(100 * reserved / available, 1)
+        }
+        if reserved_per_full_node is not None:
+            report[az]["headroom_ips_at_max_pods"] = available - nodes_per_az * reserved_per_full_node
+            report[az]["full_nodes_fit"] = available // reserved_per_full_node
+    return report
+
+def capacity_report(instance_type: str, prefix_delegation: bool, node_max_pods: int, az_report: dict) -> str:
+    """Readable capacity summary of the nodegroup instance type and the pod subnets"""
+    lines = [
+        f"{instance_type}: {node_ip_capacity(instance_type, prefix_delegation)} ENI pod IPs, max-pods {node_max_pods} "
+        f"(ENI limit {max_pods(instance_type, prefix_delegation)}, prefix delegation {'on' if prefix_delegation else 'off'})"
+    ]
+    for az, r in az_report.items():
+        line = f"{az} {r['subnet']}: {r['usable_ips']} usable IPs, {r['reserved_ips']} reserved by {r['nodes']} idle nodes"
+        if "full_nodes_fit" in r:
+            line += f", {r['headroom_ips_at_max_pods']} left at max-pods, room for {r['full_nodes_fit']} full nodes"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,151 @@
+import json
+
+from pulumi import export, Output, ResourceOptions, RunError, log
+from pulumi_aws import cloudwatch, sqs
+import pulumi_kubernetes as k8s
+from pulumi_kubernetes.helm.v3 import Release, ReleaseArgs
+
+from settings import general_tags, cluster_descriptor, karpenter_version, karpenter_controller_enabled, karpenter_interruption_queue_name, karpenter_batch_max_duration, karpenter_batch_idle_duration, karpenter_controller_replicas, karpenter_controller_resources, karpenter_node_pools_enabled, karpenter_node_pools, karpenter_instance_families, karpenter_min_pods_per_node, cilium_eni_prefix_delegation, node_sysctls, node_kubelet, node_data_volume
+from eks import role_provider, karpenter_node_role, karpenter_instance_profile, karpenter_namespace, iam_role_karpenter_controller_service_account_role, cluster_endpoint_fqdn, managed_nodegroup, cilium_cni_release
+from karpenter_specs import api_kinds, node_pool_spec, node_class_spec, chart_version, batch_settings, controller_values, EXCLUDED_INSTANCE_SIZES
+from bottlerocket_settings import render_node_settings, karpenter_block_devices
+from ip_capacity import family_max_pods
+
+"""
+Karpenter controller with its interruption queue, and the node pools: weighted spot and on-demand arm64 pools with
+consolidation, sharing one Bottlerocket node class that discovers subnets and security groups through the
+karpenter.sh/discovery tags
+"""
+
+# EC2 and AWS Health events that announce a node is going away, Karpenter drains the node when one arrives:
+KARPENTER_INTERRUPTION_EVENTS = {
+    "scheduled-change": {"source": ["aws.health"], "detail-type": ["AWS Health Event"]},
+    "spot-interruption": {"source": ["aws.ec2"], "detail-type": ["EC2 Spot Instance Interruption Warning"]},
+    "rebalance": {"source": ["aws.ec2"], "detail-type": ["EC2 Instance Rebalance Recommendation"]},
+    "instance-state-change": {"source": ["aws.ec2"], "detail-type": ["EC2 Instance State-change Notification"]}
+}
+
+# A spot interruption warning comes two minutes ahead, an older message is of no use to the controller:
+KARPENTER_INTERRUPTION_MESSAGE_RETENTION_SECONDS = 300
+
+karpenter_api_kinds = api_kinds(karpenter_version)
+karpenter_node_class_name = "default"
+karpenter_node_pool_resources = []
+# The node pool and node class CRDs come with the chart:
+karpenter_crd_dependencies = []
+
+if karpenter_controller_enabled:
+    try:
+        karpenter_batch_settings = batch_settings(karpenter_batch_max_duration, karpenter_batch_idle_duration)
+    except ValueError as e:
+        raise RunError(f"Invalid Karpenter batching settings: {e}")
+
+    # Create the interruption queue, EventBridge delivers the events to it:
+    karpenter_interruption_queue = sqs.Queue("karpenter-interruption-queue",
+        name=karpenter_interruption_queue_name,
+        message_retention_seconds=KARPENTER_INTERRUPTION_MESSAGE_RETENTION_SECONDS,
+        sqs_managed_sse_enabled=True,
+        tags=general_tags
+    )
+
+    karpenter_interruption_queue_policy = sqs.QueuePolicy("karpenter-interruption-queue-policy",
+        queue_url=karpenter_interruption_queue.url,
+        policy=karpenter_interruption_queue.arn.apply(lambda arn: json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [
+                {
+                    "Sid": "EventBridgeWrite",
+                    "Effect": "Allow",
+                    "Principal": {"Service": ["events.amazonaws.com", "sqs.amazonaws.com"]},
+                    "Action": "sqs:SendMessage",
+                    "Resource": arn
+                }
+            ]
+        }))
+    )
+
+    # Create one EventBridge rule per interruption event:
+    for event_name, event_pattern in KARPENTER_INTERRUPTION_EVENTS.items():
+        event_rule = cloudwatch.EventRule(f"karpenter-{event_name}-rule",
+            name=f"{cluster_descriptor}-karpenter-{event_name}",
+            event_pattern=json.dumps(event_pattern),
+            tags=general_tags
+        )
+        cloudwatch.EventTarget(f"karpenter-{event_name}-target",
+            rule=event_rule.name,
+            arn=karpenter_interruption_queue.arn,
+            opts=ResourceOptions(depends_on=[karpenter_interruption_queue_policy])
+        )
+
+    # Install the controller on the managed nodegroup, once Cilium runs there:
+    karpenter_controller_release = Release("karpenter",
+        ReleaseArgs(
+            name="karpenter",
+            chart="oci://public.ecr.aws/karpenter/karpenter",
+            version=chart_version(karpenter_version),
+            namespace=karpenter_namespace.metadata.name,
+            values=Output.all(iam_role_karpenter_controller_service_account_role.arn, cluster_endpoint_fqdn, karpenter_instance_profile.name, karpenter_interruption_queue.name).apply(
+                lambda args: controller_values(karpenter_version, cluster_descriptor, args[1], args[0], args[2], args[3], karpenter_batch_settings, karpenter_controller_replicas, karpenter_controller_resources)
+            )
+        ),
+        opts=ResourceOptions(
+            provider=role_provider,
+            depends_on=[managed_nodegroup, cilium_cni_release]
+        )
+    )
+    karpenter_crd_dependencies.append(karpenter_controller_release)
+
+    export("karpenter-interruption-queue", karpenter_interruption_queue.name)
+
+if karpenter_node_pools_enabled:
+    # Same node tuning as the managed nodegroup, max-pods is left to Karpenter since it differs per instance type:
+    try:
+        karpenter_user_data = render_node_settings(node_sysctls, node_kubelet)
+        karpenter_node_block_devices = karpenter_block_devices(node_data_volume)
+    except ValueError as e:
+        raise RunError(f"Invalid node settings: {e}")
+
+    # Karpenter labels instance types with the same ENI-limited pod counts as the table in ip_capacity.py, but doesn't know
+    # about prefix delegation. With it, the pools get the highest max-pods every instance type they can launch supports:
+    karpenter_eni_max_pods = {
+        instance_type: pods for instance_type, pods in family_max_pods(karpenter_instance_families, False).items()
+        if instance_type.split(".")[1] not in EXCLUDED_INSTANCE_SIZES and pods >= karpenter_min_pods_per_node
+    }
+    if not karpenter_eni_max_pods:
+        raise RunError(f"No {', '.join(karpenter_instance_families)} instance type fits {karpenter_min_pods_per_node} pods per node")
+    karpenter_max_pods = None
+    if cilium_eni_prefix_delegation:
+        karpenter_max_pods = min(family_max_pods(karpenter_instance_families, True)[instance_type] for instance_type in karpenter_eni_max_pods)
+    log.info(f"Karpenter instance types fit {min(karpenter_eni_max_pods.values())} to {max(karpenter_eni_max_pods.values())} pods per node"
+        + (f", max-pods {karpenter_max_pods} with prefix delegation" if karpenter_max_pods else ""))
+
+    # Create the shared node class:
+    node_class_api_version, node_class_kind = karpenter_api_kinds["node_class"]
+    karpenter_node_class = k8s.apiextensions.CustomResource(f"karpenter-node-class-{karpenter_node_class_name}",
+        api_version=node_class_api_version,
+        kind=node_class_kind,
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name=karpenter_node_class_name
+        ),
+        spec=node_class_spec(karpenter_version, cluster_descriptor, karpenter_node_role.name, karpenter_instance_profile.name, general_tags, karpenter_user_data, karpenter_node_block_devices),
+        opts=ResourceOptions(
+            provider=role_provider,
+            depends_on=karpenter_crd_dependencies
+        )
+    )
+
+    # Create one node pool per capacity mix:
+    node_pool_api_version, node_pool_kind = karpenter_api_kinds["node_pool"]
+    for pool_name, pool in karpenter_node_pools.items():
+        karpenter_node_pool_resources.append(k8s.apiextensions.CustomResource(f"karpenter-node-pool-{pool_name}",
+            api_version=node_pool_api_version,
+            kind=node_pool_kind,
+            metadata=k8s.meta.v1.ObjectMetaArgs(
+                name=pool_name
+            ),
+            spec=node_pool_spec(karpenter_version, pool, karpenter_instance_families, karpenter_node_class_name, karpenter_min_pods_per_node, karpenter_max_pods),
+            opts=ResourceOptions(
+                provider=role_provider,
+                depends_on=[karpenter_node_class] + karpenter_crd_dependencies
+            )
+        ))
@@ -0,0 +1,197 @@
+import re
+
+"""
+Karpenter node pool specs: renders NodePool/EC2NodeClass (karpenter.sh/v1beta1, Karpenter >= 0.32)
+or Provisioner/AWSNodeTemplate (karpenter.sh/v1alpha5, older releases) from one pool definition, plus the Helm values
+of the controller. Pure python on purpose, so the specs can be rendered without a cluster.
+"""
+
+# First Karpenter release with the v1beta1 NodePool and EC2NodeClass APIs:
+KARPENTER_V1BETA1_VERSION = (0, 32)
+
+# First Karpenter release whose OCI chart tags drop the "v" prefix:
+KARPENTER_UNPREFIXED_CHART_VERSION = (0, 35)
+
+# Go duration units accepted by the controller settings, in seconds:
+DURATION_UNITS = {
+    "ns": 1e-9,
+    "us": 1e-6,
+    "ms": 1e-3,
+    "s": 1,
+    "m": 60,
+    "h": 3600
+}
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ns|us|ms|s|m|h)")
+
+# Cilium taints new nodes until its agent is ready, Karpenter has to expect the taint instead of reacting to it:
+CILIUM_STARTUP_TAINT = {
+    "key": "node.cilium.io/agent-not-ready",
+    "value": "true",
+    "effect": "NoExecute"
+}
+
+def parse_version(version: str) -> tuple:
+    """Turns "0.27.3" into (0, 27, 3)"""
+    return tuple(int(part) for part in version.lstrip("v").split("-")[0].split("."))
+
+def uses_v1beta1(version: str) -> bool:
+    """Whether a Karpenter release uses the NodePool/EC2NodeClass APIs"""
+    return parse_version(version)[:2] >= KARPENTER_V1BETA1_VERSION
+
+# Instance sizes too small to run the node daemons next to any workload:
+EXCLUDED_INSTANCE_SIZES = ["nano", "micro"]
+
+def pool_requirements(pool: dict, instance_families: list, min_pods: int=0) -> list:
+    """
+    Scheduling requirements shared by both API versions: architecture, capacity type and instance families,
+    plus a floor on the ENI-limited pod count Karpenter labels every instance type with
+    """
+    requirements = [
+        {"key": "kubernetes.io/os", "operator": "In", "values": ["linux"]},
+        {"key": "kubernetes.io/arch", "operator": "In", "values": pool["architectures"]},
+        {"key": "karpenter.sh/capacity-type", "operator": "In", "values": pool["capacity_types"]},
+        {"key": "karpenter.k8s.aws/instance-family", "operator": "In", "values": instance_families},
+        {"key": "karpenter.k8s.aws/instance-size", "operator": "NotIn", "values": EXCLUDED_INSTANCE_SIZES}
+    ]
+    if min_pods > 0:
+        requirements.append({"key": "karpenter.k8s.aws/instance-pods", "operator": "Gt", "values": [str(min_pods - 1)]})
+    return requirements
+
+def node_pool_spec(version: str, pool: dict, instance_families: list, node_class_name: str, min_pods: int=0, max_pods: int=None) -> dict:
+    """
+    NodePool (v1beta1) or Provisioner (v1alpha5) spec for a weighted pool with consolidation. Without max_pods
+    the nodes keep the ENI-limited max-pods Karpenter computes per instance type.
+    """
+    limits = {"cpu": str(pool["cpu_limit"]), "memory": pool["memory_limit"]}
+    kubelet = {"maxPods": max_pods} if max_pods else None
+    if uses_v1beta1(version):
+        template_spec = {
+            "nodeClassRef": {"name": node_class_name},
+            "requirements": pool_requirements(pool, instance_families, min_pods),
+            "startupTaints": [CILIUM_STARTUP_TAINT]
+        }
+        if kubelet:
+            template_spec["kubelet"] = kubelet
+        return {
+            "weight": pool["weight"],
+            "template": {
+                "spec": template_spec
+            },
+            "limits": limits,
+            "disruption": {
+                "consolidationPolicy": "WhenUnderutilized",
+                "expireAfter": f"{pool['expire_after_seconds']}s"
+            }
+        }
+    spec = {
+        "weight": pool["weight"],
+        "providerRef": {"name": node_class_name},
+        "requirements": pool_requirements(pool, instance_families, min_pods),
+        "startupTaints": [CILIUM_STARTUP_TAINT],
+        "limits": {"resources": limits},
+        "consolidation": {"enabled": True},
+        "ttlSecondsUntilExpired": pool["expire_after_seconds"]
+    }
+    if kubelet:
+        spec["kubeletConfiguration"] = kubelet
+    return spec
+
+def node_class_spec(version: str, discovery_tag: str, node_role, instance_profile, tags: dict, user_data: str=None, block_device_mappings: list=None) -> dict:
+    """
+    EC2NodeClass (v1beta1) or AWSNodeTemplate (v1alpha1) spec discovering subnets and security groups by tag.
+    Both take Bottlerocket TOML user data, which Karpenter merges with its own bootstrap settings.
+    """
+    selector = {"karpenter.sh/discovery": discovery_tag}
+    if uses_v1beta1(version):
+        spec = {
+            "amiFamily": "Bottlerocket",
+            "role": node_role,
+            "subnetSelectorTerms": [{"tags": selector}],
+            "securityGroupSelectorTerms": [{"tags": selector}],
+            "tags": tags
+        }
+    else:
+        spec = {
+            "amiFamily": "Bottlerocket",
+            "instanceProfile": instance_profile,
+            "subnetSelector": selector,
+            "securityGroupSelector": selector,
+            "tags": tags
+        }
+    if user_data:
+        spec["userData"] = user_data
+    if block_device_mappings:
+        spec["blockDeviceMappings"] = block_device_mappings
+    return spec
+
+def api_kinds(version: str) -> dict:
+    """API versions and kinds of the node pool and node class resources"""
+    if uses_v1beta1(version):
+        return {
+            "node_pool": ("karpenter.sh/v1beta1", "NodePool"),
+            "node_class": ("karpenter.k8s.aws/v1beta1", "EC2NodeClass")
+        }
+    return {
+        "node_pool": ("karpenter.sh/v1alpha5", "Provisioner"),
+        "node_class": ("karpenter.k8s.aws/v1alpha1", "AWSNodeTemplate")
+    }
+
+def chart_version(version: str) -> str:
+    """OCI chart tag of a Karpenter release"""
+    if parse_version(version)[:2] >= KARPENTER_UNPREFIXED_CHART_VERSION:
+        return version.lstrip("v")
+    return f"v{version.lstrip('v')}"
+
+def parse_duration(duration: str) -> float:
+    """Turns a Go duration such as "10s" or "1m30s" into seconds"""
+    parts = DURATION_PATTERN.findall(duration)
+    if not parts or "".join(number + unit for number, unit in parts) != duration:
+        raise ValueError(f"'{duration}' is not a duration like 10s, 500ms or 1m30s")
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+def batch_settings(max_duration: str, idle_duration: str) -> dict:
+    """
+    Scheduling batch window: Karpenter collects pending pods until none arrived for the idle duration, or the max
+    duration has passed, then launches capacity for the whole batch
+    """
+    max_seconds, idle_seconds = parse_duration(max_duration), parse_duration(idle_duration)
+    if idle_seconds <= 0 or idle_seconds > max_seconds:
+        raise ValueError(f"batch idle duration {idle_duration} has to be above zero and at most the max duration {max_duration}")
+    return {
+        "batchMaxDuration": max_duration,
+        "batchIdleDuration": idle_duration
+    }
+
+def controller_values(version: str, cluster_name: str, cluster_endpoint: str, role_arn: str, instance_profile: str, interruption_queue: str, batch: dict, replicas: int, resources: dict) -> dict:
+    """
+    Helm values of the controller chart. Releases before v1beta1 read the AWS settings from settings.aws and take the
+    default instance profile there, later ones read them from settings and get the node role from the node class.
+    """
+    if uses_v1beta1(version):
+        settings = {
+            "clusterName": cluster_name,
+            "clusterEndpoint": cluster_endpoint,
+            "interruptionQueue": interruption_queue,
+            **batch
+        }
+    else:
+        settings = {
+            "aws": {
+                "clusterName": cluster_name,
+                "clusterEndpoint": cluster_endpoint,
+                "defaultInstanceProfile": instance_profile,
+                "interruptionQueueName": interruption_queue
+            },
+            **batch
+        }
+    return {
+        "serviceAccount": {
+            "name": "karpenter",
+            "annotations": {"eks.amazonaws.com/role-arn": role_arn}
+        },
+        "replicas": replicas,
+        "settings": settings,
+        "controller": {
+            "resources": resources
+        }
+    }
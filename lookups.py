@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import time
+import pulumi
+from pulumi_aws import config, get_availability_zones, get_caller_identity
+
+"""
+Provider lookups made while the program starts. Results are cached on disk per AWS profile, access key and
+region, so repeated previews from the same environment skip the AWS round-trips until the cache expires. Credentials
+that come from neither a profile nor an access key, like an instance role, could belong to any account and aren't cached.
+"""
+
+LOOKUP_CACHE_FILE = ".lookup-cache.json"
+
+def cache_key():
+    """Profile, access key and region of the credentials, or None when nothing tells them apart"""
+    profile = config.profile or os.environ.get("AWS_PROFILE")
+    access_key = config.access_key or os.environ.get("AWS_ACCESS_KEY_ID")
+    if not profile and not access_key:
+        return None
+    # The access key ID is stored as a digest, the cache file only has to tell keys apart:
+    key_digest = hashlib.sha256(access_key.encode()).hexdigest()[:16] if access_key else "-"
+    return f"{profile or '-'}/{key_digest}/{config.region}"
+
+def read_cache() -> dict:
+    try:
+        with open(LOOKUP_CACHE_FILE) as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+def get_cached(name: str, ttl: int):
+    """Cached value of a lookup, or None when caching is disabled (ttl 0), the value is missing or it expired"""
+    key = cache_key()
+    if ttl <= 0 or key is None:
+        return None
+    entry = read_cache().get(key, {}).get(name)
+    if entry is None or time.time() - entry["fetched_at"] > ttl:
+        return None
+    return entry["value"]
+
+def put_cached(name: str, value, ttl: int):
+    """Stores a lookup result and passes it through, a cache that can't be written is skipped"""
+    key = cache_key()
+    if ttl > 0 and key is not None:
+        cache = read_cache()
+        cache.setdefault(key, {})[name] = {"value": value, "fetched_at": time.time()}
+        try:
+            with open(LOOKUP_CACHE_FILE, "w") as cache_file:
+                json.dump(cache, cache_file, indent=2)
+        except OSError:
+            pulumi.log.debug(f"Lookup cache {LOOKUP_CACHE_FILE} is not writable, skipping")
+    return value
+
+def lookup_account_id(ttl: int) -> pulumi.Output:
+    """Account ID of the deploying credentials as an Output, the invoke runs alongside resource registration"""
+    cached = get_cached("account_id", ttl)
+    if cached is not None:
+        return pulumi.Output.from_input(cached)
+    # pulumi-aws 5 has no Output form of get_caller_identity. Calling it from an apply keeps the program from waiting
+    # on STS, the invoke runs once the event loop picks the callback up:
+    return pulumi.Output.from_input(ttl).apply(lambda ttl: put_cached("account_id", get_caller_identity().account_id, ttl))
+
+def lookup_availability_zones(ttl: int) -> list:
+    """
+    Names of the available AZs. They are part of the subnet resource names, so a cache miss has to block on the invoke
+    """
+    cached = get_cached("availability_zones", ttl)
+    if cached is not None:
+        return cached
+    return put_cached("availability_zones", get_availability_zones(state="available").names, ttl)
@@ -0,0 +1,158 @@
+import json
+
+from pulumi import export, Output, RunError
+from pulumi_aws import cloudwatch, sns
+
+from settings import general_tags, deployment_region, deploys_layer, postgres_instance_size, redis_instance_size, redis_cluster_mode_enabled, redis_num_node_groups, redis_replicas_per_node_group, redis_num_cache_clusters, demo_az_count, endpoint_services, monitoring_enabled, monitoring_alarm_email, monitoring_egress_bytes_per_period, monitoring_threshold_overrides
+from rds import demo_sql_cluster, demo_sql_replicas
+from elasticache import demo_redis_cluster
+from monitoring_thresholds import alarm_table
+
+"""
+CloudWatch alarms and a performance dashboard for PostgreSQL, Redis, the NAT gateways and the VPC endpoints, all built
+from the threshold table in monitoring_thresholds.py. Without the network layer in the same stack, the NAT gateway and
+VPC endpoint IDs are read from the network stack outputs
+"""
+
+# Alarms are evaluated over 5 minute periods:
+ALARM_PERIOD_SECONDS = 300
+
+# Dashboard grid: 24 columns, three widgets per row:
+DASHBOARD_WIDGET_WIDTH = 8
+DASHBOARD_WIDGET_HEIGHT = 6
+
+demo_alarms = []
+
+def create_alarms(group: str, resources: list, alarm_topic) -> list:
+    """Create one alarm per table entry and monitored resource of a table group"""
+    alarms = []
+    for entry in monitoring_alarm_table[group]["alarms"]:
+        for i, (label, dimensions) in enumerate(resources):
+            alarms.append(cloudwatch.MetricAlarm(f"demo-{group.replace('_', '-')}-{i}-{entry['metric'].lower()}-alarm",
+                alarm_description=entry["description"],
+                namespace=monitoring_alarm_table[group]["namespace"],
+                metric_name=entry["metric"],
+                dimensions=dimensions,
+                statistic=entry["statistic"],
+                period=ALARM_PERIOD_SECONDS,
+                evaluation_periods=entry["evaluation_periods"],
+                threshold=entry["threshold"],
+                comparison_operator=entry["comparison"],
+                treat_missing_data="notBreaching",
+                alarm_actions=[alarm_topic.arn],
+                ok_actions=[alarm_topic.arn],
+                tags=general_tags
+            ))
+    return alarms
+
+def dashboard_widgets(monitored: dict) -> list:
+    """One dashboard widget per table entry of every table group with monitored resources"""
+    widgets = []
+    for group, resources in monitored.items():
+        namespace = monitoring_alarm_table[group]["namespace"]
+        for entry in monitoring_alarm_table[group]["alarms"]:
+            if resources:
+                position = len(widgets)
+                widgets.append({
+                    "type": "metric",
+                    "x": position % 3 * DASHBOARD_WIDGET_WIDTH,
+                    "y": position // 3 * DASHBOARD_WIDGET_HEIGHT,
+                    "width": DASHBOARD_WIDGET_WIDTH,
+                    "height": DASHBOARD_WIDGET_HEIGHT,
+                    "properties": {
+                        "title": f"{group} {entry['metric']}",
+                        "region": deployment_region,
+                        "period": ALARM_PERIOD_SECONDS,
+                        "stat": entry["statistic"],
+                        "metrics": [
+                            [namespace, entry["metric"], *[part for item in dimensions.items() for part in item], {"label": label}]
+                            for label, dimensions in resources
+                        ],
+                        "annotations": {
+                            "horizontal": [{"label": entry["description"], "value": entry["threshold"]}]
+                        }
+                    }
+                })
+    return widgets
+
+def redis_member_suffixes() -> list:
+    """
+    ElastiCache names the member clusters after the replication group: <id>-001, <id>-002, ... and <id>-0001-001 per
+    shard and node in cluster mode. The alarms follow the configured topology, so they are all known at preview time
+    """
+    if redis_cluster_mode_enabled:
+        return [f"-{shard:04}-{node:03}" for shard in range(1, redis_num_node_groups + 1) for node in range(1, redis_replicas_per_node_group + 2)]
+    return [f"-{node:03}" for node in range(1, redis_num_cache_clusters + 1)]
+
+if monitoring_enabled:
+    try:
+        monitoring_alarm_table = alarm_table(postgres_instance_size, redis_instance_size, monitoring_egress_bytes_per_period, monitoring_threshold_overrides)
+    except ValueError as e:
+        raise RunError(f"Invalid monitoring thresholds: {e}")
+
+    # Monitored resources of every table group as (label, CloudWatch dimensions):
+    monitored_resources = {
+        "postgres": [(instance.identifier, {"DBInstanceIdentifier": instance.identifier}) for instance in [demo_sql_cluster] + demo_sql_replicas],
+        "redis": []
+    }
+    # Redis metrics are per member cluster:
+    for suffix in redis_member_suffixes():
+        member_id = Output.concat(demo_redis_cluster.id, suffix)
+        monitored_resources["redis"].append((member_id, {"CacheClusterId": member_id}))
+
+    if deploys_layer("network"):
+        from vpc import demo_vpc, demo_azs, demo_nat_gateways
+        from vpc_endpoints import endpoints
+
+        monitored_resources["nat_gateway"] = [(f"nat-{az}", {"NatGatewayId": nat.id}) for az, nat in zip(demo_azs, demo_nat_gateways)]
+        # Gateway endpoints publish no metrics, only the Interface endpoints are monitored:
+        monitored_resources["vpc_endpoint"] = [
+            (endpoint.service_name, {
+                "VPC Id": demo_vpc.id,
+                "VPC Endpoint Id": endpoint.id,
+                "Endpoint Type": "Interface",
+                "Service Name": endpoint.service_name
+            }) for endpoint in endpoints
+        ]
+    else:
+        # The network resources live in the network stack. The alarms follow the configured AZs and endpoint services,
+        # only their IDs come from the network stack outputs:
+        from network import vpc_id, demo_azs, nat_gateway_ids, interface_endpoints
+
+        monitored_resources["nat_gateway"] = [
+            (f"nat-{az}", {"NatGatewayId": nat_gateway_ids.apply(lambda ids, az=az: ids[az])}) for az in demo_azs[:demo_az_count]
+        ]
+        endpoint_ids = interface_endpoints.apply(lambda endpoints: {endpoint["service-name"]: endpoint["id"] for endpoint in endpoints})
+        monitored_resources["vpc_endpoint"] = []
+        for service in endpoint_services:
+            service_name = f"com.amazonaws.{deployment_region}.{service}"
+            monitored_resources["vpc_endpoint"].append((service_name, {
+                "VPC Id": vpc_id,
+                "VPC Endpoint Id": endpoint_ids.apply(lambda ids, service_name=service_name: ids[service_name]),
+                "Endpoint Type": "Interface",
+                "Service Name": service_name
+            }))
+
+    # Create the alarm topic:
+    demo_alarm_topic = sns.Topic("demo-monitoring-alarms",
+        tags=general_tags
+    )
+    if monitoring_alarm_email:
+        demo_alarm_email_subscription = sns.TopicSubscription("demo-monitoring-alarms-email",
+            topic=demo_alarm_topic.arn,
+            protocol="email",
+            endpoint=monitoring_alarm_email
+        )
+
+    # Create the alarms:
+    for group, resources in monitored_resources.items():
+        demo_alarms.extend(create_alarms(group, resources, demo_alarm_topic))
+
+    # Create the dashboard, the widget definitions carry resource IDs that resolve at deploy time:
+    demo_dashboard = cloudwatch.Dashboard("demo-performance-dashboard",
+        dashboard_name="demo-cilium-webstore-performance",
+        dashboard_body=Output.from_input(monitored_resources).apply(lambda monitored: json.dumps({"widgets": dashboard_widgets(monitored)}))
+    )
+
+    export("monitoring-alarm-topic-arn", demo_alarm_topic.arn)
+    export("monitoring-dashboard-name", demo_dashboard.dashboard_name)
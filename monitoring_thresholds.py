@@ -0,0 +1,101 @@
+from postgres_tuning import instance_class_resources, derive_parameters, GIB
+
+"""
+Alarm thresholds for the data tier and the VPC egress paths, one declarative table that monitoring.py turns into
+CloudWatch alarms and dashboard widgets. Thresholds tied to capacity scale with the configured instance classes.
+Pure python on purpose, so the thresholds can be checked without AWS or Pulumi.
+"""
+
+# Memory (GiB) and vCPU of the ElastiCache node types:
+ELASTICACHE_NODE_TYPES = {
+    "cache.t4g.micro": (0.5, 2),
+    "cache.t4g.small": (1.37, 2),
+    "cache.t4g.medium": (3.09, 2),
+    "cache.t3.micro": (0.5, 2),
+    "cache.t3.small": (1.37, 2),
+    "cache.t3.medium": (3.09, 2),
+    "cache.m6g.large": (6.38, 2),
+    "cache.m6g.xlarge": (12.93, 4),
+    "cache.m6g.2xlarge": (26.04, 8),
+    "cache.m6g.4xlarge": (52.26, 16),
+    "cache.r6g.large": (13.07, 2),
+    "cache.r6g.xlarge": (26.32, 4),
+    "cache.r6g.2xlarge": (52.82, 8),
+    "cache.r6g.4xlarge": (105.81, 16)
+}
+
+# Share of PostgreSQL max_connections in use and of instance memory left that raise an alarm:
+POSTGRES_CONNECTIONS_ALARM_RATIO = 0.8
+POSTGRES_FREEABLE_MEMORY_ALARM_RATIO = 0.1
+
+# Redis serves every client from one event loop thread, the connections it keeps up with grow with the node's vCPUs:
+REDIS_CONNECTIONS_PER_VCPU = 2000
+
+def elasticache_node_resources(node_type: str) -> tuple:
+    """Memory in GiB and vCPU count of an ElastiCache node type"""
+    if node_type not in ELASTICACHE_NODE_TYPES:
+        raise ValueError(f"no memory/vCPU data for node type '{node_type}', add it to ELASTICACHE_NODE_TYPES")
+    return ELASTICACHE_NODE_TYPES[node_type]
+
+def alarm(metric: str, statistic: str, comparison: str, threshold: float, description: str, evaluation_periods: int=3) -> dict:
+    return {
+        "metric": metric,
+        "statistic": statistic,
+        "comparison": comparison,
+        "threshold": threshold,
+        "description": description,
+        "evaluation_periods": evaluation_periods
+    }
+
+def alarm_table(postgres_instance_class: str, redis_node_type: str, egress_bytes_per_period: int, overrides: dict=None) -> dict:
+    """
+    Returns resource group -> {"namespace", "alarms"}, every alarm evaluated over 5 minute periods. Overrides are keyed
+    "group.metric" and replace the derived threshold.
+    """
+    postgres_memory, _ = instance_class_resources(postgres_instance_class)
+    postgres_max_connections = int(derive_parameters(postgres_instance_class)["max_connections"][0])
+    _, redis_vcpu = elasticache_node_resources(redis_node_type)
+
+    table = {
+        "postgres": {
+            "namespace": "AWS/RDS",
+            "alarms": [
+                alarm("CPUUtilization", "Average", "GreaterThanThreshold", 80, "PostgreSQL CPU above 80%"),
+                alarm("ReadLatency", "Average", "GreaterThanThreshold", 0.02, "PostgreSQL reads slower than 20ms"),
+                alarm("DatabaseConnections", "Maximum", "GreaterThanThreshold", int(postgres_max_connections * POSTGRES_CONNECTIONS_ALARM_RATIO),
+                    f"PostgreSQL above {POSTGRES_CONNECTIONS_ALARM_RATIO:.0%} of max_connections ({postgres_max_connections})"),
+                alarm("FreeableMemory", "Minimum", "LessThanThreshold", int(postgres_memory * POSTGRES_FREEABLE_MEMORY_ALARM_RATIO),
+                    f"PostgreSQL freeable memory below {POSTGRES_FREEABLE_MEMORY_ALARM_RATIO:.0%} of {postgres_memory // GIB} GiB")
+            ]
+        },
+        "redis": {
+            "namespace": "AWS/ElastiCache",
+            "alarms": [
+                alarm("EngineCPUUtilization", "Average", "GreaterThanThreshold", 90, "Redis engine thread CPU above 90%"),
+                alarm("Evictions", "Sum", "GreaterThanThreshold", 1000, "Redis evicting keys, the cache is too small"),
+                alarm("CurrConnections", "Maximum", "GreaterThanThreshold", REDIS_CONNECTIONS_PER_VCPU * redis_vcpu,
+                    f"Redis above {REDIS_CONNECTIONS_PER_VCPU * redis_vcpu} client connections"),
+                alarm("ReplicationLag", "Maximum", "GreaterThanThreshold", 1, "Redis replica more than 1s behind")
+            ]
+        },
+        "nat_gateway": {
+            "namespace": "AWS/NATGateway",
+            "alarms": [
+                alarm("BytesOutToDestination", "Sum", "GreaterThanThreshold", egress_bytes_per_period, "NAT gateway egress above the expected volume"),
+                alarm("PacketsDropCount", "Sum", "GreaterThanThreshold", 0, "NAT gateway dropping packets", evaluation_periods=1)
+            ]
+        },
+        "vpc_endpoint": {
+            "namespace": "AWS/PrivateLinkEndpoints",
+            "alarms": [
+                alarm("BytesProcessed", "Sum", "GreaterThanThreshold", egress_bytes_per_period, "VPC endpoint traffic above the expected volume")
+            ]
+        }
+    }
+
+    alarms = {f"{group}.{a['metric']}": a for group in table for a in table[group]["alarms"]}
+    for key, threshold in (overrides or {}).items():
+        if key not in alarms:
+            raise ValueError(f"unknown alarm '{key}', alarms are {', '.join(alarms)}")
+        alarms[key]["threshold"] = threshold
+    return table
@@ -0,0 +1,46 @@
+import pulumi
+
+from settings import deploys_layer, network_stack_name, lookup_cache_ttl
+from lookups import lookup_availability_zones
+
+"""
+Network layer outputs consumed by the data and cluster layers: taken from the network modules when the network layer
+is part of this stack, read from the network stack through a StackReference otherwise
+"""
+
+if deploys_layer("network"):
+    from vpc import demo_vpc, demo_azs, demo_private_subnets, demo_eks_cp_subnets, demo_db_subnets, demo_nat_gateways
+    from subnet_groups import demo_postgresql_subnet_group, demo_redis_subnet_group
+    from vpc_endpoints import endpoints
+
+    vpc_id = demo_vpc.id
+    private_subnet_ids = pulumi.Output.all(*[s.id for s in demo_private_subnets])
+    eks_cp_subnet_ids = pulumi.Output.all(*[s.id for s in demo_eks_cp_subnets])
+    db_subnet_ids = pulumi.Output.all(*[s.id for s in demo_db_subnets])
+    postgresql_subnet_group_name = demo_postgresql_subnet_group.name
+    redis_subnet_group_name = demo_redis_subnet_group.name
+    nat_gateway_ids = {az: nat.id for az, nat in zip(demo_azs, demo_nat_gateways)}
+    interface_endpoints = [{"id": endpoint.id, "service-name": endpoint.service_name} for endpoint in endpoints]
+
+    # Export the network outputs for the data and cluster layer stacks:
+    pulumi.export("vpc-id", vpc_id)
+    pulumi.export("private-subnet-ids", private_subnet_ids)
+    pulumi.export("eks-cp-subnet-ids", eks_cp_subnet_ids)
+    pulumi.export("db-subnet-ids", db_subnet_ids)
+    pulumi.export("postgresql-subnet-group-name", postgresql_subnet_group_name)
+    pulumi.export("redis-subnet-group-name", redis_subnet_group_name)
+    pulumi.export("nat-gateway-ids", nat_gateway_ids)
+    pulumi.export("interface-endpoints", interface_endpoints)
+else:
+    # AZ names are plain strings needed at program time, so every layer looks them up for the same region:
+    demo_azs = lookup_availability_zones(lookup_cache_ttl)
+    network_stack = pulumi.StackReference(network_stack_name)
+
+    vpc_id = network_stack.require_output("vpc-id")
+    private_subnet_ids = network_stack.require_output("private-subnet-ids")
+    eks_cp_subnet_ids = network_stack.require_output("eks-cp-subnet-ids")
+    db_subnet_ids = network_stack.require_output("db-subnet-ids")
+    postgresql_subnet_group_name = network_stack.require_output("postgresql-subnet-group-name")
+    redis_subnet_group_name = network_stack.require_output("redis-subnet-group-name")
+    nat_gateway_ids = network_stack.require_output("nat-gateway-ids")
+    interface_endpoints = network_stack.require_output("interface-endpoints")
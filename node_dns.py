@@ -0,0 +1,206 @@
+from pulumi import ResourceOptions, Output
+import pulumi_kubernetes as k8s
+from pulumi_kubernetes.helm.v3 import Release, ReleaseArgs, RepositoryOptsArgs
+
+from settings import coredns_autoscaler_enabled, coredns_autoscaler_linear_params, coredns_cache_ttl, node_local_dns_enabled, node_local_dns_version
+from eks import role_provider, core_dns_addon, cilium_cni_release, managed_nodegroup
+from node_dns_corefile import render_node_local_dns_corefile
+
+"""
+Cluster DNS scaling: a proportional autoscaler for CoreDNS and an optional NodeLocal DNSCache,
+wired to kube-dns through a Cilium Local Redirect Policy since kube-proxy (and its iptables rules) is replaced by Cilium
+"""
+
+"""
+CoreDNS proportional autoscaler:
+"""
+if coredns_autoscaler_enabled:
+    # Scale CoreDNS replicas with the number of nodes and cores in the cluster. The autoscaler retries until the CoreDNS
+    # deployment exists, so it only waits for schedulable nodes and installs alongside the add-on:
+    coredns_autoscaler_release = Release("coredns-autoscaler",
+        ReleaseArgs(
+            chart="cluster-proportional-autoscaler",
+            version="1.1.0",
+            namespace="kube-system",
+            repository_opts=RepositoryOptsArgs(
+                repo="https://kubernetes-sigs.github.io/cluster-proportional-autoscaler",
+            ),
+            values={
+                "nameOverride": "coredns-autoscaler",
+                "config": {
+                    "linear": coredns_autoscaler_linear_params
+                },
+                "options": {
+                    "namespace": "kube-system",
+                    "target": "deployment/coredns"
+                },
+                "resources": {
+                    "requests": {"cpu": "20m", "memory": "10Mi"},
+                    "limits": {"memory": "50Mi"}
+                }
+            }
+        ),
+        opts=ResourceOptions(
+            provider=role_provider,
+            depends_on=[managed_nodegroup, cilium_cni_release]
+        )
+    )
+
+"""
+NodeLocal DNSCache:
+"""
+if node_local_dns_enabled:
+    node_local_dns_labels = {"k8s-app": "node-local-dns"}
+
+    # The kube-dns service IP is one of the addresses node-local-dns answers for:
+    kube_dns_service = k8s.core.v1.Service.get("kube-dns-service", "kube-system/kube-dns",
+        opts=ResourceOptions(
+            provider=role_provider,
+            depends_on=[core_dns_addon]
+        )
+    )
+
+    # Service selecting the CoreDNS pods, used by node-local-dns on cache misses:
+    kube_dns_upstream_service = k8s.core.v1.Service("kube-dns-upstream-service",
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name="kube-dns-upstream",
+            namespace="kube-system",
+            labels={"k8s-app": "kube-dns"}
+        ),
+        spec=k8s.core.v1.ServiceSpecArgs(
+            selector={"k8s-app": "kube-dns"},
+            ports=[
+                k8s.core.v1.ServicePortArgs(name="dns", port=53, protocol="UDP", target_port=53),
+                k8s.core.v1.ServicePortArgs(name="dns-tcp", port=53, protocol="TCP", target_port=53)
+            ]
+        ),
+        opts=ResourceOptions(
+            provider=role_provider,
+            depends_on=[core_dns_addon]
+        )
+    )
+
+    node_local_dns_service_account = k8s.core.v1.ServiceAccount("node-local-dns-service-account",
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name="node-local-dns",
+            namespace="kube-system"
+        ),
+        opts=ResourceOptions(provider=role_provider)
+    )
+
+    # Cache configuration, the __PILLAR__ placeholders are filled in by node-local-dns from the upstream service:
+    node_local_dns_config = k8s.core.v1.ConfigMap("node-local-dns-config",
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name="node-local-dns",
+            namespace="kube-system"
+        ),
+        data={
+            "Corefile": render_node_local_dns_corefile(coredns_cache_ttl)
+        },
+        opts=ResourceOptions(provider=role_provider)
+    )
+
+    # Run the cache on every node as a regular pod, Cilium redirects kube-dns traffic to the local instance:
+    node_local_dns_daemonset = k8s.apps.v1.DaemonSet("node-local-dns",
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name="node-local-dns",
+            namespace="kube-system",
+            labels=node_local_dns_labels
+        ),
+        spec=k8s.apps.v1.DaemonSetSpecArgs(
+            selector=k8s.meta.v1.LabelSelectorArgs(match_labels=node_local_dns_labels),
+            update_strategy=k8s.apps.v1.DaemonSetUpdateStrategyArgs(
+                rolling_update=k8s.apps.v1.RollingUpdateDaemonSetArgs(max_unavailable="10%")
+            ),
+            template=k8s.core.v1.PodTemplateSpecArgs(
+                metadata=k8s.meta.v1.ObjectMetaArgs(
+                    labels=node_local_dns_labels,
+                    annotations={"prometheus.io/port": "9253", "prometheus.io/scrape": "true"}
+                ),
+                spec=k8s.core.v1.PodSpecArgs(
+                    service_account_name="node-local-dns",
+                    priority_class_name="system-node-critical",
+                    dns_policy="Default",
+                    tolerations=[k8s.core.v1.TolerationArgs(operator="Exists")],
+                    containers=[k8s.core.v1.ContainerArgs(
+                        name="node-cache",
+                        image=f"registry.k8s.io/dns/k8s-dns-node-cache:{node_local_dns_version}",
+                        args=[
+                            "-localip", Output.concat("169.254.20.10,", kube_dns_service.spec.cluster_ip),
+                            "-conf", "/etc/Corefile",
+                            "-upstreamsvc", "kube-dns-upstream",
+                            "-skipteardown=true",
+                            "-setupinterface=false",
+                            "-setupiptables=false"
+                        ],
+                        resources=k8s.core.v1.ResourceRequirementsArgs(
+                            requests={"cpu": "25m", "memory": "5Mi"},
+                            limits={"memory": "64Mi"}
+                        ),
+                        ports=[
+                            k8s.core.v1.ContainerPortArgs(name="dns", container_port=53, protocol="UDP"),
+                            k8s.core.v1.ContainerPortArgs(name="dns-tcp", container_port=53, protocol="TCP"),
+                            k8s.core.v1.ContainerPortArgs(name="metrics", container_port=9253, protocol="TCP")
+                        ],
+                        liveness_probe=k8s.core.v1.ProbeArgs(
+                            http_get=k8s.core.v1.HTTPGetActionArgs(path="/health", port=8080),
+                            initial_delay_seconds=60,
+                            timeout_seconds=5
+                        ),
+                        volume_mounts=[
+                            k8s.core.v1.VolumeMountArgs(name="config-volume", mount_path="/etc/coredns"),
+                            k8s.core.v1.VolumeMountArgs(name="kube-dns-config", mount_path="/etc/kube-dns")
+                        ]
+                    )],
+                    volumes=[
+                        k8s.core.v1.VolumeArgs(
+                            name="kube-dns-config",
+                            config_map=k8s.core.v1.ConfigMapVolumeSourceArgs(name="kube-dns", optional=True)
+                        ),
+                        k8s.core.v1.VolumeArgs(
+                            name="config-volume",
+                            config_map=k8s.core.v1.ConfigMapVolumeSourceArgs(
+                                name="node-local-dns",
+                                items=[k8s.core.v1.KeyToPathArgs(key="Corefile", path="Corefile.base")]
+                            )
+                        )
+                    ]
+                )
+            )
+        ),
+        opts=ResourceOptions(
+            provider=role_provider,
+            depends_on=[node_local_dns_config, node_local_dns_service_account, kube_dns_upstream_service]
+        )
+    )
+
+    # Redirect kube-dns traffic to the node-local-dns pod on the same node:
+    node_local_dns_redirect_policy = k8s.apiextensions.CustomResource("node-local-dns-redirect-policy",
+        api_version="cilium.io/v2",
+        kind="CiliumLocalRedirectPolicy",
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name="nodelocaldns",
+            namespace="kube-system"
+        ),
+        spec={
+            "redirectFrontend": {
+                "serviceMatcher": {
+                    "serviceName": "kube-dns",
+                    "namespace": "kube-system"
+                }
+            },
+            "redirectBackend": {
+                "localEndpointSelector": {
+                    "matchLabels": node_local_dns_labels
+                },
+                "toPorts": [
+                    {"port": "53", "name": "dns", "protocol": "UDP"},
+                    {"port": "53", "name": "dns-tcp", "protocol": "TCP"}
+                ]
+            }
+        },
+        opts=ResourceOptions(
+            provider=role_provider,
+            depends_on=[cilium_cni_release, node_local_dns_daemonset]
+        )
+    )
@@ -0,0 +1,35 @@
+"""
+NodeLocal DNSCache Corefile: the cluster zones go to CoreDNS, everything else to the upstream servers of the node.
+Pure python on purpose, so the Corefile can be rendered without a cluster.
+"""
+
+# Zones served by CoreDNS inside the cluster:
+CLUSTER_ZONES = ["cluster.local", "in-addr.arpa", "ip6.arpa"]
+
+def render_node_local_dns_corefile(cache_ttl: int) -> str:
+    """Cluster zones are forwarded to CoreDNS over TCP, everything else to the upstream servers of the node"""
+    cluster_zones = [f"""{zone}:53 {{
+    errors
+    cache {{
+        success 9984 {cache_ttl}
+        denial 9984 5
+    }}
+    reload
+    loop
+    bind 0.0.0.0
+    forward . __PILLAR__CLUSTER__DNS__ {{
+        force_tcp
+    }}
+    prometheus :9253
+}}""" for zone in CLUSTER_ZONES]
+    external_zone = f""".:53 {{
+    errors
+    cache {cache_ttl}
+    reload
+    loop
+    bind 0.0.0.0
+    forward . __PILLAR__UPSTREAM__SERVERS__
+    prometheus :9253
+    health
+}}"""
+    return "\n".join(cluster_zones + [external_zone]) + "\n"
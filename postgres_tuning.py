@@ -0,0 +1,93 @@
+"""
+PostgreSQL tuning derived from the RDS instance class: memory and vCPU based parameters plus gp3 storage validation.
+Pure python on purpose, so the derivation can be checked without AWS or Pulumi.
+"""
+
+GIB = 1024 ** 3
+
+# Memory (GiB) and vCPU of the RDS instance classes:
+RDS_INSTANCE_CLASSES = {
+    "db.t3.micro": (1, 2),
+    "db.t3.small": (2, 2),
+    "db.t3.medium": (4, 2),
+    "db.t3.large": (8, 2),
+    "db.t3.xlarge": (16, 4),
+    "db.t3.2xlarge": (32, 8),
+    "db.t4g.micro": (1, 2),
+    "db.t4g.small": (2, 2),
+    "db.t4g.medium": (4, 2),
+    "db.t4g.large": (8, 2),
+    "db.t4g.xlarge": (16, 4),
+    "db.t4g.2xlarge": (32, 8),
+    "db.m5.large": (8, 2),
+    "db.m5.xlarge": (16, 4),
+    "db.m5.2xlarge": (32, 8),
+    "db.m5.4xlarge": (64, 16),
+    "db.m6g.large": (8, 2),
+    "db.m6g.xlarge": (16, 4),
+    "db.m6g.2xlarge": (32, 8),
+    "db.m6g.4xlarge": (64, 16),
+    "db.m6g.8xlarge": (128, 32),
+    "db.r5.large": (16, 2),
+    "db.r5.xlarge": (32, 4),
+    "db.r5.2xlarge": (64, 8),
+    "db.r5.4xlarge": (128, 16),
+    "db.r6g.large": (16, 2),
+    "db.r6g.xlarge": (32, 4),
+    "db.r6g.2xlarge": (64, 8),
+    "db.r6g.4xlarge": (128, 16),
+    "db.r6g.8xlarge": (256, 32)
+}
+
+# RDS sizes max_connections as LEAST(DBInstanceClassMemory/9531392, 5000):
+RDS_BYTES_PER_CONNECTION = 9531392
+RDS_MAX_CONNECTIONS = 5000
+
+# RDS Proxy multiplexes the Saleor clients, so backend connections are also capped by what the vCPUs can serve:
+MAX_CONNECTIONS_PER_VCPU = 100
+
+# gp3 IOPS and throughput are only provisioned separately from 400 GiB of PostgreSQL storage:
+GP3_PROVISIONED_MIN_STORAGE = 400
+GP3_IOPS_RANGE = (12000, 64000)
+GP3_THROUGHPUT_RANGE = (500, 4000)
+
+def instance_class_resources(instance_class: str) -> tuple:
+    """Memory in bytes and vCPU count of an RDS instance class"""
+    if instance_class not in RDS_INSTANCE_CLASSES:
+        raise ValueError(f"no memory/vCPU data for instance class '{instance_class}', add it to RDS_INSTANCE_CLASSES")
+    memory_gib, vcpu = RDS_INSTANCE_CLASSES[instance_class]
+    return memory_gib * GIB, vcpu
+
+def derive_parameters(instance_class: str) -> dict:
+    """
+    Returns parameter name -> (value, apply method):
+    shared_buffers 25% and effective_cache_size 75% of memory (8kB pages), max_connections following the RDS formula
+    capped per vCPU, work_mem splitting the remaining memory over three sort/hash operations per connection
+    (kB, never below the 4MB default), SSD random_page_cost and parallel workers from the vCPU count.
+    """
+    memory, vcpu = instance_class_resources(instance_class)
+    shared_buffers = memory // 4
+    max_connections = min(memory // RDS_BYTES_PER_CONNECTION, MAX_CONNECTIONS_PER_VCPU * vcpu, RDS_MAX_CONNECTIONS)
+    work_mem_kb = max((memory - shared_buffers) // (max_connections * 3) // 1024, 4096)
+    return {
+        "shared_buffers": (str(shared_buffers // 8192), "pending-reboot"),
+        "max_connections": (str(max_connections), "pending-reboot"),
+        "effective_cache_size": (str(memory * 3 // 4 // 8192), "immediate"),
+        "work_mem": (str(work_mem_kb), "immediate"),
+        "random_page_cost": ("1.1", "immediate"),
+        "max_parallel_workers": (str(vcpu), "immediate"),
+        "max_parallel_workers_per_gather": (str(max(vcpu // 2, 1)), "immediate")
+    }
+
+def validate_gp3_storage(allocated_storage: int, max_allocated_storage: int, iops: int=None, throughput: int=None) -> None:
+    """Rejects gp3 storage settings RDS for PostgreSQL won't accept"""
+    if max_allocated_storage and max_allocated_storage <= allocated_storage:
+        raise ValueError(f"max allocated storage ({max_allocated_storage} GiB) must be larger than the allocated storage ({allocated_storage} GiB), or 0 to disable autoscaling")
+    if iops is None and throughput is None:
+        return
+    if allocated_storage < GP3_PROVISIONED_MIN_STORAGE:
+        raise ValueError(f"gp3 IOPS and throughput can only be set from {GP3_PROVISIONED_MIN_STORAGE} GiB of storage, allocated storage is {allocated_storage} GiB")
+    if iops is not None and not GP3_IOPS_RANGE[0] <= iops <= GP3_IOPS_RANGE[1]:
+        raise ValueError(f"gp3 IOPS must be between {GP3_IOPS_RANGE[0]} and {GP3_IOPS_RANGE[1]}, got {iops}")
+    if throughput is not None and not GP3_THROUGHPUT_RANGE[0] <= throughput <= GP3_THROUGHPUT_RANGE[1]:
+        raise ValueError(f"gp3 throughput must be between {GP3_THROUGHPUT_RANGE[0]} and {GP3_THROUGHPUT_RANGE[1]} MiBps, got {throughput}")
@@ -1,16 +1,19 @@
-from pulumi_aws import rds, ec2, ssm
-from pulumi import export, ResourceOptions, Output
+from pulumi_aws import rds, ec2, ssm, iam, secretsmanager, route53
+from pulumi import export, ResourceOptions, Output, RunError
 
-from settings import general_tags, postgres_instance_size, demo_db_subnet_cidrs, demo_private_subnet_cidrs, sql_user, sql_password, db_name, sql_connection_string_ssm_parameter_name
-from subnet_groups import demo_postgresql_subnet_group
-from vpc import demo_vpc
+import json
+
+from settings import general_tags, postgres_instance_size, postgres_allocated_storage, postgres_max_allocated_storage, postgres_iops, postgres_storage_throughput, postgres_performance_insights_enabled, postgres_read_replicas, postgres_proxy_require_tls, postgres_proxy_max_connections_percent, postgres_proxy_max_idle_connections_percent, demo_az_count, demo_db_subnet_cidrs, demo_private_subnet_cidrs, sql_user, sql_password, db_name, sql_connection_string_ssm_parameter_name, sql_replica_connection_string_ssm_parameter_name
+from network import vpc_id, demo_azs, db_subnet_ids, postgresql_subnet_group_name
+from helpers import create_iam_role
+from postgres_tuning import derive_parameters, validate_gp3_storage
 
 """
 Create a PostgreSQL cluster security group:
 """
 demo_sql_security_group = ec2.SecurityGroup(f"demo-sql-security-group",
     description="PostgreSQL security group",
-    vpc_id=demo_vpc.id,
+    vpc_id=vpc_id,
     tags={**general_tags, "Name": "demo-sql-security-group"}
 )
 
@@ -33,24 +36,46 @@ demo_sql_security_group_oubound = ec2.SecurityGroupRule("demo-sql-security-group
     cidr_blocks=["0.0.0.0/0"],
     security_group_id=demo_sql_security_group.id
 )
+"""
+Create a PostgreSQL parameter group tuned for the instance class:
+"""
+try:
+    postgres_parameters = derive_parameters(postgres_instance_size)
+    validate_gp3_storage(postgres_allocated_storage, postgres_max_allocated_storage, postgres_iops, postgres_storage_throughput)
+except ValueError as e:
+    raise RunError(f"Invalid PostgreSQL settings: {e}")
+
+demo_sql_parameter_group = rds.ParameterGroup("demo-saleor-core-sql-parameter-group",
+    family="postgres13",
+    description=f"Saleor Core PostgreSQL parameters for {postgres_instance_size}",
+    parameters=[rds.ParameterGroupParameterArgs(name=name, value=value, apply_method=apply_method) for name, (value, apply_method) in postgres_parameters.items()],
+    tags={**general_tags, "Name": "demo-saleor-core-sql-parameter-group"}
+)
+
 """
 Create a PostgreSQL cluster:
 """
 demo_sql_cluster = rds.Instance("demo-saleor-core-sql-cluster",
-    db_subnet_group_name=demo_postgresql_subnet_group.name,
+    db_subnet_group_name=postgresql_subnet_group_name,
     vpc_security_group_ids=[demo_sql_security_group.id],
     storage_encrypted=True,
-    allocated_storage=20,
+    allocated_storage=postgres_allocated_storage,
+    max_allocated_storage=postgres_max_allocated_storage,
     storage_type="gp3",
+    iops=postgres_iops,
+    storage_throughput=postgres_storage_throughput,
+    parameter_group_name=demo_sql_parameter_group.name,
     identifier="saleor",
     multi_az=True,
     engine="postgres",
     engine_version="13.7",
     port=5432,
-    performance_insights_enabled=False,
+    performance_insights_enabled=postgres_performance_insights_enabled,
+    performance_insights_retention_period=7 if postgres_performance_insights_enabled else None,
     network_type="IPV4",
     instance_class=postgres_instance_size,
     skip_final_snapshot=True,
+    backup_retention_period=1 if postgres_read_replicas > 0 else None,
     iam_database_authentication_enabled=False,
     auto_minor_version_upgrade=False,
     apply_immediately=True,
@@ -62,15 +87,181 @@ demo_sql_cluster = rds.Instance("demo-saleor-core-sql-cluster",
 )
 
 export("postgres-endpoint", demo_sql_cluster.endpoint)
-postgres_endpoint = Output.concat("postgres://", sql_user, ":", sql_password, "@", demo_sql_cluster.endpoint, "/", db_name)
 
 """
-Populate SSM parameter store with the SQL connection string:
+Create cross-AZ read replicas, spread over the AZs starting with the second one:
+"""
+demo_sql_replicas = []
+for i in range(postgres_read_replicas):
+    demo_sql_replicas.append(rds.Instance(f"demo-saleor-core-sql-replica-{i}",
+        replicate_source_db=demo_sql_cluster.identifier,
+        vpc_security_group_ids=[demo_sql_security_group.id],
+        availability_zone=demo_azs[(i + 1) % demo_az_count],
+        storage_encrypted=True,
+        storage_type="gp3",
+        identifier=f"saleor-replica-{i}",
+        instance_class=postgres_instance_size,
+        parameter_group_name=demo_sql_parameter_group.name,
+        max_allocated_storage=postgres_max_allocated_storage,
+        iops=postgres_iops,
+        storage_throughput=postgres_storage_throughput,
+        performance_insights_enabled=postgres_performance_insights_enabled,
+        performance_insights_retention_period=7 if postgres_performance_insights_enabled else None,
+        network_type="IPV4",
+        skip_final_snapshot=True,
+        auto_minor_version_upgrade=False,
+        apply_immediately=True,
+        tags={**general_tags, "Name": f"demo-saleor-core-sql-replica-{i}"}
+    ))
+
 """
+RDS Proxy: pools Saleor connections in front of the writer, so scaling out pods doesn't run into max_connections
+"""
+# Proxy credentials in Secrets Manager:
+demo_sql_proxy_secret = secretsmanager.Secret("demo-saleor-core-sql-proxy-secret",
+    description="Saleor Core PostgreSQL credentials for RDS Proxy",
+    tags={**general_tags, "Name": "demo-saleor-core-sql-proxy-secret"}
+)
+
+demo_sql_proxy_secret_version = secretsmanager.SecretVersion("demo-saleor-core-sql-proxy-secret-version",
+    secret_id=demo_sql_proxy_secret.id,
+    secret_string=Output.all(sql_user, sql_password).apply(
+        lambda args: json.dumps({"username": args[0], "password": args[1]}))
+)
+
+# Allow the proxy to read its credentials:
+demo_sql_proxy_policy = iam.Policy("demo-saleor-core-sql-proxy-policy",
+    description="RDS Proxy Secrets Manager Policy",
+    policy=demo_sql_proxy_secret.arn.apply(lambda arn: json.dumps({
+        "Version": "2012-10-17",
+        "Statement": [{
+            "Action": [
+                "secretsmanager:GetSecretValue"
+            ],
+            "Effect": "Allow",
+            "Resource": [arn]
+        }],
+    }))
+)
+
+demo_sql_proxy_role = create_iam_role("demo-saleor-core-sql-proxy-role", "Service", "rds.amazonaws.com", [demo_sql_proxy_policy.arn])
+
+# Proxy security group, allow PostgreSQL traffic from application subnets:
+demo_sql_proxy_security_group = ec2.SecurityGroup("demo-sql-proxy-security-group",
+    description="PostgreSQL RDS Proxy security group",
+    vpc_id=vpc_id,
+    tags={**general_tags, "Name": "demo-sql-proxy-security-group"}
+)
+
+demo_sql_proxy_security_group_inbound = ec2.SecurityGroupRule("demo-sql-proxy-security-group-inbound",
+    type="ingress",
+    from_port=5432,
+    to_port=5432,
+    protocol="tcp",
+    cidr_blocks=demo_private_subnet_cidrs,
+    security_group_id=demo_sql_proxy_security_group.id
+)
+
+demo_sql_proxy_security_group_outbound = ec2.SecurityGroupRule("demo-sql-proxy-security-group-outbound",
+    type="egress",
+    to_port=0,
+    protocol="-1",
+    from_port=0,
+    cidr_blocks=["0.0.0.0/0"],
+    security_group_id=demo_sql_proxy_security_group.id
+)
+
+# Allow PostgreSQL traffic from the proxy to the database:
+demo_sql_security_group_inbound_proxy = ec2.SecurityGroupRule("demo-sql-security-group-inbound-proxy",
+    type="ingress",
+    from_port=5432,
+    to_port=5432,
+    protocol="tcp",
+    source_security_group_id=demo_sql_proxy_security_group.id,
+    security_group_id=demo_sql_security_group.id
+)
+
+demo_sql_proxy = rds.Proxy("demo-saleor-core-sql-proxy",
+    name="saleor",
+    engine_family="POSTGRESQL",
+    role_arn=demo_sql_proxy_role.arn,
+    vpc_subnet_ids=db_subnet_ids,
+    vpc_security_group_ids=[demo_sql_proxy_security_group.id],
+    require_tls=postgres_proxy_require_tls,
+    idle_client_timeout=1800,
+    auths=[rds.ProxyAuthArgs(
+        auth_scheme="SECRETS",
+        iam_auth="DISABLED",
+        secret_arn=demo_sql_proxy_secret.arn
+    )],
+    tags={**general_tags, "Name": "demo-saleor-core-sql-proxy"},
+    opts=ResourceOptions(depends_on=[demo_sql_proxy_secret_version])
+)
+
+demo_sql_proxy_target_group = rds.ProxyDefaultTargetGroup("demo-saleor-core-sql-proxy-target-group",
+    db_proxy_name=demo_sql_proxy.name,
+    connection_pool_config=rds.ProxyDefaultTargetGroupConnectionPoolConfigArgs(
+        max_connections_percent=postgres_proxy_max_connections_percent,
+        max_idle_connections_percent=postgres_proxy_max_idle_connections_percent,
+        connection_borrow_timeout=120
+    )
+)
+
+demo_sql_proxy_target = rds.ProxyTarget("demo-saleor-core-sql-proxy-target",
+    db_proxy_name=demo_sql_proxy.name,
+    target_group_name=demo_sql_proxy_target_group.name,
+    db_instance_identifier=demo_sql_cluster.identifier
+)
+
+export("postgres-proxy-endpoint", demo_sql_proxy.endpoint)
+
+"""
+Read-only endpoint: RDS Proxy only targets the writer of an RDS (non-Aurora) instance, so the replicas are
+load balanced through weighted records in a private hosted zone. Without replicas the reads go to the proxy.
+"""
+if demo_sql_replicas:
+    demo_sql_private_zone = route53.Zone("demo-saleor-core-sql-private-zone",
+        name="saleor.internal",
+        comment="Saleor Core private records",
+        vpcs=[route53.ZoneVpcArgs(vpc_id=vpc_id)],
+        tags={**general_tags, "Name": "saleor.internal"}
+    )
+
+    for i, replica in enumerate(demo_sql_replicas):
+        route53.Record(f"demo-saleor-core-sql-replica-record-{i}",
+            zone_id=demo_sql_private_zone.zone_id,
+            name="replica.db.saleor.internal",
+            type="CNAME",
+            ttl=5,
+            records=[replica.address],
+            set_identifier=f"saleor-replica-{i}",
+            weighted_routing_policies=[route53.RecordWeightedRoutingPolicyArgs(weight=1)]
+        )
+
+    postgres_replica_host = "replica.db.saleor.internal"
+else:
+    postgres_replica_host = demo_sql_proxy.endpoint
+
+export("postgres-replica-endpoint", postgres_replica_host)
+
+"""
+Populate SSM parameter store with the SQL connection strings, the writer goes through the proxy:
+"""
+postgres_endpoint = Output.concat("postgres://", sql_user, ":", sql_password, "@", demo_sql_proxy.endpoint, "/", db_name)
+postgres_replica_endpoint = Output.concat("postgres://", sql_user, ":", sql_password, "@", postgres_replica_host, "/", db_name)
+
 demo_sql_cluster_connection_string = ssm.Parameter("saleor-sql-connection-string",
     name=sql_connection_string_ssm_parameter_name,
     description="PostgreSQL connection string for Saleor Core in DATABASE_URL format",
     type="SecureString",
     value=postgres_endpoint,
     tags={**general_tags, "Name": "saleor-sql-cluster-connection-string"}
-)
\ No newline at end of file
+)
+
+demo_sql_cluster_replica_connection_string = ssm.Parameter("saleor-sql-replica-connection-string",
+    name=sql_replica_connection_string_ssm_parameter_name,
+    description="Read-only PostgreSQL connection string for the Saleor Core replica database router",
+    type="SecureString",
+    value=postgres_replica_endpoint,
+    tags={**general_tags, "Name": "saleor-sql-cluster-replica-connection-string"}
+)
@@ -1,7 +1,8 @@
 from pulumi_aws import s3
-from pulumi import export, ResourceOptions
+from pulumi import export, ResourceOptions, Output, RunError
+import json
 
-from settings import general_tags, saleor_storefront_bucket_name, saleor_dashboard_bucket_name, saleor_media_bucket_name, saleor_static_bucket_name
+from settings import general_tags, account_id, saleor_storefront_bucket_name, saleor_dashboard_bucket_name, saleor_media_bucket_name, saleor_static_bucket_name, saleor_media_inventory_bucket_name, saleor_media_transfer_acceleration, saleor_media_versioning, saleor_media_intelligent_tiering, saleor_media_noncurrent_version_expiration_days, saleor_media_abort_multipart_upload_days, saleor_media_prefixes, saleor_media_insights_enabled, saleor_media_inventory_frequency
 
 """
 Create three S3 buckets: for the admin dashboard static frontend, media bucket and static assets bucket
@@ -35,6 +36,148 @@ saleor_media_bucket_ownership_controls = s3.BucketOwnershipControls("saleor-medi
         object_ownership="BucketOwnerEnforced",
     ))
 
+"""
+Saleor media bucket features:
+"""
+
+# Intelligent-Tiering only moves objects to the archive tiers after these many days without access:
+ARCHIVE_ACCESS_MIN_DAYS = 90
+DEEP_ARCHIVE_ACCESS_MIN_DAYS = 180
+
+def prefix_id(prefix: str) -> str:
+    """products/ -> products, usable in resource and configuration names"""
+    return prefix.strip("/").replace("/", "-")
+
+# Speed up uploads from admins far from the bucket region through the CloudFront edge network:
+if saleor_media_transfer_acceleration:
+    saleor_media_bucket_acceleration = s3.BucketAccelerateConfigurationV2("saleor-media-bucket-acceleration",
+        bucket=saleor_media_bucket.id,
+        status="Enabled"
+    )
+    export("saleor-media-accelerate-endpoint", Output.concat(saleor_media_bucket.bucket, ".s3-accelerate.amazonaws.com"))
+
+if saleor_media_versioning:
+    saleor_media_bucket_versioning = s3.BucketVersioningV2("saleor-media-bucket-versioning",
+        bucket=saleor_media_bucket.id,
+        versioning_configuration={"status": "Enabled"}
+    )
+
+# Clean up abandoned multipart uploads and old versions, and hand new objects to Intelligent-Tiering:
+saleor_media_lifecycle_rules = [
+    {
+        "id": "abort-incomplete-multipart-uploads",
+        "status": "Enabled",
+        "filter": {},
+        "abort_incomplete_multipart_upload": {"days_after_initiation": saleor_media_abort_multipart_upload_days}
+    },
+    {
+        "id": "expire-noncurrent-versions",
+        "status": "Enabled",
+        "filter": {},
+        "noncurrent_version_expiration": {"noncurrent_days": saleor_media_noncurrent_version_expiration_days}
+    }
+]
+if saleor_media_intelligent_tiering["enabled"]:
+    saleor_media_lifecycle_rules.append({
+        "id": "intelligent-tiering",
+        "status": "Enabled",
+        "filter": {},
+        "transitions": [{"days": 0, "storage_class": "INTELLIGENT_TIERING"}]
+    })
+
+saleor_media_bucket_lifecycle = s3.BucketLifecycleConfigurationV2("saleor-media-bucket-lifecycle",
+    bucket=saleor_media_bucket.id,
+    rules=saleor_media_lifecycle_rules
+)
+
+# Archive tiers for media nobody has requested in months:
+saleor_media_archive_tierings = []
+for tier, key, days, min_days in [
+    ("ARCHIVE_ACCESS", "media-archive-access-days", saleor_media_intelligent_tiering["archive_access_days"], ARCHIVE_ACCESS_MIN_DAYS),
+    ("DEEP_ARCHIVE_ACCESS", "media-deep-archive-access-days", saleor_media_intelligent_tiering["deep_archive_access_days"], DEEP_ARCHIVE_ACCESS_MIN_DAYS)
+]:
+    if days is None:
+        continue
+    if not saleor_media_intelligent_tiering["enabled"]:
+        raise RunError(f"{key} sets the Intelligent-Tiering {tier} tier, which needs media-intelligent-tiering=true")
+    if days < min_days:
+        raise RunError(f"Intelligent-Tiering {tier} needs at least {min_days} days, got {days}")
+    saleor_media_archive_tierings.append({"access_tier": tier, "days": days})
+
+if saleor_media_archive_tierings:
+    saleor_media_bucket_tiering = s3.BucketIntelligentTieringConfiguration("saleor-media-bucket-archive-tiering",
+        bucket=saleor_media_bucket.id,
+        name="archive",
+        status="Enabled",
+        tierings=saleor_media_archive_tierings
+    )
+
+# Request metrics and inventory reports per media prefix, to find the hot prefixes and the storage classes they sit in:
+if saleor_media_insights_enabled:
+    saleor_media_bucket_metrics = [s3.BucketMetric("saleor-media-bucket-metrics",
+        bucket=saleor_media_bucket.id,
+        name="EntireBucket"
+    )]
+    for prefix in saleor_media_prefixes:
+        saleor_media_bucket_metrics.append(s3.BucketMetric(f"saleor-media-bucket-metrics-{prefix_id(prefix)}",
+            bucket=saleor_media_bucket.id,
+            name=prefix_id(prefix),
+            filter={"prefix": prefix}
+        ))
+
+    # Create the inventory report bucket:
+    saleor_media_inventory_bucket = s3.Bucket("saleor-media-inventory-bucket",
+        bucket=saleor_media_inventory_bucket_name,
+        force_destroy=True,
+        tags=general_tags
+    )
+
+    # Disable ACL's for the inventory report bucket:
+    saleor_media_inventory_bucket_ownership_controls = s3.BucketOwnershipControls("saleor-media-inventory-bucket-acl",
+        bucket=saleor_media_inventory_bucket.id,
+        rule=s3.BucketOwnershipControlsRuleArgs(
+            object_ownership="BucketOwnerEnforced",
+        ))
+
+    # Let S3 deliver the media bucket inventory:
+    saleor_media_inventory_bucket_policy = s3.BucketPolicy("saleor-media-inventory-bucket-policy",
+        bucket=saleor_media_inventory_bucket.id,
+        policy=Output.all(saleor_media_inventory_bucket.arn, saleor_media_bucket.arn, account_id).apply(lambda args: json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [
+                {
+                    "Sid": "InventoryDelivery",
+                    "Effect": "Allow",
+                    "Principal": {"Service": "s3.amazonaws.com"},
+                    "Action": "s3:PutObject",
+                    "Resource": f"{args[0]}/*",
+                    "Condition": {
+                        "ArnLike": {"aws:SourceArn": args[1]},
+                        "StringEquals": {"aws:SourceAccount": args[2]}
+                    }
+                }
+            ]
+        }))
+    )
+
+    for prefix in saleor_media_prefixes:
+        s3.Inventory(f"saleor-media-bucket-inventory-{prefix_id(prefix)}",
+            bucket=saleor_media_bucket.id,
+            name=prefix_id(prefix),
+            included_object_versions="Current",
+            filter={"prefix": prefix},
+            schedule={"frequency": saleor_media_inventory_frequency},
+            optional_fields=["Size", "LastModifiedDate", "StorageClass", "IntelligentTieringAccessTier", "ETag"],
+            destination={
+                "bucket": {
+                    "bucket_arn": saleor_media_inventory_bucket.arn,
+                    "format": "Parquet",
+                    "prefix": "inventory"
+                }
+            },
+            opts=ResourceOptions(depends_on=[saleor_media_inventory_bucket_policy])
+        )
+
 # Create the saleor static assets bucket:
 saleor_static_bucket = s3.Bucket("saleor-static-bucket",
     bucket=saleor_static_bucket_name,
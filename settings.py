@@ -1,12 +1,38 @@
 import pulumi
-from pulumi_aws import config, get_caller_identity
+from pulumi_aws import config
+
+from subnet_planner import plan_subnets
+from ip_capacity import max_pods
+from lookups import lookup_account_id
 
 """
 Configuration variables from pulumi settings file
 """
 stack_config = pulumi.Config()
 stack_name = pulumi.get_stack()
-aws_provider = get_caller_identity()
+# Seconds to reuse cached provider lookups (account ID, AZs) for, 0 disables the on-disk cache:
+lookup_cache_ttl = stack_config.get_int("lookup-cache-ttl", 3600)
+# Stacks created before the roles moved to managed_policy_arns turn this on for one "pulumi up", which makes their
+# per-policy RolePolicyAttachments retain-on-delete, then off again to drop them from the state (see helpers.py):
+iam_retain_legacy_attachments = stack_config.get_bool("iam-retain-legacy-attachments", False)
+
+"""
+Stack layers: "all" deploys everything as one stack. "network", "data" and "cluster" deploy a single layer,
+the data and cluster layers read the network outputs from the stack named by "network-stack" (org/project/stack).
+The layers share the subnet and AZ settings, so keep those the same in every layer's stack config:
+"""
+stack_layers = {
+    "network": ["vpc", "flow_logs", "subnet_groups", "vpc_endpoints", "network"],
+    "data": ["s3", "static_assets", "cdn", "elasticache", "rds", "monitoring"],
+    "cluster": ["eks", "node_dns", "karpenter"]
+}
+stack_layer = stack_config.get("stack-layer") or "all"
+if stack_layer != "all" and stack_layer not in stack_layers:
+    raise pulumi.RunError(f"stack-layer must be all, {', '.join(stack_layers)}, got '{stack_layer}'")
+network_stack_name = stack_config.require("network-stack") if stack_layer in ["data", "cluster"] else None
+
+def deploys_layer(layer: str) -> bool:
+    return stack_layer in ["all", layer]
 
 """
 General cost tags populated to every single resource in the account:
@@ -21,33 +47,186 @@ Misc variables
 """
 demo_vpc_cidr = "10.200.0.0/16"
 
-demo_public_subnet_cidrs = [
-    "10.200.0.0/20",
-    "10.200.16.0/20"
-]
-demo_private_subnet_cidrs = [
-    "10.200.32.0/20",
-    "10.200.48.0/20"
-]
-demo_eks_cp_subnet_cidrs = [
-    "10.200.64.0/24",
-    "10.200.65.0/24"
-]
-demo_db_subnet_cidrs = [
-    "10.200.66.0/24",
-    "10.200.67.0/24"
-]
-
-account_id = aws_provider.account_id
+# Number of availability zones to spread the stack over (2 to 6):
+demo_az_count = stack_config.get_int("az-count", 2)
+
+# Per-AZ density targets for every subnet tier. With Cilium ENI IPAM every pod takes an IP from the private subnets,
+# so "pods-per-az" caps how many pods can be scheduled into a single AZ:
+demo_subnet_density_targets = {
+    "public": stack_config.get_int("public-hosts-per-az", 4000),
+    "private": stack_config.get_int("pods-per-az", 4000),
+    "eks_cp": stack_config.get_int("eks-cp-hosts-per-az", 250),
+    "db": stack_config.get_int("db-hosts-per-az", 250)
+}
+
+# Fixed blocks of the VPC CIDR every tier cuts its per-AZ subnets from, AZ by AZ in block order. The blocks never move,
+# so changing az-count or a tier's hosts per AZ never replaces the subnets of the other tiers. The first block of every
+# tier holds the two AZs of the original layout, with the default targets that is public 10.200.0.0/20 and
+# 10.200.16.0/20, private 10.200.32.0/20 and 10.200.48.0/20, eks_cp 10.200.64.0/24 and 10.200.65.0/24, db 10.200.66.0/24
+# and 10.200.67.0/24. AZs three to six grow into the second block:
+demo_subnet_tier_blocks = {
+    "public": ["10.200.0.0/19", "10.200.128.0/18"],
+    "private": ["10.200.32.0/19", "10.200.192.0/18"],
+    "eks_cp": ["10.200.64.0/23", "10.200.68.0/22"],
+    "db": ["10.200.66.0/23", "10.200.72.0/22"]
+}
+
+# Carve the subnets out of the tier blocks, failing the preview if the targets don't fit:
+try:
+    demo_subnet_plan = plan_subnets(demo_vpc_cidr, demo_az_count, demo_subnet_density_targets, demo_subnet_tier_blocks)
+except ValueError as e:
+    raise pulumi.RunError(f"Subnet plan does not fit: {e}")
+
+demo_public_subnet_cidrs = demo_subnet_plan["public"]
+demo_private_subnet_cidrs = demo_subnet_plan["private"]
+demo_eks_cp_subnet_cidrs = demo_subnet_plan["eks_cp"]
+demo_db_subnet_cidrs = demo_subnet_plan["db"]
+
+# Dual-stack VPC: an Amazon-provided IPv6 /56 with a /64 per subnet and IPv6 egress through an egress-only internet
+# gateway instead of the NAT gateways. The cluster stays IPv4: Cilium ENI IPAM only assigns IPv4 pod addresses, and EKS
+# IPv6 clusters need the VPC CNI, so nodes and host network traffic use IPv6 while pods keep their private subnet IPv4s:
+demo_dual_stack = stack_config.get_bool("dual-stack") or False
+
+"""
+VPC flow logs, delivered to a dedicated bucket as Parquet in Hive-compatible hourly partitions. They cover the whole VPC,
+or only the subnets of the listed tiers (public, private, eks_cp, db). The custom fields attribute NAT, cross-AZ and
+AWS service traffic: pkt-srcaddr/pkt-dstaddr are the addresses behind a NAT gateway, traffic-path the egress path:
+"""
+vpc_flow_logs_enabled = stack_config.get_bool("vpc-flow-logs", True)
+vpc_flow_logs = {
+    "tiers": stack_config.get_object("vpc-flow-logs-tiers") or [],
+    # 60 or 600 seconds:
+    "aggregation_interval_seconds": stack_config.get_int("vpc-flow-logs-aggregation-interval", 600),
+    "expiration_days": stack_config.get_int("vpc-flow-logs-expiration-days", 30),
+    "fields": [
+        "version", "account-id", "interface-id", "srcaddr", "dstaddr", "srcport", "dstport", "protocol", "packets", "bytes",
+        "start", "end", "action", "log-status", "vpc-id", "subnet-id", "instance-id", "az-id", "pkt-srcaddr", "pkt-dstaddr",
+        "flow-direction", "traffic-path", "pkt-src-aws-service", "pkt-dst-aws-service"
+    ]
+}
+vpc_flow_logs_bucket_name = "demo-vpc-flow-logs-cilium-demo"
+
+account_id = lookup_account_id(lookup_cache_ttl)
 deployment_region = config.region
-endpoint_services = ["ecr.api","ecr.dkr","ec2","sts","logs","s3","email-smtp","cloudformation"]
+endpoint_services = ["ecr.api","ecr.dkr","ec2","sts","logs","email-smtp","cloudformation"]
+# S3 (and optionally DynamoDB) traffic goes through free Gateway endpoints on the private, EKS and DB route tables:
+gateway_endpoint_services = ["s3"] + (["dynamodb"] if stack_config.get_bool("dynamodb-gateway-endpoint") else [])
+# An S3 Interface endpoint is only needed to reach S3 from on-premises networks, opt-in:
+if stack_config.get_bool("s3-interface-endpoint"):
+    endpoint_services.append("s3")
 cluster_descriptor = "cilium-web-demo"
-cilium_release_version = "1.12.5"
+# Cilium release, features a release doesn't support fail the preview (see cilium_values.py):
+cilium_release_version = stack_config.get("cilium-version") or "1.12.5"
+# Cilium datapath performance profile (baseline, throughput or latency) with optional per-setting overrides:
+cilium_datapath_profile = stack_config.get("cilium-profile") or "baseline"
+cilium_datapath_overrides = {
+    "bbr": stack_config.get_bool("cilium-bbr"),
+    "xdp_acceleration": stack_config.get_bool("cilium-xdp-acceleration"),
+    "maglev_table_size": stack_config.get_int("cilium-maglev-table-size"),
+    "bpf_map_dynamic_size_ratio": stack_config.get_float("cilium-bpf-map-dynamic-size-ratio"),
+    "bpf_ct_tcp_max": stack_config.get_int("cilium-bpf-ct-tcp-max"),
+    "bpf_ct_any_max": stack_config.get_int("cilium-bpf-ct-any-max")
+}
+# Kernel of the Bottlerocket aws-k8s-1.24 variant and the ENI MTU the agents pick up, the datapath features are checked
+# against them. Update them with the node variant:
+node_kernel_version = "5.15"
+node_mtu = 9001
+
+# Cilium ENI IPAM: /28 prefix delegation and the IPs every node keeps pre-allocated for new pods.
+# These are applied cluster-wide through the Cilium CNI configuration:
+cilium_eni_prefix_delegation = stack_config.get_bool("cilium-eni-prefix-delegation") or False
+cilium_eni_ipam = {
+    "pre-allocate": stack_config.get_int("cilium-eni-pre-allocate", 8),
+    "min-allocate": stack_config.get_int("cilium-eni-min-allocate", 0),
+    "max-above-watermark": stack_config.get_int("cilium-eni-max-above-watermark", 0)
+}
+
+# Hubble metrics and flow export. Metrics are served on the Cilium agent, alongside the agent and operator metrics;
+# httpV2 exemplars and export filters need Cilium >= 1.13. Flows are exported to a rotated file on the node when a path is set:
+cilium_prometheus_enabled = stack_config.get_bool("cilium-prometheus", True)
+hubble_metrics = stack_config.get_object("hubble-metrics") or ["dns", "drop", "tcp", "flow", "port-distribution", "httpV2"]
+hubble_http_exemplars = stack_config.get_bool("hubble-http-exemplars") or False
+hubble_flow_export = {
+    "path": stack_config.get("hubble-flow-export-path"),
+    "max_size_mb": stack_config.get_int("hubble-flow-export-max-size-mb", 10),
+    "max_backups": stack_config.get_int("hubble-flow-export-max-backups", 5),
+    "allowlist": stack_config.get_object("hubble-flow-export-allowlist") or [],
+    "denylist": stack_config.get_object("hubble-flow-export-denylist") or []
+}
+# Saleor namespaces labelled for L7 visibility, with the HTTP ports their services listen on. HTTP on these ports goes
+# through the Cilium proxy, which feeds the httpV2 request latency metrics per workload without sidecars. Opt-in: the
+# proxy adds a hop to every request and puts the endpoints into policy enforcement, so it skews the latency it measures:
+hubble_l7_visibility_enabled = stack_config.get_bool("hubble-l7-visibility", False)
+saleor_l7_visibility_ports = {
+    "saleor-core": [8000],
+    "saleor-dashboard": [80],
+    "saleor-storefront": [3000],
+    "saleor-assets": [80]
+}
+
+# Cilium ingress: shared (one load balancer for every Ingress) or dedicated (one per Ingress) mode, optionally behind an
+# internet-facing NLB sending traffic straight to the Envoy pods (IP targets) in the public subnets. The NLB annotations are
+# handled by the AWS Load Balancer Controller, which gets its service account role below. Shared mode and the Service
+# annotations need Cilium >= 1.13, proxy protocol and the Envoy settings Cilium >= 1.14:
+cilium_ingress = {
+    "mode": stack_config.get("cilium-ingress-mode") or "dedicated",
+    "nlb": stack_config.get_bool("cilium-ingress-nlb") or False,
+    "cross_zone": stack_config.get_bool("cilium-ingress-cross-zone", True),
+    "proxy_protocol": stack_config.get_bool("cilium-ingress-proxy-protocol") or False
+}
+cilium_envoy = {
+    "connect_timeout_seconds": stack_config.get_int("cilium-envoy-connect-timeout-seconds"),
+    "max_requests_per_connection": stack_config.get_int("cilium-envoy-max-requests-per-connection"),
+    "idle_timeout_seconds": stack_config.get_int("cilium-envoy-idle-timeout-seconds"),
+    "max_connection_duration_seconds": stack_config.get_int("cilium-envoy-max-connection-duration-seconds"),
+    "resources": stack_config.get_object("cilium-envoy-resources")
+}
+
+# Expected number of nodes per AZ, used for the exported IP reservation report:
+expected_nodes_per_az = stack_config.get_int("expected-nodes-per-az", 1)
+if expected_nodes_per_az < 0:
+    raise pulumi.RunError(f"expected-nodes-per-az can't be negative, got {expected_nodes_per_az}")
+
 redis_instance_size = "cache.t4g.micro"
+# Redis cluster mode shards the keyspace over node groups. Without it, one primary with read replicas is created.
+# Saleor's cache client doesn't follow cluster redirects, so cluster mode also needs redis-cluster-aware-client, set once
+# the workloads read the cluster URL parameter instead of CACHE_URL:
+redis_cluster_mode_enabled = stack_config.get_bool("redis-cluster-mode") or False
+redis_cluster_aware_client = stack_config.get_bool("redis-cluster-aware-client", False)
+redis_num_node_groups = stack_config.get_int("redis-num-node-groups", 2)
+redis_replicas_per_node_group = stack_config.get_int("redis-replicas-per-node-group", 1)
+redis_num_cache_clusters = stack_config.get_int("redis-num-cache-clusters", 2)
+redis_parameters = {
+    "maxmemory-policy": stack_config.get("redis-maxmemory-policy") or "allkeys-lru",
+    "slowlog-log-slower-than": stack_config.get("redis-slowlog-log-slower-than") or "10000",
+    "activedefrag": stack_config.get("redis-activedefrag") or "yes"
+}
 postgres_instance_size = "db.t4g.small"
+# PostgreSQL gp3 storage and Performance Insights. IOPS and throughput can only be set from 400 GiB of storage,
+# a max allocated storage of 0 disables storage autoscaling:
+postgres_allocated_storage = stack_config.get_int("postgres-allocated-storage", 20)
+postgres_max_allocated_storage = stack_config.get_int("postgres-max-allocated-storage", 100)
+postgres_iops = stack_config.get_int("postgres-iops")
+postgres_storage_throughput = stack_config.get_int("postgres-storage-throughput")
+postgres_performance_insights_enabled = stack_config.get_bool("postgres-performance-insights", False)
+
+# Cross-AZ PostgreSQL read replicas, off by default as every replica is a billed instance, and RDS Proxy connection
+# pooling in front of the writer:
+postgres_read_replicas = stack_config.get_int("postgres-read-replicas", 0)
+postgres_proxy_require_tls = stack_config.get_bool("postgres-proxy-require-tls", False)
+postgres_proxy_max_connections_percent = stack_config.get_int("postgres-proxy-max-connections-percent", 90)
+postgres_proxy_max_idle_connections_percent = stack_config.get_int("postgres-proxy-max-idle-connections-percent", 50)
 db_name = "saleor"
 sql_connection_string_ssm_parameter_name = "saleor-sql-connection-string"
+sql_replica_connection_string_ssm_parameter_name = "saleor-sql-replica-connection-string"
 redis_connection_string_ssm_parameter_name = "saleor-redis-connection-string"
+redis_reader_connection_string_ssm_parameter_name = "saleor-redis-reader-connection-string"
+redis_cluster_url_ssm_parameter_name = "saleor-redis-cluster-url"
+cdn_domain_ssm_parameter_names = {
+    "dashboard": "saleor-dashboard-cdn-domain-name",
+    "media": "saleor-media-cdn-domain-name",
+    "static": "saleor-static-cdn-domain-name"
+}
 
 # Database credentials:
 sql_user = stack_config.require_secret("sql-user")
@@ -59,6 +238,177 @@ saleor_storefront_bucket_name = "saleor-storefront-cilium-demo"
 saleor_dashboard_bucket_name = "saleor-dashboard-cilium-demo"
 saleor_media_bucket_name = "saleor-media-silium-demo"
 saleor_static_bucket_name = "saleor-static-silium-demo"
+saleor_media_inventory_bucket_name = "saleor-media-inventory-silium-demo"
+
+"""
+Saleor media bucket features: Transfer Acceleration for uploads from far-away admins, Intelligent-Tiering, lifecycle clean-up,
+and request metrics plus Parquet inventory reports per media prefix. The archive tiers take objects offline until they
+are restored, so they are only safe for media the storefront no longer links to. Intelligent-Tiering moves every object
+on day 0 and the request metrics and inventory reports are billed per bucket, so all three are opt-in:
+"""
+saleor_media_transfer_acceleration = stack_config.get_bool("media-transfer-acceleration") or False
+saleor_media_versioning = stack_config.get_bool("media-versioning") or False
+saleor_media_intelligent_tiering = {
+    "enabled": stack_config.get_bool("media-intelligent-tiering", False),
+    # Days without access before an object moves to the archive tiers, unset keeps the tier off:
+    "archive_access_days": stack_config.get_int("media-archive-access-days"),
+    "deep_archive_access_days": stack_config.get_int("media-deep-archive-access-days")
+}
+saleor_media_noncurrent_version_expiration_days = stack_config.get_int("media-noncurrent-version-expiration-days", 30)
+saleor_media_abort_multipart_upload_days = stack_config.get_int("media-abort-multipart-upload-days", 7)
+# Saleor's media layout, every prefix gets request metrics and an inventory report:
+saleor_media_prefixes = stack_config.get_object("media-prefixes") or ["products/", "thumbnails/", "category-backgrounds/", "collection-backgrounds/", "user-avatars/"]
+saleor_media_insights_enabled = stack_config.get_bool("media-insights", False)
+saleor_media_inventory_frequency = stack_config.get("media-inventory-frequency") or "Weekly"
+
+"""
+Monitoring: CloudWatch alarms and a dashboard built from the threshold table in monitoring_thresholds.py, the capacity
+thresholds follow the PostgreSQL and Redis instance sizes above. Alarms notify an SNS topic, subscribed by e-mail when
+an address is set. Any threshold can be overridden as {"group.metric": value}, e.g. {"redis.Evictions": 0}:
+"""
+monitoring_enabled = stack_config.get_bool("monitoring", True)
+monitoring_alarm_email = stack_config.get("monitoring-alarm-email")
+# NAT gateway and VPC endpoint bytes per 5 minutes considered normal:
+monitoring_egress_bytes_per_period = stack_config.get_int("monitoring-egress-bytes-per-period", 5 * 1024 ** 3)
+monitoring_threshold_overrides = stack_config.get_object("monitoring-thresholds") or {}
+
+"""
+Static asset sync: local build directories uploaded into the dashboard and static buckets, content-hashed and
+precompressed (see asset_manifest.py). A bucket without a build directory is left to out-of-band uploads:
+"""
+saleor_asset_build_dirs = {
+    "dashboard": stack_config.get("dashboard-build-dir"),
+    "static": stack_config.get("static-build-dir")
+}
+saleor_asset_cache_dir = ".asset-cache"
+# Precompressed variants per compressible file, br needs the optional brotli package on every machine that runs the update:
+saleor_asset_encodings = stack_config.get_object("asset-encodings") or ["gzip"]
+saleor_asset_cache_control = {
+    "immutable": "public, max-age=31536000, immutable",
+    "html": f"public, max-age={stack_config.get_int('asset-html-max-age', 60)}, must-revalidate",
+    "default": f"public, max-age={stack_config.get_int('asset-default-max-age', 3600)}"
+}
+
+"""
+CloudFront settings for the Saleor buckets, TTLs in seconds
+"""
+saleor_cdn_cache_ttls = {
+    "dashboard": {"min": 0, "default": 300, "max": 3600},
+    "media": {"min": 0, "default": 86400, "max": 604800},
+    "static": {"min": 0, "default": 31536000, "max": 31536000}
+}
+saleor_cdn_price_class = stack_config.get("cdn-price-class") or "PriceClass_100"
+saleor_cdn_origin_shield_region = stack_config.get("cdn-origin-shield-region") or deployment_region
+
+"""
+Bottlerocket node tuning shared by the managed nodegroup launch template and the Karpenter node class (see
+bottlerocket_settings.py). Sysctls and kubelet settings can be overridden per key, the data volume is gp3:
+"""
+node_instance_type = "t4g.medium"
+# max-pods follows what ENI IPAM can allocate on the instance type (see ip_capacity.py), it can only be lowered:
+try:
+    node_eni_max_pods = max_pods(node_instance_type, cilium_eni_prefix_delegation)
+except ValueError as e:
+    raise pulumi.RunError(f"Cannot size the nodegroup: {e}")
+node_max_pods = stack_config.get_int("node-max-pods", node_eni_max_pods)
+if node_max_pods > node_eni_max_pods:
+    raise pulumi.RunError(f"node-max-pods {node_max_pods} exceeds the {node_eni_max_pods} pod IPs ENI IPAM can allocate on a {node_instance_type}")
+if node_max_pods < 1:
+    raise pulumi.RunError(f"node-max-pods must be at least 1, got {node_max_pods}")
+node_sysctls = {
+    "net.core.somaxconn": 4096,
+    "net.core.netdev_max_backlog": 16384,
+    "net.ipv4.tcp_max_syn_backlog": 8192,
+    "net.ipv4.tcp_fin_timeout": 15,
+    "net.ipv4.tcp_tw_reuse": 1,
+    "net.ipv4.tcp_keepalive_time": 300,
+    "net.ipv4.tcp_slow_start_after_idle": 0,
+    "net.netfilter.nf_conntrack_max": 262144,
+    **(stack_config.get_object("node-sysctls") or {})
+}
+node_kubelet = {
+    # kube-reserved memory is derived from max-pods unless set here:
+    "kube_reserved": stack_config.get_object("node-kube-reserved") or {"cpu": "70m", "ephemeral-storage": "1Gi"},
+    "system_reserved": stack_config.get_object("node-system-reserved") or {"cpu": "100m", "memory": "100Mi", "ephemeral-storage": "1Gi"},
+    "image_gc_high_threshold_percent": stack_config.get_int("node-image-gc-high-threshold-percent", 85),
+    "image_gc_low_threshold_percent": stack_config.get_int("node-image-gc-low-threshold-percent", 75)
+}
+node_data_volume = {
+    "size_gib": stack_config.get_int("node-data-volume-size", 20),
+    "iops": stack_config.get_int("node-data-volume-iops", 3000),
+    "throughput": stack_config.get_int("node-data-volume-throughput", 125)
+}
+
+"""
+Karpenter controller, installed from its Helm chart with an SQS queue that receives spot interruption, rebalance,
+scheduled maintenance and instance state events, so nodes are cordoned and drained before EC2 takes them away.
+Pending pods are batched until none arrived for the idle duration, or for at most the max duration:
+"""
+karpenter_version = "0.27.3"
+karpenter_controller_enabled = stack_config.get_bool("karpenter-controller", True)
+karpenter_interruption_queue_name = f"karpenter-{cluster_descriptor}"
+karpenter_batch_max_duration = stack_config.get("karpenter-batch-max-duration") or "10s"
+karpenter_batch_idle_duration = stack_config.get("karpenter-batch-idle-duration") or "1s"
+karpenter_controller_replicas = stack_config.get_int("karpenter-controller-replicas", 2)
+karpenter_controller_resources = stack_config.get_object("karpenter-controller-resources") or {
+    "requests": {"cpu": "250m", "memory": "512Mi"},
+    "limits": {"memory": "512Mi"}
+}
+
+"""
+Karpenter node pools, matching the BOTTLEROCKET_ARM_64 managed nodegroup. Spot capacity is preferred (higher weight),
+on-demand is the fallback. The node pool CRDs come with the Karpenter chart, so the pools follow the controller unless
+karpenter-node-pools says otherwise:
+"""
+karpenter_node_pools_enabled = stack_config.get_bool("karpenter-node-pools", karpenter_controller_enabled)
+karpenter_instance_families = ["t4g", "c6g", "c7g", "m6g", "m7g", "r6g"]
+karpenter_cpu_limit = stack_config.get_int("karpenter-cpu-limit", 64)
+if karpenter_cpu_limit < 1:
+    raise pulumi.RunError(f"karpenter-cpu-limit must be at least 1 vCPU, got {karpenter_cpu_limit}")
+karpenter_memory_limit = stack_config.get("karpenter-memory-limit") or "256Gi"
+# Skip instance types whose ENIs hold fewer pods than this, 0 allows any size:
+karpenter_min_pods_per_node = stack_config.get_int("karpenter-min-pods-per-node", 0)
+karpenter_node_pools = {
+    "spot-arm64": {
+        "weight": 100,
+        "capacity_types": ["spot"],
+        "architectures": ["arm64"],
+        "cpu_limit": karpenter_cpu_limit,
+        "memory_limit": karpenter_memory_limit,
+        "expire_after_seconds": 604800
+    },
+    "on-demand-arm64": {
+        "weight": 10,
+        "capacity_types": ["on-demand"],
+        "architectures": ["arm64"],
+        "cpu_limit": karpenter_cpu_limit,
+        "memory_limit": karpenter_memory_limit,
+        "expire_after_seconds": 604800
+    }
+}
+
+"""
+Cluster DNS: CoreDNS add-on settings, a proportional autoscaler for CoreDNS and an optional NodeLocal DNSCache.
+With the autoscaler enabled the add-on doesn't set a replica count, so the two don't fight over it:
+"""
+coredns_addon_version = stack_config.get("coredns-addon-version") or "v1.9.3-eksbuild.3"
+coredns_replicas = stack_config.get_int("coredns-replicas", 2)
+coredns_cache_ttl = stack_config.get_int("coredns-cache-ttl", 30)
+coredns_resources = {
+    "requests": {"cpu": "100m", "memory": "70Mi"},
+    "limits": {"memory": "170Mi"}
+}
+coredns_autoscaler_enabled = stack_config.get_bool("coredns-autoscaler", True)
+coredns_autoscaler_linear_params = {
+    "coresPerReplica": stack_config.get_int("coredns-cores-per-replica", 256),
+    "nodesPerReplica": stack_config.get_int("coredns-nodes-per-replica", 16),
+    "min": 2,
+    "max": stack_config.get_int("coredns-max-replicas", 10),
+    "preventSinglePointFailure": True,
+    "includeUnschedulableNodes": True
+}
+node_local_dns_enabled = stack_config.get_bool("node-local-dns", False)
+node_local_dns_version = "1.22.20"
 
 """
 Flux Bootstrap args
@@ -0,0 +1,57 @@
+from pulumi_aws import s3
+from pulumi import export, ComponentResource, ResourceOptions, FileAsset, RunError
+
+from settings import saleor_asset_build_dirs, saleor_asset_cache_dir, saleor_asset_cache_control, saleor_asset_encodings
+from s3 import saleor_dashboard_bucket, saleor_static_bucket
+from asset_manifest import build_manifest
+
+"""
+Static asset sync into the Saleor dashboard and static buckets from local build directories
+"""
+
+class StaticAssetSync(ComponentResource):
+    """
+    One S3 object per manifest entry, diffed by content hash: an unchanged file is never uploaded again, changed files
+    are uploaded in parallel up to the engine's --parallel limit, and objects whose file is gone are deleted.
+    Objects uploaded out-of-band are left alone.
+    """
+    def __init__(self, name: str, bucket: s3.Bucket, manifest: list, opts: ResourceOptions=None):
+        super().__init__("webstore:s3:StaticAssetSync", name, None, opts)
+
+        self.objects = []
+        for asset in manifest:
+            self.objects.append(s3.BucketObjectv2(f"{name}-{asset['key']}",
+                bucket=bucket.id,
+                key=asset["key"],
+                source=FileAsset(asset["path"]),
+                source_hash=asset["sha256"],
+                content_type=asset["content_type"],
+                cache_control=asset["cache_control"],
+                content_encoding=asset["content_encoding"],
+                opts=ResourceOptions(parent=self)
+            ))
+
+        self.register_outputs({
+            "object_count": len(self.objects)
+        })
+
+"""
+Sync every bucket that has a build directory configured:
+"""
+saleor_asset_buckets = {
+    "dashboard": saleor_dashboard_bucket,
+    "static": saleor_static_bucket
+}
+saleor_asset_syncs = {}
+saleor_asset_manifests = {}
+
+for component, build_dir in saleor_asset_build_dirs.items():
+    if not build_dir:
+        continue
+    try:
+        manifest = build_manifest(build_dir, saleor_asset_cache_dir, saleor_asset_cache_control, saleor_asset_encodings)
+    except ValueError as e:
+        raise RunError(f"Cannot sync the {component} assets: {e}")
+    saleor_asset_manifests[component] = manifest
+    saleor_asset_syncs[component] = StaticAssetSync(f"saleor-{component}-assets", saleor_asset_buckets[component], manifest)
+    export(f"saleor-{component}-asset-objects", len(manifest))
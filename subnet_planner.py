@@ -0,0 +1,110 @@
+import ipaddress
+import math
+
+"""
+Subnet planner: carves non-overlapping per-AZ subnets for every network tier out of the VPC CIDR.
+Pure python on purpose, so the plan can be evaluated without any AWS or Pulumi calls.
+"""
+
+# AWS reserves the first four and the last IP address of every subnet:
+AWS_RESERVED_IPS_PER_SUBNET = 5
+
+# AWS subnet and VPC size limits:
+MIN_SUBNET_PREFIX = 16
+MAX_SUBNET_PREFIX = 28
+
+# Supported number of availability zones:
+MIN_AZ_COUNT = 2
+MAX_AZ_COUNT = 6
+
+def usable_ips(cidr: str) -> int:
+    """Number of IP addresses AWS lets us allocate from a subnet"""
+    return ipaddress.ip_network(cidr).num_addresses - AWS_RESERVED_IPS_PER_SUBNET
+
+def prefix_for_hosts(hosts: int) -> int:
+    """Longest subnet prefix that still fits the requested number of hosts"""
+    if hosts < 1:
+        raise ValueError(f"a subnet tier needs at least one host, got {hosts}")
+    prefix = 32 - math.ceil(math.log2(hosts + AWS_RESERVED_IPS_PER_SUBNET))
+    prefix = min(prefix, MAX_SUBNET_PREFIX)
+    if prefix < MIN_SUBNET_PREFIX:
+        raise ValueError(f"{hosts} hosts per AZ do not fit into the largest AWS subnet (/{MIN_SUBNET_PREFIX})")
+    return prefix
+
+def plan_tier_blocks(vpc_cidr: str, tier_blocks: dict) -> dict:
+    """
+    Returns a dict of tier name -> list of the VPC CIDR blocks the tier owns, checking that every block lies inside the
+    VPC and that no two blocks overlap. A tier can own several blocks, so it can keep the subnets it already has and
+    grow into a block elsewhere in the VPC.
+    """
+    vpc_network = ipaddress.ip_network(vpc_cidr)
+    if vpc_network.version != 4 or not MIN_SUBNET_PREFIX <= vpc_network.prefixlen <= MAX_SUBNET_PREFIX:
+        raise ValueError(f"VPC CIDR must be an IPv4 network between /{MIN_SUBNET_PREFIX} and /{MAX_SUBNET_PREFIX}, got {vpc_cidr}")
+
+    blocks = {tier: [ipaddress.ip_network(cidr) for cidr in cidrs] for tier, cidrs in tier_blocks.items()}
+    owned = [(tier, block) for tier, tier_cidrs in blocks.items() for block in tier_cidrs]
+    for i, (tier, block) in enumerate(owned):
+        if block.version != 4 or not block.subnet_of(vpc_network):
+            raise ValueError(f"the {tier} block {block} is not inside {vpc_cidr}")
+        for other_tier, other_block in owned[i + 1:]:
+            if block.overlaps(other_block):
+                raise ValueError(f"the {tier} block {block} overlaps the {other_tier} block {other_block}")
+    return blocks
+
+def tier_slots(blocks: list, prefix: int) -> list:
+    """Every /prefix subnet of the tier blocks, block by block"""
+    return [slot for block in blocks if prefix >= block.prefixlen for slot in block.subnets(new_prefix=prefix)]
+
+def plan_subnets(vpc_cidr: str, az_count: int, tier_hosts: dict, tier_blocks: dict) -> dict:
+    """
+    Returns a dict of tier name -> list of CIDRs, one per AZ. Every tier owns fixed blocks of the VPC (see
+    plan_tier_blocks), cut into slots of the tier's subnet size, and AZ i always gets slot i, as plan_ipv6_subnets does
+    for the /64s. Adding AZs only adds subnets, and resizing a tier only moves that tier.
+    """
+    if not MIN_AZ_COUNT <= az_count <= MAX_AZ_COUNT:
+        raise ValueError(f"az count must be between {MIN_AZ_COUNT} and {MAX_AZ_COUNT}, got {az_count}")
+    unplaced = [tier for tier in tier_hosts if tier not in tier_blocks]
+    if unplaced:
+        raise ValueError(f"no block for the {', '.join(unplaced)} tier")
+
+    blocks = plan_tier_blocks(vpc_cidr, tier_blocks)
+    plan = {}
+    for tier, hosts in tier_hosts.items():
+        prefix = prefix_for_hosts(hosts)
+        slots = tier_slots(blocks[tier], prefix)
+        if az_count > len(slots):
+            raise ValueError(
+                f"{az_count} AZs x /{prefix} {tier} subnets ({hosts} hosts per AZ) do not fit into its "
+                f"{', '.join(str(block) for block in blocks[tier])} blocks, which hold {max_hosts_per_az(blocks[tier], az_count)} "
+                f"hosts per AZ at {az_count} AZs"
+            )
+        plan[tier] = [str(slot) for slot in slots[:az_count]]
+    return plan
+
+def max_hosts_per_az(blocks: list, az_count: int) -> int:
+    """Most hosts per AZ the tier blocks can hold with one subnet per AZ"""
+    for prefix in range(min(block.prefixlen for block in blocks), MAX_SUBNET_PREFIX + 1):
+        slots = tier_slots(blocks, prefix)
+        if len(slots) >= az_count:
+            return usable_ips(str(slots[0]))
+    return 0
+
+# AWS assigns a /56 IPv6 block to a VPC and every subnet gets a /64 of it:
+VPC_IPV6_PREFIX = 56
+SUBNET_IPV6_PREFIX = 64
+
+def plan_ipv6_subnets(vpc_ipv6_cidr: str, tiers: list, az_count: int) -> dict:
+    """
+    Returns a dict of tier name -> list of /64 CIDRs, one per AZ. Every tier owns MAX_AZ_COUNT consecutive /64s,
+    so adding AZs never moves the IPv6 blocks of the existing subnets.
+    """
+    vpc_network = ipaddress.ip_network(vpc_ipv6_cidr)
+    if vpc_network.version != 6 or vpc_network.prefixlen != VPC_IPV6_PREFIX:
+        raise ValueError(f"VPC IPv6 CIDR must be an IPv6 /{VPC_IPV6_PREFIX}, got {vpc_ipv6_cidr}")
+    if not MIN_AZ_COUNT <= az_count <= MAX_AZ_COUNT:
+        raise ValueError(f"az count must be between {MIN_AZ_COUNT} and {MAX_AZ_COUNT}, got {az_count}")
+    subnets = list(vpc_network.subnets(new_prefix=SUBNET_IPV6_PREFIX))
+    return {
+        tier: [str(subnets[t * MAX_AZ_COUNT + az]) for az in range(az_count)]
+        for t, tier in enumerate(tiers)
+    }
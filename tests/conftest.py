@@ -0,0 +1,57 @@
+import functools
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+"""
+Shared fixtures: the pure modules are imported directly, the Pulumi program is evaluated under the mocks of
+benchmark.py in a fresh interpreter per stack config, since its modules only evaluate once per process
+"""
+
+class StackEvaluation:
+    """Resources registered by one mocked evaluation of the program and the settings they were built from"""
+    def __init__(self, output: dict):
+        self.resources = output["resources"]
+        self.settings = output["settings"]
+
+    def of_type(self, typ: str) -> list:
+        return [r for r in self.resources if r["type"] == typ]
+
+    @staticmethod
+    def id_of(resource: dict) -> str:
+        """The mocks give every resource the ID <name>-id"""
+        return f"{resource['name']}-id"
+
+    def named(self, name: str) -> dict:
+        matches = [r for r in self.resources if r["name"] == name]
+        assert len(matches) == 1, f"expected one resource named {name}, got {len(matches)}"
+        return matches[0]
+
+@functools.lru_cache(maxsize=None)
+def run_evaluation(config: tuple) -> subprocess.CompletedProcess:
+    command = [sys.executable, os.path.join(REPO_ROOT, "benchmark.py"), "--json", "--resources"] + [f"--config={pair}" for pair in config]
+    return subprocess.run(command, capture_output=True, text=True, cwd=REPO_ROOT)
+
+@pytest.fixture(scope="session")
+def evaluate_stack():
+    """evaluate_stack("az-count=3", ...) returns the StackEvaluation of the program under that stack config"""
+    def evaluate(*config: str) -> StackEvaluation:
+        evaluation = run_evaluation(tuple(sorted(config)))
+        assert evaluation.returncode == 0, evaluation.stderr
+        return StackEvaluation(json.loads(evaluation.stdout.splitlines()[-1]))
+    return evaluate
+
+@pytest.fixture(scope="session")
+def stack_error():
+    """stack_error("az-count=9") returns the error output of an evaluation that is expected to fail"""
+    def evaluate(*config: str) -> str:
+        evaluation = run_evaluation(tuple(sorted(config)))
+        assert evaluation.returncode != 0, "expected the evaluation to fail"
+        return evaluation.stderr
+    return evaluate
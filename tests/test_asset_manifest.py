@@ -0,0 +1,95 @@
+"""
+Static asset manifest and the CloudFront Function serving its precompressed variants, run with node when it is installed
+"""
+
+import json
+import shutil
+import subprocess
+
+import pytest
+
+import asset_manifest
+from asset_manifest import build_manifest, precompressed_keys, precompressed_request_function, uri_hash
+
+POLICIES = {"immutable": "immutable", "html": "html", "default": "default"}
+
+@pytest.fixture
+def build_dir(tmp_path):
+    (tmp_path / "build" / "assets").mkdir(parents=True)
+    (tmp_path / "build" / "index.html").write_text("<html></html>" * 100)
+    (tmp_path / "build" / "assets" / "app.3f9a1c2e.js").write_text("console.log('app');" * 100)
+    (tmp_path / "build" / "logo.png").write_bytes(b"\x89PNG")
+    return str(tmp_path / "build")
+
+@pytest.fixture
+def manifest(build_dir, tmp_path):
+    return build_manifest(build_dir, str(tmp_path / "cache"), POLICIES, ["gzip"])
+
+def test_manifest_entries(manifest):
+    entries = {entry["key"]: entry for entry in manifest}
+    assert sorted(entries) == ["assets/app.3f9a1c2e.js", "assets/app.3f9a1c2e.js.gz", "index.html", "index.html.gz", "logo.png"]
+    assert entries["assets/app.3f9a1c2e.js"]["cache_control"] == "immutable"
+    assert entries["index.html"]["cache_control"] == "html"
+    assert entries["logo.png"]["cache_control"] == "default"
+    assert entries["assets/app.3f9a1c2e.js.gz"]["content_type"] == "application/javascript"
+    assert entries["index.html.gz"]["content_encoding"] == "gzip"
+
+def test_manifest_is_reproducible(build_dir, tmp_path, manifest):
+    assert build_manifest(build_dir, str(tmp_path / "other-cache"), POLICIES, ["gzip"]) == [
+        {**entry, "path": entry["path"].replace(str(tmp_path / "cache"), str(tmp_path / "other-cache"))} for entry in manifest
+    ]
+
+def test_manifest_rejects_bad_encodings(build_dir, tmp_path, monkeypatch):
+    with pytest.raises(ValueError, match="unknown encoding 'zstd'"):
+        build_manifest(build_dir, str(tmp_path / "cache"), POLICIES, ["zstd"])
+    monkeypatch.setattr(asset_manifest, "brotli", None)
+    with pytest.raises(ValueError, match="need the brotli package"):
+        build_manifest(build_dir, str(tmp_path / "cache"), POLICIES, ["br", "gzip"])
+
+def test_missing_build_dir(tmp_path):
+    with pytest.raises(ValueError, match="does not exist"):
+        build_manifest(str(tmp_path / "missing"), str(tmp_path / "cache"), POLICIES, ["gzip"])
+
+def test_precompressed_keys(manifest):
+    assert precompressed_keys(manifest) == {"assets/app.3f9a1c2e.js": ["gzip"], "index.html": ["gzip"]}
+
+def test_function_embeds_only_synced_keys(manifest):
+    code = precompressed_request_function(manifest)
+    assert f" {uri_hash('/index.html')} " in code
+    assert f" {uri_hash('/assets/app.3f9a1c2e.js')} " in code
+    assert uri_hash("/logo.png") not in code.split("'")[1].split()
+
+def test_function_size_limit():
+    manifest = [{"key": f"assets/chunk-{i}.js.gz", "content_encoding": "gzip"} for i in range(2000)]
+    with pytest.raises(ValueError, match="CloudFront Function limit"):
+        precompressed_request_function(manifest)
+
+def run_function(code: str, cases: list) -> list:
+    driver = code + """
+var cases = JSON.parse(process.argv[1]);
+console.log(JSON.stringify(cases.map(function (c) {
+    var headers = c[1] === null ? {} : {'accept-encoding': {value: c[1]}};
+    return handler({request: {uri: c[0], headers: headers}}).uri;
+})));
+"""
+    result = subprocess.run(["node", "-e", driver, json.dumps(cases)], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+@pytest.mark.skipif(not shutil.which("node"), reason="needs node to run the CloudFront Function")
+def test_function_rewrites(manifest):
+    manifest = manifest + [{"key": "index.html.br", "content_encoding": "br"}, {"key": "assets/app.3f9a1c2e.js.br", "content_encoding": "br"}]
+    cases = {
+        ("/index.html", "gzip, deflate, br"): "/index.html.br",
+        ("/index.html", "gzip"): "/index.html.gz",
+        ("/index.html", "br;q=0, gzip"): "/index.html.gz",
+        ("/index.html", "br; q=0.0, gzip;q=0"): "/index.html",
+        ("/index.html", "*"): "/index.html.br",
+        ("/index.html", "*;q=0"): "/index.html",
+        ("/index.html", "gzip;q=0.5, *;q=0"): "/index.html.gz",
+        ("/index.html", None): "/index.html",
+        ("/assets/app.3f9a1c2e.js", "br"): "/assets/app.3f9a1c2e.js.br",
+        # Uploaded by collectstatic, not by the sync:
+        ("/assets/admin.js", "gzip, br"): "/assets/admin.js",
+        ("/logo.png", "gzip, br"): "/logo.png"
+    }
+    assert run_function(precompressed_request_function(manifest), [list(case) for case in cases]) == list(cases.values())
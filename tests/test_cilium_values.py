@@ -0,0 +1,73 @@
+import pytest
+
+from cilium_values import datapath_values, CILIUM_DATAPATH_PROFILES, BBR_MIN_KERNEL_VERSION, ENA_XDP_MAX_MTU
+
+"""
+Cilium datapath profiles: every profile has to render for the pinned release on the default nodes
+"""
+
+CILIUM_VERSION = "1.12.5"
+NODE_KERNEL_VERSION = "5.15"
+NODE_MTU = 9001
+
+def render(profile: str, overrides: dict=None, version: str=CILIUM_VERSION, kernel: str=NODE_KERNEL_VERSION, mtu: int=NODE_MTU) -> dict:
+    return datapath_values(profile, version, kernel, mtu, overrides)
+
+def test_baseline_renders_no_datapath_values():
+    assert render("baseline") == {}
+
+def test_throughput_profile():
+    assert render("throughput") == {
+        "bandwidthManager": {"enabled": True, "bbr": False},
+        "bpf": {"masquerade": True, "hostLegacyRouting": False, "mapDynamicSizeRatio": 0.005},
+        "socketLB": {"enabled": True},
+        "maglev": {"tableSize": 65521}
+    }
+
+def test_latency_profile():
+    assert render("latency") == {
+        "bpf": {"masquerade": True, "hostLegacyRouting": False, "preallocateMaps": True},
+        "socketLB": {"enabled": True},
+        "maglev": {"tableSize": 16381}
+    }
+
+@pytest.mark.parametrize("profile", CILIUM_DATAPATH_PROFILES)
+def test_profiles_are_safe_on_the_default_nodes(profile):
+    values = render(profile)
+    assert not values.get("bandwidthManager", {}).get("bbr")
+    assert "acceleration" not in values.get("loadBalancer", {})
+
+def test_bbr_needs_a_recent_kernel():
+    with pytest.raises(ValueError, match="node kernel >= 5.18"):
+        render("throughput", {"bbr": True})
+    kernel = ".".join(map(str, BBR_MIN_KERNEL_VERSION))
+    assert render("throughput", {"bbr": True}, kernel=kernel)["bandwidthManager"] == {"enabled": True, "bbr": True}
+
+def test_bbr_needs_the_bandwidth_manager():
+    with pytest.raises(ValueError, match="bandwidth_manager"):
+        render("latency", {"bbr": True}, kernel="6.1")
+
+def test_xdp_acceleration_needs_a_small_mtu():
+    with pytest.raises(ValueError, match="MTU <= 3498"):
+        render("latency", {"xdp_acceleration": True})
+    assert render("latency", {"xdp_acceleration": True}, mtu=ENA_XDP_MAX_MTU)["loadBalancer"] == {"acceleration": "native"}
+
+def test_overrides_replace_profile_settings():
+    assert render("throughput", {"maglev_table_size": 16381, "bpf_ct_tcp_max": None})["maglev"] == {"tableSize": 16381}
+
+@pytest.mark.parametrize("overrides, error", [
+    ({"maglev_table_size": 1000}, "maglev table size"),
+    ({"bpf_map_dynamic_size_ratio": 1.5}, "dynamic size ratio"),
+    ({"bpf_ct_tcp_max": 10}, "bpf_ct_tcp_max")
+])
+def test_invalid_overrides(overrides, error):
+    with pytest.raises(ValueError, match=error):
+        render("baseline", overrides)
+
+def test_features_need_a_release_that_supports_them():
+    with pytest.raises(ValueError, match="needs Cilium >= 1.12"):
+        render("throughput", version="1.11.0")
+
+def test_unknown_profile():
+    with pytest.raises(ValueError, match="unknown Cilium datapath profile"):
+        render("latest")
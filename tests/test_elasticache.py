@@ -0,0 +1,25 @@
+"""
+Redis topology and connection strings of the data layer, evaluated under Pulumi mocks
+"""
+
+DATA_LAYER = ("stack-layer=data", "network-stack=benchmark/network")
+
+def ssm_parameters(stack) -> list:
+    return sorted(p["inputs"]["name"] for p in stack.of_type("aws:ssm/parameter:Parameter") if p["name"].startswith("saleor-redis-"))
+
+def test_primary_with_replicas_publishes_cache_urls(evaluate_stack):
+    stack = evaluate_stack(*DATA_LAYER)
+    assert ssm_parameters(stack) == ["saleor-redis-connection-string", "saleor-redis-reader-connection-string"]
+    assert stack.named("demo-saleor-core-redis-cluster")["inputs"]["numCacheClusters"] == 2
+
+def test_cluster_mode_needs_a_cluster_aware_client(stack_error):
+    assert "cluster-aware Redis client" in stack_error(*DATA_LAYER, "redis-cluster-mode=true")
+
+def test_cluster_mode_publishes_only_the_cluster_url(evaluate_stack):
+    stack = evaluate_stack(*DATA_LAYER, "redis-cluster-mode=true", "redis-cluster-aware-client=true")
+    assert ssm_parameters(stack) == ["saleor-redis-cluster-url"]
+    assert stack.named("demo-saleor-core-redis-cluster")["inputs"]["numNodeGroups"] == 2
+
+def test_explicit_zero_replicas_fail_multi_az(stack_error):
+    assert "redis-num-cache-clusters must be at least 2" in stack_error(*DATA_LAYER, "redis-num-cache-clusters=0")
+    assert "redis-replicas-per-node-group must be at least 1" in stack_error(*DATA_LAYER, "redis-cluster-mode=true", "redis-cluster-aware-client=true", "redis-replicas-per-node-group=0")
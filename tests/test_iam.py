@@ -0,0 +1,21 @@
+"""
+IAM role helpers, evaluated under Pulumi mocks: the per-policy attachments of older stacks are only kept while they
+migrate to managed_policy_arns
+"""
+
+DATA_LAYER = ("stack-layer=data", "network-stack=benchmark/network")
+
+def attachments(stack) -> dict:
+    return {a["name"]: (a["inputs"]["role"], a["inputs"]["policyArn"]) for a in stack.of_type("aws:iam/rolePolicyAttachment:RolePolicyAttachment")}
+
+def test_new_stacks_skip_the_legacy_attachments(evaluate_stack):
+    assert attachments(evaluate_stack(*DATA_LAYER)) == {}
+
+def test_migrating_stacks_mirror_the_managed_policies(evaluate_stack):
+    stack = evaluate_stack(*DATA_LAYER, "iam-retain-legacy-attachments=true")
+    expected = {}
+    for role in stack.of_type("aws:iam/role:Role"):
+        for i, policy_arn in enumerate(role["inputs"].get("managedPolicyArns", [])):
+            expected[f"{role['name']}-policy-{i}"] = (stack.id_of(role), policy_arn)
+    assert expected
+    assert attachments(stack) == expected
@@ -0,0 +1,81 @@
+import pytest
+
+from ip_capacity import max_pods, family_max_pods, node_ip_capacity, eni_ips_reserved_per_node, az_reservation_report, capacity_report
+
+"""
+IP capacity math for Cilium ENI IPAM, checked against the max-pods values AWS publishes for the ENI limits
+"""
+
+@pytest.mark.parametrize("instance_type, pods", [
+    ("t4g.small", 11),
+    ("t4g.medium", 17),
+    ("t4g.large", 35),
+    ("t4g.xlarge", 58),
+    ("c6g.medium", 8),
+    ("m6g.large", 29),
+    ("c7g.xlarge", 58),
+    ("r6g.4xlarge", 234),
+    ("m6g.16xlarge", 737)
+])
+def test_max_pods_without_prefix_delegation(instance_type, pods):
+    assert max_pods(instance_type, False) == pods
+
+@pytest.mark.parametrize("instance_type, pods", [
+    # 3 ENIs x 5 /28 prefixes = 240 IPs, capped at the AWS recommendation below 30 vCPUs:
+    ("t4g.medium", 110),
+    # 2 ENIs x 3 /28 prefixes = 96 IPs stay under the cap:
+    ("c6g.medium", 98),
+    # 30 vCPUs and more get the higher cap:
+    ("c6g.8xlarge", 250),
+    ("m6g.16xlarge", 250)
+])
+def test_max_pods_with_prefix_delegation(instance_type, pods):
+    assert max_pods(instance_type, True) == pods
+
+def test_prefix_delegation_multiplies_the_eni_slots():
+    assert node_ip_capacity("t4g.medium", False) == 15
+    assert node_ip_capacity("t4g.medium", True) == 240
+
+def test_family_max_pods():
+    pods = family_max_pods(["t4g"], False)
+    assert pods["t4g.medium"] == 17
+    assert all(instance_type.startswith("t4g.") for instance_type in pods)
+
+def test_unknown_instance_type():
+    with pytest.raises(ValueError, match="no ENI limits for x9g.large"):
+        max_pods("x9g.large", False)
+
+@pytest.mark.parametrize("pre_allocate, min_allocate, max_above_watermark, prefix_delegation, pods, reserved", [
+    (8, 0, 0, False, 0, 9),
+    # Rounded up to one /28 prefix:
+    (8, 0, 0, True, 0, 17),
+    (8, 0, 0, True, 10, 33),
+    (16, 0, 0, True, 0, 17),
+    (16, 0, 1, True, 0, 33),
+    # min-allocate is a floor on the pod IPs:
+    (0, 20, 0, False, 0, 21),
+    (0, 0, 0, False, 0, 1)
+])
+def test_eni_ips_reserved_per_node(pre_allocate, min_allocate, max_above_watermark, prefix_delegation, pods, reserved):
+    assert eni_ips_reserved_per_node(pre_allocate, min_allocate, max_above_watermark, prefix_delegation, pods) == reserved
+
+def test_az_reservation_report():
+    report = az_reservation_report(["eu-central-1a", "eu-central-1b"], ["10.200.32.0/20", "10.200.48.0/20"], 2, 9, 35)
+    assert list(report) == ["eu-central-1a", "eu-central-1b"]
+    assert report["eu-central-1a"] == {
+        "subnet": "10.200.32.0/20",
+        "usable_ips": 4091,
+        "nodes": 2,
+        "reserved_ips_per_node": 9,
+        "reserved_ips": 18,
+        "headroom_ips": 4073,
+        "reserved_percent": 0.4,
+        "headroom_ips_at_max_pods": 4021,
+        "full_nodes_fit": 116
+    }
+    assert "full_nodes_fit" not in az_reservation_report(["eu-central-1a"], ["10.200.32.0/20"], 2, 9)["eu-central-1a"]
+
+def test_capacity_report():
+    report = capacity_report("t4g.medium", False, 17, az_reservation_report(["eu-central-1a"], ["10.200.32.0/20"], 2, 9, 18))
+    assert report.splitlines()[0] == "t4g.medium: 15 ENI pod IPs, max-pods 17 (ENI limit 17, prefix delegation off)"
+    assert "room for 227 full nodes" in report
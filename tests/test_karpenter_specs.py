@@ -0,0 +1,110 @@
+import pytest
+
+from karpenter_specs import node_pool_spec, node_class_spec, pool_requirements, api_kinds, chart_version, parse_duration, batch_settings, controller_values, uses_v1beta1, CILIUM_STARTUP_TAINT
+
+"""
+Karpenter node pool specs: the same pool definition has to render for the v1alpha5 and the v1beta1 APIs
+"""
+
+V1ALPHA5 = "0.27.3"
+V1BETA1 = "0.32.1"
+FAMILIES = ["c7g", "m7g"]
+POOL = {
+    "weight": 100,
+    "capacity_types": ["spot"],
+    "architectures": ["arm64"],
+    "cpu_limit": 64,
+    "memory_limit": "256Gi",
+    "expire_after_seconds": 604800
+}
+
+def requirement(requirements: list, key: str) -> dict:
+    return next(r for r in requirements if r["key"] == key)
+
+def test_requirements():
+    requirements = pool_requirements(POOL, FAMILIES)
+    assert requirement(requirements, "kubernetes.io/arch")["values"] == ["arm64"]
+    assert requirement(requirements, "karpenter.sh/capacity-type")["values"] == ["spot"]
+    assert requirement(requirements, "karpenter.k8s.aws/instance-family") == {"key": "karpenter.k8s.aws/instance-family", "operator": "In", "values": FAMILIES}
+    assert requirement(requirements, "karpenter.k8s.aws/instance-size") == {"key": "karpenter.k8s.aws/instance-size", "operator": "NotIn", "values": ["nano", "micro"]}
+    assert not any(r["key"] == "karpenter.k8s.aws/instance-pods" for r in requirements)
+
+def test_min_pods_requirement():
+    assert requirement(pool_requirements(POOL, FAMILIES, min_pods=30), "karpenter.k8s.aws/instance-pods") == {
+        "key": "karpenter.k8s.aws/instance-pods", "operator": "Gt", "values": ["29"]
+    }
+
+def test_provisioner_spec():
+    spec = node_pool_spec(V1ALPHA5, POOL, FAMILIES, "default")
+    assert spec["weight"] == 100
+    assert spec["providerRef"] == {"name": "default"}
+    assert spec["limits"] == {"resources": {"cpu": "64", "memory": "256Gi"}}
+    assert spec["consolidation"] == {"enabled": True}
+    assert spec["ttlSecondsUntilExpired"] == 604800
+    assert spec["startupTaints"] == [CILIUM_STARTUP_TAINT]
+    assert "kubeletConfiguration" not in spec
+
+def test_node_pool_spec():
+    spec = node_pool_spec(V1BETA1, POOL, FAMILIES, "default", max_pods=58)
+    assert spec["weight"] == 100
+    assert spec["limits"] == {"cpu": "64", "memory": "256Gi"}
+    assert spec["disruption"] == {"consolidationPolicy": "WhenUnderutilized", "expireAfter": "604800s"}
+    assert spec["template"]["spec"]["nodeClassRef"] == {"name": "default"}
+    assert spec["template"]["spec"]["kubelet"] == {"maxPods": 58}
+    assert spec["template"]["spec"]["requirements"] == pool_requirements(POOL, FAMILIES)
+
+def test_max_pods_on_the_provisioner():
+    assert node_pool_spec(V1ALPHA5, POOL, FAMILIES, "default", max_pods=58)["kubeletConfiguration"] == {"maxPods": 58}
+
+def test_node_templates():
+    tags = {"stack:name": "demo"}
+    template = node_class_spec(V1ALPHA5, "demo", "node-role", "node-profile", tags, user_data="[settings]")
+    assert template == {
+        "amiFamily": "Bottlerocket",
+        "instanceProfile": "node-profile",
+        "subnetSelector": {"karpenter.sh/discovery": "demo"},
+        "securityGroupSelector": {"karpenter.sh/discovery": "demo"},
+        "tags": tags,
+        "userData": "[settings]"
+    }
+    node_class = node_class_spec(V1BETA1, "demo", "node-role", "node-profile", tags, block_device_mappings=[{"deviceName": "/dev/xvdb"}])
+    assert node_class["role"] == "node-role"
+    assert node_class["subnetSelectorTerms"] == [{"tags": {"karpenter.sh/discovery": "demo"}}]
+    assert node_class["blockDeviceMappings"] == [{"deviceName": "/dev/xvdb"}]
+    assert "userData" not in node_class
+
+@pytest.mark.parametrize("version, v1beta1, chart", [
+    ("0.27.3", False, "v0.27.3"),
+    ("v0.31.0", False, "v0.31.0"),
+    ("0.32.1", True, "v0.32.1"),
+    ("0.35.0", True, "0.35.0")
+])
+def test_versions(version, v1beta1, chart):
+    assert uses_v1beta1(version) == v1beta1
+    assert chart_version(version) == chart
+    assert api_kinds(version)["node_pool"][1] == ("NodePool" if v1beta1 else "Provisioner")
+
+def test_parse_duration():
+    assert parse_duration("10s") == 10
+    assert parse_duration("1m30s") == 90
+    assert parse_duration("500ms") == 0.5
+    for duration in ["", "10", "ten seconds", "1d", "10s "]:
+        with pytest.raises(ValueError, match="is not a duration"):
+            parse_duration(duration)
+
+def test_batch_settings():
+    assert batch_settings("10s", "1s") == {"batchMaxDuration": "10s", "batchIdleDuration": "1s"}
+    for max_duration, idle_duration in [("10s", "0s"), ("1s", "2s")]:
+        with pytest.raises(ValueError, match="batch idle duration"):
+            batch_settings(max_duration, idle_duration)
+
+def test_controller_settings_layout():
+    batch = batch_settings("10s", "1s")
+    legacy = controller_values(V1ALPHA5, "demo", "https://demo", "role-arn", "node-profile", "queue", batch, 2, {})
+    assert legacy["settings"] == {
+        "aws": {"clusterName": "demo", "clusterEndpoint": "https://demo", "defaultInstanceProfile": "node-profile", "interruptionQueueName": "queue"},
+        **batch
+    }
+    current = controller_values(V1BETA1, "demo", "https://demo", "role-arn", "node-profile", "queue", batch, 2, {})
+    assert current["settings"] == {"clusterName": "demo", "clusterEndpoint": "https://demo", "interruptionQueue": "queue", **batch}
+    assert current["serviceAccount"]["annotations"] == {"eks.amazonaws.com/role-arn": "role-arn"}
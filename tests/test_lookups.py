@@ -0,0 +1,46 @@
+import types
+
+import pytest
+
+import lookups
+
+"""
+Provider lookup cache: cached values are only reused by the same profile, access key and region
+"""
+
+@pytest.fixture
+def aws(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("AWS_PROFILE", raising=False)
+    monkeypatch.delenv("AWS_ACCESS_KEY_ID", raising=False)
+    aws_config = types.SimpleNamespace(profile=None, access_key=None, region="eu-central-1")
+    monkeypatch.setattr(lookups, "config", aws_config)
+    return aws_config
+
+def test_access_keys_get_their_own_entries(aws, monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIAEXAMPLEACCOUNTA")
+    lookups.put_cached("account_id", "111111111111", 60)
+    assert lookups.get_cached("account_id", 60) == "111111111111"
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIAEXAMPLEACCOUNTB")
+    assert lookups.get_cached("account_id", 60) is None
+
+def test_access_key_ids_are_not_stored(aws, monkeypatch, tmp_path):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIAEXAMPLEACCOUNTA")
+    lookups.put_cached("account_id", "111111111111", 60)
+    assert "AKIAEXAMPLEACCOUNTA" not in (tmp_path / lookups.LOOKUP_CACHE_FILE).read_text()
+
+def test_profiles_and_regions_get_their_own_entries(aws):
+    aws.profile = "shop"
+    lookups.put_cached("account_id", "111111111111", 60)
+    assert lookups.get_cached("account_id", 60) == "111111111111"
+    aws.region = "eu-west-1"
+    assert lookups.get_cached("account_id", 60) is None
+    aws.region = "eu-central-1"
+    aws.profile = "other"
+    assert lookups.get_cached("account_id", 60) is None
+
+def test_unnamed_credentials_are_not_cached(aws, tmp_path):
+    assert lookups.cache_key() is None
+    assert lookups.put_cached("account_id", "111111111111", 60) == "111111111111"
+    assert not (tmp_path / lookups.LOOKUP_CACHE_FILE).exists()
+    assert lookups.get_cached("account_id", 60) is None
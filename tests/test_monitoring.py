@@ -0,0 +1,39 @@
+"""
+CloudWatch alarms of the data layer, evaluated under Pulumi mocks against the mock network stack outputs
+"""
+
+import json
+
+from benchmark import MOCK_NETWORK_STACK_OUTPUTS
+
+DATA_LAYER = ("stack-layer=data", "network-stack=benchmark/network")
+
+def alarm_dimensions(stack, group: str, key: str) -> list:
+    return sorted({a["inputs"]["dimensions"][key] for a in stack.of_type("aws:cloudwatch/metricAlarm:MetricAlarm") if a["name"].startswith(f"demo-{group}-")})
+
+def test_network_alarms_use_the_network_stack_outputs(evaluate_stack):
+    stack = evaluate_stack(*DATA_LAYER)
+    assert alarm_dimensions(stack, "nat-gateway", "NatGatewayId") == sorted(MOCK_NETWORK_STACK_OUTPUTS["nat-gateway-ids"].values())
+    assert alarm_dimensions(stack, "vpc-endpoint", "VPC Endpoint Id") == sorted(e["id"] for e in MOCK_NETWORK_STACK_OUTPUTS["interface-endpoints"])
+    assert alarm_dimensions(stack, "vpc-endpoint", "VPC Id") == [MOCK_NETWORK_STACK_OUTPUTS["vpc-id"]]
+
+def test_redis_alarms_follow_the_configured_members(evaluate_stack):
+    group_id = "demo-saleor-core-redis-cluster-id"
+    for config, members in [
+        ((), ["001", "002"]),
+        (("redis-num-cache-clusters=3",), ["001", "002", "003"]),
+        (("redis-cluster-mode=true", "redis-cluster-aware-client=true"), ["0001-001", "0001-002", "0002-001", "0002-002"])
+    ]:
+        stack = evaluate_stack(*DATA_LAYER, *config)
+        assert alarm_dimensions(stack, "redis", "CacheClusterId") == [f"{group_id}-{member}" for member in members]
+
+def test_dashboard_charts_every_monitored_group(evaluate_stack):
+    stack = evaluate_stack(*DATA_LAYER)
+    widgets = json.loads(stack.named("demo-performance-dashboard")["inputs"]["dashboardBody"])["widgets"]
+    assert {w["properties"]["title"].split()[0] for w in widgets} == {"postgres", "redis", "nat_gateway", "vpc_endpoint"}
+    assert len({(w["x"], w["y"]) for w in widgets}) == len(widgets)
+
+def test_network_alarms_follow_the_configured_azs(evaluate_stack):
+    stack = evaluate_stack(*DATA_LAYER)
+    assert len(alarm_dimensions(stack, "nat-gateway", "NatGatewayId")) == stack.settings["demo_az_count"]
+    assert sorted(alarm_dimensions(stack, "vpc-endpoint", "Service Name")) == sorted(f"com.amazonaws.eu-central-1.{service}" for service in stack.settings["endpoint_services"])
@@ -0,0 +1,61 @@
+import json
+import re
+
+from cilium_values import local_redirect_values, render_cilium_values
+from node_dns_corefile import render_node_local_dns_corefile, CLUSTER_ZONES
+
+"""
+Cluster DNS: the NodeLocal DNSCache Corefile, and the resources node-local-dns and coredns-autoscaler register under
+Pulumi mocks
+"""
+
+def server_blocks(corefile: str) -> dict:
+    """Zone -> body of every server block"""
+    return dict(re.findall(r"^(\S+):53 \{\n(.*?)^\}", corefile, re.MULTILINE | re.DOTALL))
+
+def test_corefile_zones():
+    assert list(server_blocks(render_node_local_dns_corefile(30))) == CLUSTER_ZONES + ["."]
+
+def test_cluster_zones_go_to_coredns_over_tcp():
+    blocks = server_blocks(render_node_local_dns_corefile(30))
+    for zone in CLUSTER_ZONES:
+        assert "forward . __PILLAR__CLUSTER__DNS__ {\n        force_tcp\n    }" in blocks[zone]
+    assert "forward . __PILLAR__UPSTREAM__SERVERS__\n" in blocks["."]
+    assert "force_tcp" not in blocks["."]
+
+def test_corefile_cache_ttl():
+    blocks = server_blocks(render_node_local_dns_corefile(45))
+    for zone in CLUSTER_ZONES:
+        assert "success 9984 45" in blocks[zone]
+        assert "denial 9984 5" in blocks[zone]
+    assert "cache 45\n" in blocks["."]
+
+def test_cilium_local_redirect_policy_value():
+    assert render_cilium_values("role-arn", "https://cluster", local_redirect_values(True, "1.12.5"))["localRedirectPolicy"] is True
+    assert "localRedirectPolicy" not in render_cilium_values("role-arn", "https://cluster", local_redirect_values(False, "1.12.5"))
+
+def node_local_dns_resources(stack) -> list:
+    return sorted(r["name"] for r in stack.resources if r["name"] in ["node-local-dns", "node-local-dns-redirect-policy", "node-local-dns-config"])
+
+def test_node_local_dns_is_opt_in(evaluate_stack):
+    stack = evaluate_stack()
+    assert node_local_dns_resources(stack) == []
+    assert stack.settings["node_local_dns_enabled"] is False
+
+def test_node_local_dns_resources(evaluate_stack):
+    stack = evaluate_stack("node-local-dns=true")
+    assert node_local_dns_resources(stack) == ["node-local-dns", "node-local-dns-config", "node-local-dns-redirect-policy"]
+    assert stack.named("node-local-dns")["type"] == "kubernetes:apps/v1:DaemonSet"
+    policy = stack.named("node-local-dns-redirect-policy")
+    assert policy["type"] == "kubernetes:cilium.io/v2:CiliumLocalRedirectPolicy"
+    assert policy["inputs"]["spec"]["redirectFrontend"]["serviceMatcher"] == {"serviceName": "kube-dns", "namespace": "kube-system"}
+    assert stack.named("node-local-dns-config")["inputs"]["data"]["Corefile"] == render_node_local_dns_corefile(stack.settings["coredns_cache_ttl"])
+    assert local_redirect_values(stack.settings["node_local_dns_enabled"], stack.settings["cilium_release_version"]) == {"localRedirectPolicy": True}
+
+def test_coredns_autoscaler_follows_the_setting(evaluate_stack):
+    autoscaled = evaluate_stack()
+    assert autoscaled.named("coredns-autoscaler")["inputs"]["values"]["options"]["target"] == "deployment/coredns"
+    assert "replicaCount" not in json.loads(autoscaled.named("coredns-addon")["inputs"]["configurationValues"])
+    fixed = evaluate_stack("coredns-autoscaler=false")
+    assert not [r for r in fixed.resources if r["name"] == "coredns-autoscaler"]
+    assert json.loads(fixed.named("coredns-addon")["inputs"]["configurationValues"])["replicaCount"] == fixed.settings["coredns_replicas"]
@@ -0,0 +1,74 @@
+import pytest
+
+from postgres_tuning import derive_parameters, validate_gp3_storage, instance_class_resources, RDS_INSTANCE_CLASSES, RDS_MAX_CONNECTIONS, GIB
+
+"""
+PostgreSQL parameters derived from the instance class, and the gp3 storage rules
+"""
+
+def values(instance_class: str) -> dict:
+    return {name: value for name, (value, _) in derive_parameters(instance_class).items()}
+
+def test_small_instance_parameters():
+    assert values("db.t4g.small") == {
+        "shared_buffers": "65536",
+        "max_connections": "200",
+        "effective_cache_size": "196608",
+        "work_mem": "4096",
+        "random_page_cost": "1.1",
+        "max_parallel_workers": "2",
+        "max_parallel_workers_per_gather": "1"
+    }
+
+def test_large_instance_parameters():
+    parameters = values("db.r6g.2xlarge")
+    # 64 GiB: RDS would allow 7209 connections, the vCPUs cap it at 800:
+    assert parameters["max_connections"] == "800"
+    assert parameters["shared_buffers"] == str(16 * GIB // 8192)
+    assert parameters["work_mem"] == str(48 * GIB // (800 * 3) // 1024)
+    assert parameters["max_parallel_workers_per_gather"] == "4"
+
+def test_memory_caps_max_connections():
+    # 1 GiB only leaves room for 112 connections, below the 200 the vCPUs could serve:
+    assert values("db.t4g.micro")["max_connections"] == "112"
+
+@pytest.mark.parametrize("instance_class", RDS_INSTANCE_CLASSES)
+def test_every_instance_class_stays_within_the_rds_limits(instance_class):
+    memory, vcpu = instance_class_resources(instance_class)
+    parameters = values(instance_class)
+    assert 0 < int(parameters["max_connections"]) <= RDS_MAX_CONNECTIONS
+    assert int(parameters["work_mem"]) >= 4096
+    assert int(parameters["shared_buffers"]) * 8192 == memory // 4
+    assert int(parameters["shared_buffers"]) < int(parameters["effective_cache_size"])
+
+def test_memory_parameters_need_a_reboot():
+    parameters = derive_parameters("db.t4g.small")
+    assert parameters["shared_buffers"][1] == parameters["max_connections"][1] == "pending-reboot"
+    assert parameters["work_mem"][1] == "immediate"
+
+def test_unknown_instance_class():
+    with pytest.raises(ValueError, match="add it to RDS_INSTANCE_CLASSES"):
+        derive_parameters("db.x2g.large")
+
+@pytest.mark.parametrize("storage", [
+    (20, 100, None, None),
+    (20, 0, None, None),
+    (400, 1000, 12000, 500),
+    (400, 0, 64000, None),
+    (500, 0, None, 4000)
+])
+def test_valid_gp3_storage(storage):
+    validate_gp3_storage(*storage)
+
+@pytest.mark.parametrize("storage, error", [
+    ((100, 100, None, None), "must be larger than the allocated storage"),
+    ((100, 50, None, None), "must be larger than the allocated storage"),
+    ((399, 0, 12000, None), "only be set from 400 GiB"),
+    ((20, 100, None, 500), "only be set from 400 GiB"),
+    ((400, 0, 3000, None), "IOPS must be between"),
+    ((400, 0, 64001, None), "IOPS must be between"),
+    ((400, 0, None, 125), "throughput must be between")
+])
+def test_invalid_gp3_storage(storage, error):
+    with pytest.raises(ValueError, match=error):
+        validate_gp3_storage(*storage)
@@ -0,0 +1,26 @@
+"""
+Saleor media bucket features of the data layer, evaluated under Pulumi mocks
+"""
+
+DATA_LAYER = ("stack-layer=data", "network-stack=benchmark/network")
+
+def test_media_features_are_opt_in(evaluate_stack):
+    stack = evaluate_stack(*DATA_LAYER)
+    rules = stack.named("saleor-media-bucket-lifecycle")["inputs"]["rules"]
+    assert [r["id"] for r in rules if r.get("transitions")] == []
+    assert stack.of_type("aws:s3/bucketMetric:BucketMetric") == []
+    assert stack.of_type("aws:s3/inventory:Inventory") == []
+    assert stack.of_type("aws:s3/bucketIntelligentTieringConfiguration:BucketIntelligentTieringConfiguration") == []
+
+def test_media_features_when_enabled(evaluate_stack):
+    stack = evaluate_stack(*DATA_LAYER, "media-intelligent-tiering=true", "media-insights=true", "media-archive-access-days=90")
+    rules = stack.named("saleor-media-bucket-lifecycle")["inputs"]["rules"]
+    assert [r["id"] for r in rules if r.get("transitions")] == ["intelligent-tiering"]
+    assert len(stack.of_type("aws:s3/bucketMetric:BucketMetric")) == len(stack.settings["saleor_media_prefixes"]) + 1
+    assert stack.of_type("aws:s3/inventory:Inventory")
+    tierings = stack.named("saleor-media-bucket-archive-tiering")["inputs"]["tierings"]
+    assert [(t["accessTier"], t["days"]) for t in tierings] == [("ARCHIVE_ACCESS", 90)]
+
+def test_archive_tiers_need_intelligent_tiering(stack_error):
+    assert "needs media-intelligent-tiering=true" in stack_error(*DATA_LAYER, "media-archive-access-days=90")
+    assert "needs media-intelligent-tiering=true" in stack_error(*DATA_LAYER, "media-deep-archive-access-days=180")
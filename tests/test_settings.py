@@ -0,0 +1,15 @@
+import pytest
+
+"""
+Stack config parsing: an explicit 0 has to reach the validation instead of falling back to the default
+"""
+
+@pytest.mark.parametrize("config, error", [
+    ("az-count=0", "az count must be between"),
+    ("pods-per-az=0", "needs at least one host"),
+    ("expected-nodes-per-az=-1", "expected-nodes-per-az can't be negative"),
+    ("node-max-pods=0", "node-max-pods must be at least 1"),
+    ("karpenter-cpu-limit=0", "karpenter-cpu-limit must be at least 1")
+])
+def test_explicit_zero_is_validated(stack_error, config, error):
+    assert error in stack_error("stack-layer=network", config)
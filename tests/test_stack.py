@@ -0,0 +1,65 @@
+"""
+Key properties of the whole program, evaluated under Pulumi mocks with the default stack config
+"""
+
+def test_vpc_cidr(evaluate_stack):
+    stack = evaluate_stack()
+    assert [v["inputs"]["cidrBlock"] for v in stack.of_type("aws:ec2/vpc:Vpc")] == [stack.settings["demo_vpc_cidr"]]
+
+def test_subnets_follow_the_plan(evaluate_stack):
+    stack = evaluate_stack()
+    planned = sorted(cidr for cidrs in stack.settings["demo_subnet_plan"].values() for cidr in cidrs)
+    assert sorted(s["inputs"]["cidrBlock"] for s in stack.of_type("aws:ec2/subnet:Subnet")) == planned
+
+def test_dual_stack_subnets_get_distinct_ipv6_blocks(evaluate_stack):
+    stack = evaluate_stack("dual-stack=true")
+    ipv6_cidrs = [s["inputs"].get("ipv6CidrBlock") for s in stack.of_type("aws:ec2/subnet:Subnet")]
+    assert None not in ipv6_cidrs
+    assert len(set(ipv6_cidrs)) == len(ipv6_cidrs)
+
+def test_data_stores_use_custom_parameter_groups(evaluate_stack):
+    stack = evaluate_stack()
+    for typ in ["aws:rds/instance:Instance", "aws:elasticache/replicationGroup:ReplicationGroup"]:
+        for r in stack.of_type(typ):
+            assert not str(r["inputs"].get("parameterGroupName", "default")).startswith("default"), r["name"]
+
+def test_one_cilium_release(evaluate_stack):
+    stack = evaluate_stack()
+    releases = [r for r in stack.of_type("kubernetes:helm.sh/v3:Release") if r["inputs"].get("chart") == "cilium"]
+    assert [r["inputs"]["version"] for r in releases] == [stack.settings["cilium_release_version"]]
+
+def test_karpenter_controller_and_interruption_queue(evaluate_stack):
+    from karpenter_specs import chart_version
+    stack = evaluate_stack()
+    release = stack.named("karpenter")
+    assert release["inputs"]["version"] == chart_version(stack.settings["karpenter_version"])
+    assert stack.named("karpenter-interruption-queue")["inputs"]["name"] == stack.settings["karpenter_interruption_queue_name"]
+    assert len(stack.of_type("aws:cloudwatch/eventRule:EventRule")) == len(stack.of_type("aws:cloudwatch/eventTarget:EventTarget")) == 4
+
+def test_karpenter_controller_can_be_left_out(evaluate_stack):
+    stack = evaluate_stack("karpenter-controller=false")
+    assert not [r for r in stack.resources if r["module"] == "karpenter"]
+
+def test_l7_visibility_is_opt_in(evaluate_stack):
+    def visibility_policies(stack):
+        return [p["name"] for p in stack.of_type("kubernetes:cilium.io/v2:CiliumNetworkPolicy") if p["name"].endswith("-l7-visibility-policy")]
+    assert visibility_policies(evaluate_stack()) == []
+    assert len(visibility_policies(evaluate_stack("hubble-l7-visibility=true"))) == len(evaluate_stack().settings["saleor_l7_visibility_ports"])
+
+def test_default_subnets_keep_the_original_cidrs(evaluate_stack):
+    assert evaluate_stack().settings["demo_subnet_plan"] == {
+        "public": ["10.200.0.0/20", "10.200.16.0/20"],
+        "private": ["10.200.32.0/20", "10.200.48.0/20"],
+        "eks_cp": ["10.200.64.0/24", "10.200.65.0/24"],
+        "db": ["10.200.66.0/24", "10.200.67.0/24"]
+    }
+
+def test_managed_nodegroup_is_replaced_create_before_delete(evaluate_stack):
+    nodegroup = evaluate_stack().named("cilium-managed-nodegroup")["inputs"]
+    assert "nodeGroupName" not in nodegroup
+    assert nodegroup["launchTemplate"]
+
+def test_postgres_read_replicas_are_opt_in(evaluate_stack):
+    replicas = lambda stack: [r["name"] for r in stack.of_type("aws:rds/instance:Instance") if r["name"].startswith("demo-saleor-core-sql-replica-")]
+    assert replicas(evaluate_stack()) == []
+    assert replicas(evaluate_stack("postgres-read-replicas=1")) == ["demo-saleor-core-sql-replica-0"]
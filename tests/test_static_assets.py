@@ -0,0 +1,43 @@
+"""
+Static asset sync and CloudFront precompression of the data layer, evaluated under Pulumi mocks against a local build
+directory
+"""
+
+import importlib.util
+
+import pytest
+
+from asset_manifest import uri_hash
+
+DATA_LAYER = ("stack-layer=data", "network-stack=benchmark/network")
+
+@pytest.fixture(scope="module")
+def static_build_dir(tmp_path_factory):
+    build_dir = tmp_path_factory.mktemp("static-build")
+    (build_dir / "css").mkdir()
+    (build_dir / "css" / "site.0a1b2c3d4e.css").write_text("body { margin: 0; }" * 50)
+    (build_dir / "favicon.ico").write_bytes(b"\x00\x00\x01\x00")
+    return str(build_dir)
+
+def test_static_sync_uploads_every_file_and_its_variants(evaluate_stack, static_build_dir):
+    stack = evaluate_stack(*DATA_LAYER, f"static-build-dir={static_build_dir}")
+    objects = {o["inputs"]["key"]: o["inputs"] for o in stack.of_type("aws:s3/bucketObjectv2:BucketObjectv2")}
+    assert sorted(objects) == ["css/site.0a1b2c3d4e.css", "css/site.0a1b2c3d4e.css.gz", "favicon.ico"]
+    assert objects["css/site.0a1b2c3d4e.css.gz"]["contentEncoding"] == "gzip"
+    assert objects["css/site.0a1b2c3d4e.css.gz"]["contentType"] == "text/css"
+    assert objects["css/site.0a1b2c3d4e.css"]["cacheControl"] == "public, max-age=31536000, immutable"
+
+def test_only_the_synced_bucket_gets_the_precompressed_function(evaluate_stack, static_build_dir):
+    stack = evaluate_stack(*DATA_LAYER, f"static-build-dir={static_build_dir}")
+    functions = stack.of_type("aws:cloudfront/function:Function")
+    assert [f["name"] for f in functions] == ["saleor-static-cdn-precompressed"]
+    assert f" {uri_hash('/css/site.0a1b2c3d4e.css')} " in functions[0]["inputs"]["code"]
+
+def test_no_sync_without_a_build_dir(evaluate_stack):
+    stack = evaluate_stack(*DATA_LAYER)
+    assert stack.of_type("aws:s3/bucketObjectv2:BucketObjectv2") == []
+    assert stack.of_type("aws:cloudfront/function:Function") == []
+
+@pytest.mark.skipif(importlib.util.find_spec("brotli") is not None, reason="brotli is installed")
+def test_brotli_without_the_package_fails(stack_error, static_build_dir):
+    assert "need the brotli package" in stack_error(*DATA_LAYER, f"static-build-dir={static_build_dir}", 'asset-encodings=["br","gzip"]')
@@ -0,0 +1,103 @@
+import ipaddress
+
+import pytest
+
+from subnet_planner import plan_subnets, plan_tier_blocks, plan_ipv6_subnets, prefix_for_hosts, usable_ips, MIN_AZ_COUNT, MAX_AZ_COUNT
+
+"""
+Subnet planner: the layout has to stay put when AZs are added or a tier is resized
+"""
+
+VPC_CIDR = "10.200.0.0/16"
+TIER_HOSTS = {"public": 4000, "private": 4000, "eks_cp": 250, "db": 250}
+TIER_BLOCKS = {
+    "public": ["10.200.0.0/19", "10.200.128.0/18"],
+    "private": ["10.200.32.0/19", "10.200.192.0/18"],
+    "eks_cp": ["10.200.64.0/23", "10.200.68.0/22"],
+    "db": ["10.200.66.0/23", "10.200.72.0/22"]
+}
+
+def all_subnets(plan: dict) -> list:
+    return [ipaddress.ip_network(cidr) for cidrs in plan.values() for cidr in cidrs]
+
+def test_default_layout_keeps_the_original_cidrs():
+    assert plan_subnets(VPC_CIDR, 2, TIER_HOSTS, TIER_BLOCKS) == {
+        "public": ["10.200.0.0/20", "10.200.16.0/20"],
+        "private": ["10.200.32.0/20", "10.200.48.0/20"],
+        "eks_cp": ["10.200.64.0/24", "10.200.65.0/24"],
+        "db": ["10.200.66.0/24", "10.200.67.0/24"]
+    }
+
+def test_third_az_grows_into_the_second_blocks():
+    plan = plan_subnets(VPC_CIDR, 3, TIER_HOSTS, TIER_BLOCKS)
+    assert {tier: cidrs[2] for tier, cidrs in plan.items()} == {
+        "public": "10.200.128.0/20",
+        "private": "10.200.192.0/20",
+        "eks_cp": "10.200.68.0/24",
+        "db": "10.200.72.0/24"
+    }
+
+@pytest.mark.parametrize("az_count", range(MIN_AZ_COUNT, MAX_AZ_COUNT + 1))
+def test_subnets_fit_without_overlapping(az_count):
+    plan = plan_subnets(VPC_CIDR, az_count, TIER_HOSTS, TIER_BLOCKS)
+    subnets = all_subnets(plan)
+    assert all(len(cidrs) == az_count for cidrs in plan.values())
+    assert all(subnet.subnet_of(ipaddress.ip_network(VPC_CIDR)) for subnet in subnets)
+    assert not any(a.overlaps(b) for i, a in enumerate(subnets) for b in subnets[i + 1:])
+
+@pytest.mark.parametrize("az_count", range(MIN_AZ_COUNT, MAX_AZ_COUNT))
+def test_adding_an_az_only_adds_subnets(az_count):
+    before = plan_subnets(VPC_CIDR, az_count, TIER_HOSTS, TIER_BLOCKS)
+    after = plan_subnets(VPC_CIDR, az_count + 1, TIER_HOSTS, TIER_BLOCKS)
+    for tier, cidrs in before.items():
+        assert after[tier][:az_count] == cidrs
+
+def test_resizing_a_tier_keeps_the_other_tiers():
+    before = plan_subnets(VPC_CIDR, 3, TIER_HOSTS, TIER_BLOCKS)
+    after = plan_subnets(VPC_CIDR, 3, {**TIER_HOSTS, "private": 8000}, TIER_BLOCKS)
+    assert after["private"] == ["10.200.32.0/19", "10.200.192.0/19", "10.200.224.0/19"]
+    assert {tier: cidrs for tier, cidrs in after.items() if tier != "private"} == {tier: cidrs for tier, cidrs in before.items() if tier != "private"}
+
+def test_subnets_hold_the_density_targets():
+    plan = plan_subnets(VPC_CIDR, 2, TIER_HOSTS, TIER_BLOCKS)
+    for tier, cidrs in plan.items():
+        assert all(usable_ips(cidr) >= TIER_HOSTS[tier] for cidr in cidrs)
+
+def test_tier_too_large_for_its_block():
+    with pytest.raises(ValueError, match="hold 4091 hosts per AZ at 4 AZs"):
+        plan_subnets(VPC_CIDR, 4, {**TIER_HOSTS, "private": 8000}, TIER_BLOCKS)
+    with pytest.raises(ValueError, match="do not fit into its 10.200.32.0/19, 10.200.192.0/18 blocks"):
+        plan_subnets(VPC_CIDR, 2, {**TIER_HOSTS, "private": 40000}, TIER_BLOCKS)
+
+def test_blocks_have_to_fit_the_vpc():
+    with pytest.raises(ValueError, match="the public block 10.200.0.0/19 overlaps the spare block 10.200.0.0/24"):
+        plan_tier_blocks(VPC_CIDR, {"public": TIER_BLOCKS["public"], "spare": ["10.200.0.0/24"]})
+    with pytest.raises(ValueError, match="is not inside"):
+        plan_tier_blocks(VPC_CIDR, {"private": ["10.201.0.0/20"]})
+    with pytest.raises(ValueError, match="must be an IPv4 network"):
+        plan_tier_blocks("10.0.0.0/8", TIER_BLOCKS)
+
+def test_every_tier_needs_a_block():
+    with pytest.raises(ValueError, match="no block for the spare tier"):
+        plan_subnets(VPC_CIDR, 2, {**TIER_HOSTS, "spare": 100}, TIER_BLOCKS)
+
+@pytest.mark.parametrize("az_count", [MIN_AZ_COUNT - 1, MAX_AZ_COUNT + 1])
+def test_az_count_limits(az_count):
+    with pytest.raises(ValueError, match="az count"):
+        plan_subnets(VPC_CIDR, az_count, TIER_HOSTS, TIER_BLOCKS)
+
+def test_prefix_for_hosts():
+    assert prefix_for_hosts(250) == 24
+    assert prefix_for_hosts(251) == 24
+    assert prefix_for_hosts(252) == 23
+    assert prefix_for_hosts(1) == 28
+    with pytest.raises(ValueError):
+        prefix_for_hosts(0)
+    with pytest.raises(ValueError):
+        prefix_for_hosts(70000)
+
+def test_ipv6_subnets_stay_put_when_adding_azs():
+    before = plan_ipv6_subnets("2600:1f18:0:ff00::/56", list(TIER_HOSTS), 2)
+    after = plan_ipv6_subnets("2600:1f18:0:ff00::/56", list(TIER_HOSTS), 3)
+    assert all(after[tier][:2] == cidrs for tier, cidrs in before.items())
+    assert before["private"] == ["2600:1f18:0:ff06::/64", "2600:1f18:0:ff07::/64"]
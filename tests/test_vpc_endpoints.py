@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+"""
+Route table and VPC endpoint wiring of the network layer, evaluated under Pulumi mocks
+"""
+
+TIERS = ["public", "private", "eks-cp", "db"]
+
+@pytest.fixture(scope="module", params=["az-count=2", "az-count=3"])
+def network(request, evaluate_stack):
+    return evaluate_stack("stack-layer=network", request.param)
+
+def route_tables_of(stack, tiers: list) -> list:
+    return [rt for rt in stack.of_type("aws:ec2/routeTable:RouteTable") if any(rt["name"].startswith(f"demo-{tier}-rt-") for tier in tiers)]
+
+def test_every_subnet_uses_the_route_table_of_its_tier_and_az(network):
+    associations = {a["inputs"]["subnetId"]: a["inputs"]["routeTableId"] for a in network.of_type("aws:ec2/routeTableAssociation:RouteTableAssociation")}
+    subnets = network.of_type("aws:ec2/subnet:Subnet")
+    assert len(subnets) == len(TIERS) * network.settings["demo_az_count"]
+    for subnet in subnets:
+        route_table = subnet["name"].replace("-subnet-", "-rt-")
+        assert associations[network.id_of(subnet)] == network.id_of(network.named(route_table))
+
+def test_default_routes_leave_through_the_nat_gateway_of_the_same_az(network):
+    for route in network.of_type("aws:ec2/route:Route"):
+        if route["inputs"].get("destinationCidrBlock") != "0.0.0.0/0":
+            continue
+        az = route["name"].rsplit("-route-", 1)[1]
+        if route["name"].startswith("demo-public-"):
+            assert route["inputs"]["gatewayId"] == network.id_of(network.named("demo-igw"))
+        else:
+            assert route["inputs"]["natGatewayId"] == network.id_of(network.named(f"demo-nat-gateway-{az}"))
+
+def test_gateway_endpoints_attach_to_every_non_public_route_table(network):
+    expected = sorted(network.id_of(rt) for rt in route_tables_of(network, ["private", "eks-cp", "db"]))
+    gateway_endpoints = [e for e in network.of_type("aws:ec2/vpcEndpoint:VpcEndpoint") if e["inputs"]["vpcEndpointType"] == "Gateway"]
+    assert [e["inputs"]["serviceName"].rsplit(".", 1)[1] for e in gateway_endpoints] == network.settings["gateway_endpoint_services"]
+    for endpoint in gateway_endpoints:
+        assert sorted(endpoint["inputs"]["routeTableIds"]) == expected
+
+def test_s3_gateway_endpoint_policy_is_scoped_to_the_saleor_and_ecr_buckets(network):
+    policy = json.loads(network.named("s3-gateway-vpc-endpoint")["inputs"]["policy"])
+    resources = [resource for statement in policy["Statement"] for resource in (statement["Resource"] if isinstance(statement["Resource"], list) else [statement["Resource"]])]
+    for name in [network.settings[key] for key in ["saleor_dashboard_bucket_name", "saleor_media_bucket_name", "saleor_static_bucket_name"]]:
+        assert f"arn:aws:s3:::{name}/*" in resources
+    assert all(resource.startswith(("arn:aws:s3:::saleor", "arn:aws:s3:::prod-")) for resource in resources)
+
+def test_interface_endpoints_sit_in_the_private_subnets(network):
+    private_subnets = sorted(network.id_of(s) for s in network.of_type("aws:ec2/subnet:Subnet") if s["name"].startswith("demo-private-subnet-"))
+    for endpoint in network.of_type("aws:ec2/vpcEndpoint:VpcEndpoint"):
+        if endpoint["inputs"]["vpcEndpointType"] == "Interface":
+            assert sorted(endpoint["inputs"]["subnetIds"]) == private_subnets
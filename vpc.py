@@ -1,6 +1,8 @@
 import pulumi
-from pulumi_aws import ec2, config, get_availability_zones
-from settings import general_tags, cluster_descriptor, demo_vpc_cidr, demo_private_subnet_cidrs, demo_public_subnet_cidrs, demo_eks_cp_subnet_cidrs, demo_db_subnet_cidrs
+from pulumi_aws import ec2, config
+from lookups import lookup_availability_zones
+from subnet_planner import plan_ipv6_subnets
+from settings import lookup_cache_ttl, general_tags, cluster_descriptor, demo_az_count, demo_vpc_cidr, demo_subnet_plan, demo_dual_stack, demo_private_subnet_cidrs, demo_public_subnet_cidrs, demo_eks_cp_subnet_cidrs, demo_db_subnet_cidrs
 
 """
 Creates a minium of AWS networking objects required for the demo stack to work
@@ -9,6 +11,7 @@ Creates a minium of AWS networking objects required for the demo stack to work
 # Create a VPC and Internet Gateway:
 demo_vpc = ec2.Vpc("demo-vpc",
     cidr_block=demo_vpc_cidr,
+    assign_generated_ipv6_cidr_block=demo_dual_stack,
     enable_dns_hostnames=True,
     enable_dns_support=True,
     tags={**general_tags, "Name": f"demo-vpc-{config.region}"}
@@ -20,6 +23,26 @@ demo_igw = ec2.InternetGateway("demo-igw",
     opts=pulumi.ResourceOptions(parent=demo_vpc)
 )
 
+# In dual-stack mode, IPv6 egress from the private tiers leaves through an egress-only internet gateway instead of NAT:
+demo_eigw = None
+demo_ipv6_subnet_plan = None
+if demo_dual_stack:
+    demo_eigw = ec2.EgressOnlyInternetGateway("demo-eigw",
+        vpc_id=demo_vpc.id,
+        tags={**general_tags, "Name": f"demo-eigw-{config.region}"},
+        opts=pulumi.ResourceOptions(parent=demo_vpc)
+    )
+    demo_ipv6_subnet_plan = demo_vpc.ipv6_cidr_block.apply(lambda cidr: plan_ipv6_subnets(cidr, list(demo_subnet_plan), demo_az_count))
+
+def ipv6_subnet_args(tier: str, i: int) -> dict:
+    """IPv6 /64 of a subnet in dual-stack mode, instances launched into it get an IPv6 address"""
+    if not demo_dual_stack:
+        return {}
+    return {
+        "ipv6_cidr_block": demo_ipv6_subnet_plan.apply(lambda plan: plan[tier][i]),
+        "assign_ipv6_address_on_creation": True
+    }
+
 # Create a default any-any security group for demo purposes:
 demo_sg = ec2.SecurityGroup("demo-security-group",
     description="Allow any-any",
@@ -44,19 +67,27 @@ demo_sg = ec2.SecurityGroup("demo-security-group",
 )
 
 # Create subnets:
-demo_azs = get_availability_zones(state="available").names
+demo_azs = lookup_availability_zones(lookup_cache_ttl)
+if len(demo_azs) < demo_az_count:
+    raise pulumi.RunError(f"az-count is {demo_az_count}, but {config.region} only has {len(demo_azs)} available AZs")
+
 demo_public_subnets = []
 demo_private_subnets = []
 demo_eks_cp_subnets = []
 demo_db_subnets = []
+demo_private_route_tables = []
+demo_eks_cp_route_tables = []
+demo_db_route_tables = []
+demo_nat_gateways = []
 
-for i in range(2):
+for i in range(demo_az_count):
     prefix = f"{demo_azs[i]}"
     
     demo_public_subnet = ec2.Subnet(f"demo-public-subnet-{prefix}",
         vpc_id=demo_vpc.id,
         cidr_block=demo_public_subnet_cidrs[i],
         availability_zone=demo_azs[i],
+        **ipv6_subnet_args("public", i),
         tags={**general_tags, "Name": f"demo-public-subnet-{prefix}"},
         opts=pulumi.ResourceOptions(parent=demo_vpc)
     )
@@ -82,6 +113,14 @@ for i in range(2):
         opts=pulumi.ResourceOptions(parent=demo_public_subnet)
     )
 
+    if demo_dual_stack:
+        demo_public_wan_route6 = ec2.Route(f"demo-public-wan6-route-{prefix}",
+            route_table_id=demo_public_route_table.id,
+            gateway_id=demo_igw.id,
+            destination_ipv6_cidr_block="::/0",
+            opts=pulumi.ResourceOptions(parent=demo_public_subnet)
+        )
+
     demo_eip = ec2.Eip(f"demo-eip-{prefix}",
         tags={**general_tags, "Name": f"demo-eip-{prefix}"},
         opts=pulumi.ResourceOptions(parent=demo_vpc)
@@ -91,13 +130,17 @@ for i in range(2):
         allocation_id=demo_eip.id,
         subnet_id=demo_public_subnet.id,
         tags={**general_tags, "Name": f"demo-nat-{prefix}"},
-        opts=pulumi.ResourceOptions(depends_on=[demo_vpc])
+        # The subnet already orders the NAT gateway after the VPC, it only has to wait for the internet gateway:
+        opts=pulumi.ResourceOptions(depends_on=[demo_igw])
     )
 
+    demo_nat_gateways.append(demo_nat_gateway)
+
     demo_private_subnet = ec2.Subnet(f"demo-private-subnet-{prefix}",
         vpc_id=demo_vpc.id,
         cidr_block=demo_private_subnet_cidrs[i],
         availability_zone=demo_azs[i],
+        **ipv6_subnet_args("private", i),
         tags={**general_tags, "cilium-pod-interfaces": "private" ,"Name": f"demo-private-subnet-{prefix}", "karpenter.sh/discovery": f"{cluster_descriptor}"},
         opts=pulumi.ResourceOptions(parent=demo_vpc)
     )
@@ -109,6 +152,8 @@ for i in range(2):
         tags={**general_tags, "Name": f"demo-private-rt-{prefix}"},
         opts=pulumi.ResourceOptions(parent=demo_private_subnet)
     )
+
+    demo_private_route_tables.append(demo_private_route_table)
     
     demo_private_route_table_association = ec2.RouteTableAssociation(f"demo-private-rt-association-{prefix}",
         route_table_id=demo_private_route_table.id,
@@ -123,10 +168,19 @@ for i in range(2):
         opts=pulumi.ResourceOptions(parent=demo_private_subnet)
     )
 
+    if demo_dual_stack:
+        demo_private_wan_route6 = ec2.Route(f"demo-private-wan6-route-{prefix}",
+            route_table_id=demo_private_route_table.id,
+            egress_only_gateway_id=demo_eigw.id,
+            destination_ipv6_cidr_block="::/0",
+            opts=pulumi.ResourceOptions(parent=demo_private_subnet)
+        )
+
     demo_eks_cp_subnet = ec2.Subnet(f"demo-eks-cp-subnet-{prefix}",
         vpc_id=demo_vpc.id,
         cidr_block=demo_eks_cp_subnet_cidrs[i],
         availability_zone=demo_azs[i],
+        **ipv6_subnet_args("eks_cp", i),
         tags={**general_tags, "Name": f"demo-eks-cp-subnet-{prefix}"},
         opts=pulumi.ResourceOptions(parent=demo_vpc)
     )
@@ -138,6 +192,8 @@ for i in range(2):
         tags={**general_tags, "Name": f"demo-eks-cp-rt-{prefix}"},
         opts=pulumi.ResourceOptions(parent=demo_eks_cp_subnet)
     )
+
+    demo_eks_cp_route_tables.append(demo_eks_cp_route_table)
     
     demo__eks_cp_route_table_association = ec2.RouteTableAssociation(f"demo-eks-cp-rt-association-{prefix}",
         route_table_id=demo_eks_cp_route_table.id,
@@ -152,10 +208,19 @@ for i in range(2):
         opts=pulumi.ResourceOptions(parent=demo_eks_cp_subnet)
     )
 
+    if demo_dual_stack:
+        demo_eks_cp_wan_route6 = ec2.Route(f"demo-eks-cp-wan6-route-{prefix}",
+            route_table_id=demo_eks_cp_route_table.id,
+            egress_only_gateway_id=demo_eigw.id,
+            destination_ipv6_cidr_block="::/0",
+            opts=pulumi.ResourceOptions(parent=demo_eks_cp_subnet)
+        )
+
     demo_db_subnet = ec2.Subnet(f"demo-db-subnet-{prefix}",
         vpc_id=demo_vpc.id,
         cidr_block=demo_db_subnet_cidrs[i],
         availability_zone=demo_azs[i],
+        **ipv6_subnet_args("db", i),
         tags={**general_tags, "Name": f"demo-db-subnet-{prefix}"},
         opts=pulumi.ResourceOptions(parent=demo_vpc)
     )
@@ -167,9 +232,11 @@ for i in range(2):
         tags={**general_tags, "Name": f"demo-db-rt-{prefix}"},
         opts=pulumi.ResourceOptions(parent=demo_db_subnet)
     )
+
+    demo_db_route_tables.append(demo_db_route_table)
     
     demo__db_route_table_association = ec2.RouteTableAssociation(f"demo-db-rt-association-{prefix}",
-        route_table_id=demo_eks_cp_route_table.id,
+        route_table_id=demo_db_route_table.id,
         subnet_id=demo_db_subnet.id,
         opts=pulumi.ResourceOptions(parent=demo_db_subnet)
     )
@@ -179,4 +246,12 @@ for i in range(2):
         nat_gateway_id=demo_nat_gateway.id,
         destination_cidr_block="0.0.0.0/0",
         opts=pulumi.ResourceOptions(parent=demo_db_subnet)
-    )
\ No newline at end of file
+    )
+
+    if demo_dual_stack:
+        demo_db_wan_route6 = ec2.Route(f"demo-db-wan6-route-{prefix}",
+            route_table_id=demo_db_route_table.id,
+            egress_only_gateway_id=demo_eigw.id,
+            destination_ipv6_cidr_block="::/0",
+            opts=pulumi.ResourceOptions(parent=demo_db_subnet)
+        )
\ No newline at end of file
@@ -1,7 +1,9 @@
 from pulumi_aws import ec2
 from pulumi import ResourceOptions
-from settings import deployment_region, endpoint_services, general_tags, demo_vpc_cidr
-from vpc import demo_vpc, demo_private_subnets
+import json
+
+from settings import deployment_region, endpoint_services, gateway_endpoint_services, general_tags, demo_vpc_cidr, saleor_dashboard_bucket_name, saleor_media_bucket_name, saleor_static_bucket_name
+from vpc import demo_vpc, demo_private_subnets, demo_private_route_tables, demo_eks_cp_route_tables, demo_db_route_tables
 
 
 # Create a shared security group for all AWS services VPC endpoints:
@@ -47,4 +49,50 @@ for service in endpoint_services:
         opts = ResourceOptions(
             depends_on=[vpc_endpoints_sg],
             parent=demo_vpc)
-        ))
\ No newline at end of file
+        ))
+
+"""
+Gateway VPC endpoints: no per-GB charge and no NAT gateway hop for S3 and DynamoDB traffic
+"""
+
+# Scope the S3 gateway endpoint to the Saleor buckets and the regional ECR image layer bucket. The bucket ARNs are built
+# from the bucket names, so the network layer doesn't depend on the data layer:
+saleor_bucket_arns = [f"arn:aws:s3:::{name}" for name in [saleor_dashboard_bucket_name, saleor_media_bucket_name, saleor_static_bucket_name]]
+s3_gateway_endpoint_policy = json.dumps({
+    "Version": "2012-10-17",
+    "Statement": [
+        {
+            "Sid": "AllowSaleorBuckets",
+            "Effect": "Allow",
+            "Principal": "*",
+            "Action": "s3:*",
+            "Resource": [arn for bucket_arn in saleor_bucket_arns for arn in (bucket_arn, f"{bucket_arn}/*")]
+        },
+        {
+            "Sid": "AllowECRImageLayers",
+            "Effect": "Allow",
+            "Principal": "*",
+            "Action": "s3:GetObject",
+            "Resource": f"arn:aws:s3:::prod-{deployment_region}-starport-layer-bucket/*"
+        }
+    ]
+})
+
+gateway_endpoint_policies = {
+    "s3": s3_gateway_endpoint_policy
+}
+
+# Attach the gateway endpoints to every private, EKS control plane and DB route table:
+gateway_endpoint_route_table_ids = [rt.id for rt in demo_private_route_tables + demo_eks_cp_route_tables + demo_db_route_tables]
+
+gateway_endpoints = []
+for service in gateway_endpoint_services:
+    gateway_endpoints.append(ec2.VpcEndpoint(f"{service}-gateway-vpc-endpoint",
+        vpc_id = demo_vpc.id,
+        service_name = f"com.amazonaws.{deployment_region}.{service}",
+        vpc_endpoint_type = "Gateway",
+        route_table_ids = gateway_endpoint_route_table_ids,
+        policy = gateway_endpoint_policies.get(service),
+        tags = {**general_tags, "Name": f"{service}-gateway-vpc-endpoint"},
+        opts = ResourceOptions(parent=demo_vpc)
+        ))